@@ -0,0 +1,283 @@
+"""
+预聚合混淆计数立方体
+按全部维度编码组合 (单元格) 聚合 actual x expected 计数, 任意等值筛选通过累加单元格得到
+"""
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from columnar_store import ColumnarStore, CODE_DTYPE
+from inverted_index import STATUS_FIELD
+
+
+NUM_CLASSES = 16
+NUM_PAIRS = NUM_CLASSES * NUM_CLASSES
+
+# 单元格计数类型: 单元格数可接近记录数, 使用int32控制立方体体积
+COUNT_DTYPE = np.int32
+
+# 256个 (actual, expected) 组合中对角线 (pass) 的位置
+PASS_PAIRS = (np.arange(NUM_PAIRS) // NUM_CLASSES) == (np.arange(NUM_PAIRS) % NUM_CLASSES)
+
+
+class ConfusionCube:
+    """
+    维度组合 -> 16x16计数 的立方体, 随仓库写入增量维护
+    查询代价与单元格 (不同维度组合) 数成正比, 与记录数无关
+    """
+
+    def __init__(self, dimension_fields: Sequence[str], initial_capacity: int = 256):
+        self.fields = tuple(dimension_fields)
+        self.initial_capacity = initial_capacity
+        self.clear()
+
+    def clear(self):
+        """清空立方体"""
+        self.num_cells = 0
+        self._cell_ids: Optional[Dict[Tuple[int, ...], int]] = {}
+        self._cell_codes = np.empty((0, len(self.fields)), dtype=CODE_DTYPE)
+        self._counts = np.empty((0, NUM_PAIRS), dtype=COUNT_DTYPE)
+
+    def __len__(self) -> int:
+        return self.num_cells
+
+    @classmethod
+    def from_arrays(
+        cls,
+        dimension_fields: Sequence[str],
+        cell_codes: np.ndarray,
+        counts: np.ndarray
+    ) -> "ConfusionCube":
+        """
+        由导出的单元格编码/计数构建
+        数组可以是只读的 (如内存映射), 首次写入时才复制; 单元格查找表也在首次写入时建立
+        """
+        cube = cls(dimension_fields)
+        cube.num_cells = len(cell_codes)
+        cube._cell_codes = cell_codes.reshape(-1, len(cube.fields))
+        cube._counts = counts.reshape(-1, NUM_PAIRS)
+        cube._cell_ids = None
+        return cube
+
+    @property
+    def cell_codes(self) -> np.ndarray:
+        """各单元格的维度编码 (单元格数, 维度数)"""
+        return self._cell_codes[:self.num_cells]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """各单元格的计数 (单元格数, 256), 列号为 actual * 16 + expected"""
+        return self._counts[:self.num_cells]
+
+    def _prepare_write(self):
+        """写入前保证数组可写、单元格查找表已建立 (由只读数组构建时)"""
+        if not self._counts.flags.writeable or not self._cell_codes.flags.writeable:
+            self._cell_codes = np.array(self._cell_codes, dtype=CODE_DTYPE)
+            self._counts = np.array(self._counts, dtype=COUNT_DTYPE)
+        if self._cell_ids is None:
+            self._cell_ids = {
+                tuple(codes): cell for cell, codes in enumerate(self.cell_codes.tolist())
+            }
+
+    def _reserve(self, count: int):
+        required = self.num_cells + count
+        if required <= len(self._counts):
+            return
+        capacity = max(len(self._counts), self.initial_capacity)
+        while capacity < required:
+            capacity *= 2
+        cell_codes = np.empty((capacity, len(self.fields)), dtype=CODE_DTYPE)
+        cell_codes[:self.num_cells] = self._cell_codes[:self.num_cells]
+        counts = np.zeros((capacity, NUM_PAIRS), dtype=COUNT_DTYPE)
+        counts[:self.num_cells] = self._counts[:self.num_cells]
+        self._cell_codes = cell_codes
+        self._counts = counts
+
+    def _cell_id(self, codes: Tuple[int, ...]) -> int:
+        """获取维度组合的单元格号, 新组合分配新单元格"""
+        cell = self._cell_ids.get(codes)
+        if cell is None:
+            self._reserve(1)
+            cell = self.num_cells
+            self._cell_codes[cell] = codes
+            self._cell_ids[codes] = cell
+            self.num_cells += 1
+        return cell
+
+    def update(self, store: ColumnarStore, start: int, stop: int, sign: int = 1):
+        """将存储中 [start, stop) 的行计入 (sign=1) 或移出 (sign=-1) 立方体"""
+        count = stop - start
+        if count <= 0:
+            return
+        self._prepare_write()
+
+        pairs = (store.actual[start:stop].astype(np.intp) * NUM_CLASSES
+                 + store.expected[start:stop])
+
+        if count == 1:
+            cell = self._cell_id(tuple(int(store.codes(f)[start]) for f in self.fields))
+            self._counts[cell, pairs[0]] += sign
+            return
+
+        unique_codes, inverse = self._unique_combinations(store, start, stop)
+        cell_of_unique = np.fromiter(
+            (self._cell_id(tuple(codes)) for codes in unique_codes.tolist()),
+            dtype=np.intp,
+            count=len(unique_codes)
+        )
+
+        # 不同维度组合对应不同单元格, 仅对本批涉及的单元格累加
+        delta = np.bincount(
+            inverse.reshape(-1) * NUM_PAIRS + pairs,
+            minlength=len(cell_of_unique) * NUM_PAIRS
+        )
+        self._counts[cell_of_unique] += sign * delta.reshape(len(cell_of_unique), NUM_PAIRS)
+
+    def _unique_combinations(self, store: ColumnarStore, start: int, stop: int):
+        """本批行的不同维度组合 (组合编码数组, 每行对应的组合序号)"""
+        columns = [store.codes(f)[start:stop] for f in self.fields]
+        sizes = [max(len(store.dictionaries[f]), 1) for f in self.fields]
+
+        if int(np.prod(sizes, dtype=object)) < 2 ** 62:
+            # 混合进制合并为一维整数键, 一维去重远快于按行去重
+            keys = np.zeros(stop - start, dtype=np.int64)
+            for column, size in zip(columns, sizes):
+                keys *= size
+                keys += column
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            unique_codes = np.stack(np.unravel_index(unique_keys, sizes), axis=1)
+            return unique_codes, inverse
+
+        return np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+
+    def select(self, conditions: Dict[str, Optional[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        按 {字段: 编码} 条件选取单元格
+        返回 (单元格维度编码, 单元格计数), 状态条件通过屏蔽对角线/非对角线实现
+        """
+        cell_codes = self.cell_codes
+        counts = self.counts
+        mask = np.ones(self.num_cells, dtype=bool)
+        for field, code in conditions.items():
+            if field == STATUS_FIELD:
+                continue
+            if code is None:
+                mask[:] = False
+                break
+            mask &= cell_codes[:, self.fields.index(field)] == code
+
+        cell_codes = cell_codes[mask]
+        counts = counts[mask]
+
+        status = conditions.get(STATUS_FIELD)
+        if status is not None:
+            counts = counts * (PASS_PAIRS if status else ~PASS_PAIRS)
+
+        # 去掉计数为0的单元格 (状态屏蔽或删除后)
+        non_empty = counts.any(axis=1)
+        return cell_codes[non_empty], counts[non_empty]
+
+    def nbytes(self) -> int:
+        """立方体数组占用的字节数 (按已分配容量)"""
+        return self._cell_codes.nbytes + self._counts.nbytes
+
+
+class IncrementalConfusionState:
+    """
+    增量维护的混淆计数状态
+    总体计数 + 按分组维度 (默认一级分类) 的计数 + 各维度取值的记录数
+    每条追加记录的更新代价为O(1); update的sign=-1用于删除路径回退计数
+    """
+
+    def __init__(
+        self,
+        dimension_fields: Sequence[str],
+        group_field: str = "primary_category"
+    ):
+        self.fields = tuple(dimension_fields)
+        self.group_field = group_field
+        self.clear()
+
+    def clear(self):
+        """清空状态"""
+        self._overall = np.zeros(NUM_PAIRS, dtype=np.int64)
+        self._groups = np.zeros((0, NUM_PAIRS), dtype=np.int64)
+        self._value_counts = {f: np.zeros(0, dtype=np.int64) for f in self.fields}
+
+    @classmethod
+    def from_arrays(
+        cls,
+        dimension_fields: Sequence[str],
+        overall: np.ndarray,
+        groups: np.ndarray,
+        value_counts: Dict[str, np.ndarray],
+        group_field: str = "primary_category"
+    ) -> "IncrementalConfusionState":
+        """由导出的计数构建 (复制)"""
+        state = cls(dimension_fields, group_field)
+        state._overall = np.array(overall, dtype=np.int64).reshape(NUM_PAIRS)
+        state._groups = np.array(groups, dtype=np.int64).reshape(-1, NUM_PAIRS)
+        state._value_counts = {f: np.array(value_counts[f], dtype=np.int64) for f in state.fields}
+        return state
+
+    @property
+    def overall(self) -> np.ndarray:
+        """总体 16x16 计数"""
+        return self._overall.reshape(NUM_CLASSES, NUM_CLASSES)
+
+    @property
+    def groups(self) -> np.ndarray:
+        """按分组维度编码的 (分组数, 16, 16) 计数"""
+        return self._groups.reshape(len(self._groups), NUM_CLASSES, NUM_CLASSES)
+
+    @property
+    def total_records(self) -> int:
+        return int(self._overall.sum())
+
+    def value_counts(self, field: str) -> np.ndarray:
+        """维度各编码对应的记录数"""
+        return self._value_counts[field]
+
+    @staticmethod
+    def _grow(array: np.ndarray, length: int) -> np.ndarray:
+        """按需倍增第一维长度 (新增部分为0)"""
+        if length <= len(array):
+            return array
+        capacity = max(len(array), 16)
+        while capacity < length:
+            capacity *= 2
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def update(self, store: ColumnarStore, start: int, stop: int, sign: int = 1):
+        """将存储中 [start, stop) 的行计入 (sign=1) 或移出 (sign=-1) 状态"""
+        count = stop - start
+        if count <= 0:
+            return
+
+        if count == 1:
+            pair = int(store.actual[start]) * NUM_CLASSES + int(store.expected[start])
+            self._overall[pair] += sign
+            group = int(store.codes(self.group_field)[start])
+            self._groups = self._grow(self._groups, group + 1)
+            self._groups[group, pair] += sign
+            for field in self.fields:
+                code = int(store.codes(field)[start])
+                self._value_counts[field] = self._grow(self._value_counts[field], code + 1)
+                self._value_counts[field][code] += sign
+            return
+
+        pairs = (store.actual[start:stop].astype(np.intp) * NUM_CLASSES
+                 + store.expected[start:stop])
+        self._overall += sign * np.bincount(pairs, minlength=NUM_PAIRS)
+
+        groups = store.codes(self.group_field)[start:stop].astype(np.intp)
+        num_groups = int(groups.max()) + 1
+        self._groups = self._grow(self._groups, num_groups)
+        delta = np.bincount(groups * NUM_PAIRS + pairs, minlength=num_groups * NUM_PAIRS)
+        self._groups[:num_groups] += sign * delta.reshape(num_groups, NUM_PAIRS)
+
+        for field in self.fields:
+            codes = store.codes(field)[start:stop]
+            counts = np.bincount(codes)
+            self._value_counts[field] = self._grow(self._value_counts[field], len(counts))
+            self._value_counts[field][:len(counts)] += sign * counts
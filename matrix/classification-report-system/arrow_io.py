@@ -0,0 +1,245 @@
+"""
+Parquet / Arrow IPC 导入导出
+导出时直接由列式存储构建Arrow表 (数值列与编码列不复制), 维度列与状态列写为字典编码列;
+导入时按行组/记录批流式读取所需列, 字典列按不同取值编码与校验, 不逐行解析字符串
+需要安装 pyarrow
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from columnar_store import DictionaryEncodedColumn, EncodedStringColumn
+from data_model import (
+    DataRepository, RepositorySnapshot, FilterCriteria, DIMENSION_FIELDS, EXTRA_FIELDS
+)
+from stream_ingest import ingest_batches
+
+
+# 列顺序与 ClassificationRecord.to_dict 一致
+RECORD_FIELDS = (
+    "primary_category", "secondary_category", "expected_value", "actual_value", "status",
+    "use_case", "scenario", "vertical", "factor", "factor_value",
+) + EXTRA_FIELDS
+
+# 导入时必需的列 (status由预期值与实际值决定, 可省略)
+REQUIRED_FIELDS = ("expected_value", "actual_value") + DIMENSION_FIELDS
+
+# 以字典编码读写的列
+DICTIONARY_FIELDS = DIMENSION_FIELDS + ("status",)
+
+# Parquet默认行组大小
+DEFAULT_ROW_GROUP_SIZE = 1 << 20
+
+# 导入时每批行数 (批次越大, 索引/立方体的增量更新开销越小)
+DEFAULT_BATCH_SIZE = 1 << 17
+
+_STATUS_VALUES = pa.array(["fail", "pass"], type=pa.string())
+
+
+def _projection(columns: Optional[Sequence[str]]) -> List[str]:
+    """校验并返回要导出的列 (默认全部)"""
+    if columns is None:
+        return list(RECORD_FIELDS)
+    unknown = [field for field in columns if field not in RECORD_FIELDS]
+    if unknown:
+        raise ValueError(f"未知的列: {', '.join(unknown)}")
+    return list(columns)
+
+
+def _strings(values: Sequence) -> List[Optional[str]]:
+    """转换为字符串 (None保持为空); 逐条添加的记录可能含非字符串取值"""
+    return [value if value is None or type(value) is str else str(value) for value in values]
+
+
+def _string_array(column: Sequence[Optional[str]], size: int) -> pa.Array:
+    """扩展字段列的前size个值转换为Arrow字符串列 (已编码的列直接使用其缓冲区)"""
+    encoded = column.encoded(size) if isinstance(column, EncodedStringColumn) else None
+    if encoded is None or size == 0:
+        return pa.array(_strings(column[i] for i in range(size)), type=pa.string())
+    data, offsets, null = encoded
+    valid = np.packbits(~null, bitorder="little")
+    array = pa.LargeStringArray.from_buffers(
+        size,
+        pa.py_buffer(offsets.astype(np.int64)),
+        pa.py_buffer(np.ascontiguousarray(data)),
+        pa.py_buffer(valid),
+        null_count=int(null.sum())
+    )
+    return array.cast(pa.string())
+
+
+def to_arrow_table(
+    repository: Union[DataRepository, RepositorySnapshot],
+    criteria: FilterCriteria = None,
+    columns: Optional[Sequence[str]] = None
+) -> pa.Table:
+    """
+    将仓库当前快照 (可按条件筛选) 转换为Arrow表
+    columns: 只导出这些列 (列投影), 默认全部列
+    维度列/状态列为字典编码列, 预期值/实际值为uint8
+    """
+    snapshot = repository.snapshot()
+    store = snapshot.store
+    rows = snapshot.match_rows(criteria) if criteria else None
+
+    def take(array: np.ndarray) -> np.ndarray:
+        return array if rows is None else array[rows]
+
+    arrays = []
+    fields = _projection(columns)
+    for field in fields:
+        if field in DIMENSION_FIELDS:
+            dictionary = pa.array(_strings(snapshot.dictionary_values(field)), type=pa.string())
+            arrays.append(pa.DictionaryArray.from_arrays(take(store.codes(field)), dictionary))
+        elif field == "status":
+            indices = take(store.passed).astype(np.int8)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, _STATUS_VALUES))
+        elif field == "expected_value":
+            arrays.append(pa.array(take(store.expected), type=pa.uint8()))
+        elif field == "actual_value":
+            arrays.append(pa.array(take(store.actual), type=pa.uint8()))
+        else:
+            array = _string_array(store.extras(field), store.size)
+            arrays.append(array if rows is None else array.take(pa.array(rows)))
+    return pa.Table.from_arrays(arrays, names=fields)
+
+
+def write_parquet(
+    repository: Union[DataRepository, RepositorySnapshot],
+    path: str,
+    criteria: FilterCriteria = None,
+    columns: Optional[Sequence[str]] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "zstd"
+) -> int:
+    """导出为Parquet文件 (字典编码的维度列), 返回导出行数"""
+    table = to_arrow_table(repository, criteria, columns)
+    pq.write_table(table, path, row_group_size=row_group_size, compression=compression)
+    return table.num_rows
+
+
+def write_arrow(
+    repository: Union[DataRepository, RepositorySnapshot],
+    path: str,
+    criteria: FilterCriteria = None,
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_ROW_GROUP_SIZE
+) -> int:
+    """导出为Arrow IPC文件 (Feather V2), 返回导出行数"""
+    table = to_arrow_table(repository, criteria, columns)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=batch_size)
+    return table.num_rows
+
+
+def _import_fields(names: Sequence[str], columns: Optional[Sequence[str]]) -> List[str]:
+    """
+    导入时读取的列: 文件中存在的已知列 (其余列忽略), columns可进一步限定
+    必需列不能被排除
+    """
+    wanted = [field for field in RECORD_FIELDS if field in names]
+    if columns is not None:
+        wanted = [field for field in wanted if field in columns or field in REQUIRED_FIELDS]
+    missing = [field for field in REQUIRED_FIELDS if field not in wanted]
+    if missing:
+        raise ValueError(f"缺少必需的列: {', '.join(missing)}")
+    return wanted
+
+
+def _dictionary_column(array: pa.Array) -> DictionaryEncodedColumn:
+    """
+    Arrow列转换为字典编码输入列 (普通列先做字典编码)
+    字典取值不做类型转换: 非字符串取值 (如整数维度列) 由 ingest_columns 按无效行报告
+    """
+    if not pa.types.is_dictionary(array.type):
+        array = pc.dictionary_encode(array)
+    values = array.dictionary.to_pylist()
+    indices = array.indices.fill_null(0).to_numpy(zero_copy_only=False)
+    null = array.is_null().to_numpy(zero_copy_only=False) if array.null_count else None
+    return DictionaryEncodedColumn(indices, values, null)
+
+
+def batch_columns(batch: pa.RecordBatch) -> Dict[str, Sequence]:
+    """Arrow记录批转换为 ingest_columns 的列字典"""
+    columns = {}
+    for field in batch.schema.names:
+        array = batch.column(field)
+        if field in DICTIONARY_FIELDS:
+            columns[field] = _dictionary_column(array)
+        elif field in ("expected_value", "actual_value"):
+            columns[field] = array.to_numpy(zero_copy_only=False)
+        else:
+            # 扩展字段同样不转换类型, 非字符串取值按无效行报告
+            columns[field] = array.to_pylist()
+    return columns
+
+
+def _rebatch(batches: Iterator[pa.RecordBatch], batch_size: int) -> Iterator[pa.RecordBatch]:
+    """将过大的记录批切分为不超过batch_size行"""
+    for batch in batches:
+        for offset in range(0, batch.num_rows, batch_size):
+            yield batch.slice(offset, batch_size)
+
+
+def read_parquet(
+    repository: DataRepository,
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    skip_invalid: bool = True,
+    max_errors: int = 100,
+    on_batch: Callable[[Dict], None] = None
+) -> Dict:
+    """
+    按行组流式读取Parquet文件并追加到仓库, 只读取需要的列, 维度列按字典列读取
+    columns: 限定读取的可选列 (如不读取扩展字段), 必需列总会读取
+    其余参数与返回值见 stream_ingest.ingest_stream
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size必须为正整数")
+    names = pq.read_schema(path).names
+    fields = _import_fields(names, columns)
+    parquet_file = pq.ParquetFile(
+        path,
+        memory_map=True,
+        read_dictionary=[field for field in fields if field in DICTIONARY_FIELDS]
+    )
+    batches = parquet_file.iter_batches(batch_size=batch_size, columns=fields)
+    return ingest_batches(
+        repository, (batch_columns(batch) for batch in batches), skip_invalid, max_errors, on_batch
+    )
+
+
+def read_arrow(
+    repository: DataRepository,
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    skip_invalid: bool = True,
+    max_errors: int = 100,
+    on_batch: Callable[[Dict], None] = None
+) -> Dict:
+    """
+    读取Arrow IPC文件 (文件格式或流格式) 并追加到仓库, 文件以内存映射方式按记录批读取
+    参数与返回值见 read_parquet
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size必须为正整数")
+    with pa.memory_map(path) as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        fields = _import_fields(reader.schema.names, columns)
+        return ingest_batches(
+            repository,
+            (batch_columns(batch.select(fields)) for batch in _rebatch(batches, batch_size)),
+            skip_invalid,
+            max_errors,
+            on_batch
+        )
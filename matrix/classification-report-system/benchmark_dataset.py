@@ -0,0 +1,87 @@
+"""
+数据集文件基准
+构造指定行数的数据仓库, 保存为二进制数据集文件 (见 dataset_format), 测量:
+1. 保存耗时与文件大小
+2. 打开 (内存映射) 耗时
+3. 打开后首次生成报表 (无筛选/有筛选) 的耗时
+
+用法: python benchmark_dataset.py [记录数, 默认10000000] [文件路径, 默认临时目录]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from aggregate_cube import ConfusionCube, IncrementalConfusionState
+from benchmark_memory import DIMENSION_VALUES
+from columnar_store import ColumnarStore, DimensionDictionary, EncodedStringColumn
+from confusion_matrix import CubeReportGenerator
+from data_model import DataRepository, FilterCriteria, DIMENSION_FIELDS, EXTRA_FIELDS
+from inverted_index import InvertedIndex
+
+
+def build_repository(count: int, seed: int = 42) -> DataRepository:
+    """直接由随机列数组构造仓库 (跳过逐行校验, 仅用于基准)"""
+    rng = np.random.default_rng(seed)
+    expected = rng.integers(0, 16, count, dtype=np.uint8)
+    wrong = rng.random(count) >= 0.8
+    actual = np.where(wrong, rng.integers(0, 16, count, dtype=np.uint8), expected).astype(np.uint8)
+
+    no_strings = EncodedStringColumn(
+        np.empty(0, dtype=np.uint8), np.zeros(count + 1, dtype=np.int64), np.ones(count, dtype=bool)
+    )
+    store = ColumnarStore.from_columns(
+        DIMENSION_FIELDS,
+        EXTRA_FIELDS,
+        expected=expected,
+        actual=actual,
+        passed=expected == actual,
+        codes={
+            field: rng.integers(0, len(DIMENSION_VALUES[field]), count, dtype=np.int32)
+            for field in DIMENSION_FIELDS
+        },
+        dictionaries={
+            field: DimensionDictionary.from_values(DIMENSION_VALUES[field])
+            for field in DIMENSION_FIELDS
+        },
+        extras={field: no_strings for field in EXTRA_FIELDS}
+    )
+    index = InvertedIndex(DIMENSION_FIELDS)
+    cube = ConfusionCube(DIMENSION_FIELDS)
+    state = IncrementalConfusionState(DIMENSION_FIELDS)
+    for structure in (index, cube, state):
+        structure.update(store, 0, count)
+    return DataRepository.from_parts(store, index, cube, state)
+
+
+def timed(label: str, action):
+    started = time.perf_counter()
+    result = action()
+    print(f"{label:<28}{(time.perf_counter() - started) * 1000:>12.1f} ms")
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), "benchmark.dataset")
+    print(f"记录数: {count:,}")
+
+    repository = timed("构造仓库", lambda: build_repository(count))
+    size = timed("保存数据集", lambda: repository.save(path))
+    print(f"{'文件大小':<28}{size / 1024 / 1024:>12.1f} MB ({size / count:.1f} 字节/记录)")
+    del repository
+
+    opened = timed("打开数据集 (mmap)", lambda: DataRepository.open(path))
+    timed("首次报表 (无筛选)", lambda: CubeReportGenerator(opened).generate_detailed_report())
+    criteria = FilterCriteria(scenario="移动端", factor="地域")
+    timed("首次报表 (有筛选)", lambda: CubeReportGenerator(opened, criteria).generate_detailed_report())
+    timed("筛选行号 (倒排索引)", lambda: opened.match_rows(criteria))
+
+    if len(sys.argv) <= 2:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+完整报告导出基准
+按不同的一级分类数量构造数据仓库, 对比 export_full_report 的耗时:
+1. openpyxl逐单元格生成sheet (native_sheets=False)
+2. 直接生成sheet XML (默认)
+3. 直接生成sheet XML, 分类sheet由常驻进程池 (sheet_pool.SheetRenderPool) 并行生成, 按进程数对比
+进程池在计时前创建 (与Web应用启动时创建一致), 耗时不含工作进程启动
+
+用法: python benchmark_export.py [记录数, 默认20000] [进程数列表, 默认2,4] [分类数列表, 默认10,50,200,500]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_memory import DIMENSION_VALUES
+from data_model import DataRepository, DIMENSION_FIELDS, EXTRA_FIELDS
+from excel_exporter import ExcelExporter
+from sheet_pool import SheetRenderPool
+
+
+def build_repository(count: int, categories: int, seed: int = 42) -> DataRepository:
+    """构造含指定数量一级分类的随机数据仓库"""
+    rng = np.random.default_rng(seed)
+    expected = rng.integers(0, 16, count)
+    wrong = rng.random(count) >= 0.8
+    actual = np.where(wrong, rng.integers(0, 16, count), expected)
+
+    columns = {"expected_value": expected, "actual_value": actual}
+    for field in DIMENSION_FIELDS:
+        if field == "primary_category":
+            values = [f"分类{i:04d}" for i in range(categories)]
+        else:
+            values = DIMENSION_VALUES[field]
+        columns[field] = [values[i] for i in rng.integers(0, len(values), count).tolist()]
+    for field in EXTRA_FIELDS:
+        columns[field] = [None] * count
+
+    repository = DataRepository()
+    repository.ingest_columns(columns)
+    return repository
+
+
+def timed(action) -> float:
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    process_counts = [int(value) for value in sys.argv[2].split(",")] if len(sys.argv) > 2 else [2, 4]
+    category_counts = (
+        [int(value) for value in sys.argv[3].split(",")] if len(sys.argv) > 3 else [10, 50, 200, 500]
+    )
+    path = os.path.join(tempfile.gettempdir(), "benchmark_export.xlsx")
+    pools = {processes: SheetRenderPool(processes) for processes in process_counts}
+    print(f"记录数: {count:,}, CPU数: {os.cpu_count()}")
+    print(
+        f"{'分类数':>8}{'openpyxl (s)':>14}{'原生XML (s)':>14}"
+        + "".join(f"{f'{processes}进程 (s)':>12}" for processes in process_counts)
+    )
+
+    try:
+        for categories in category_counts:
+            exporter = ExcelExporter(build_repository(count, categories))
+            cells = timed(lambda: exporter.export_full_report(path, native_sheets=False))
+            native = timed(lambda: exporter.export_full_report(path))
+            pooled = [timed(lambda: exporter.export_full_report(path, pool=pools[processes]))
+                      for processes in process_counts]
+            print(f"{categories:>8}{cells:>14.2f}{native:>14.2f}" + "".join(f"{t:>12.2f}" for t in pooled))
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+记录内存占用基准
+对比每条记录的字节数:
+1. 旧版记录 (普通dataclass, 每条记录独立的维度字符串)
+2. 紧凑记录 (__slots__ + 维度字符串驻留)
+3. 列式数据仓库 (DataRepository)
+
+用法: python benchmark_memory.py [记录数, 默认1000000]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from data_model import ClassificationRecord, DataRepository, ResultStatus
+
+
+@dataclass
+class LegacyRecord:
+    """旧版记录表示 (用于对比)"""
+    primary_category: str
+    secondary_category: str
+    expected_value: int
+    actual_value: int
+    status: ResultStatus
+    use_case: str
+    scenario: str
+    vertical: str
+    factor: str
+    factor_value: str
+    timestamp: Optional[str] = None
+    test_id: Optional[str] = None
+    notes: Optional[str] = None
+
+
+DIMENSION_VALUES = {
+    "primary_category": ["电商", "社交", "新闻", "游戏"],
+    "secondary_category": ["首页", "列表页", "详情页", "个人中心"],
+    "use_case": ["用户登录", "商品浏览", "订单支付", "内容推荐"],
+    "scenario": ["移动端", "PC端", "平板端"],
+    "vertical": ["零售", "社交娱乐", "资讯", "游戏"],
+    "factor": ["网络状态", "用户等级", "地域", "时间段"],
+    "factor_value": ["良好", "一般", "较差", "VIP", "普通", "北京", "上海", "白天", "夜晚"],
+}
+
+
+def fresh(value: str) -> str:
+    """生成内容相同的新字符串对象 (模拟JSON解析后的独立字符串)"""
+    return (value + " ")[:-1]
+
+
+def generate_rows(count: int, seed: int = 42):
+    """生成行数据字典"""
+    rng = random.Random(seed)
+    for i in range(count):
+        expected = rng.randint(0, 15)
+        actual = expected if rng.random() < 0.8 else rng.randint(0, 15)
+        row = {field: fresh(rng.choice(values)) for field, values in DIMENSION_VALUES.items()}
+        row.update({
+            "expected_value": expected,
+            "actual_value": actual,
+            "status": "pass" if expected == actual else "fail",
+            "test_id": f"TEST_{i:07d}",
+        })
+        yield row
+
+
+def measure(build, count: int):
+    """返回 build(rows) 构造结果保留的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build(generate_rows(count))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del result
+    return used
+
+
+def build_legacy(rows):
+    return [
+        LegacyRecord(**{**row, "status": ResultStatus(row["status"])})
+        for row in rows
+    ]
+
+
+def build_compact(rows):
+    return [ClassificationRecord.from_dict(row) for row in rows]
+
+
+def build_repository(rows, batch_size: int = 50000):
+    repository = DataRepository()
+    batch = []
+    for row in rows:
+        batch.append(ClassificationRecord.from_dict(row))
+        if len(batch) >= batch_size:
+            repository.add_records(batch)
+            batch = []
+    repository.add_records(batch)
+    return repository
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"记录数: {count:,}")
+    print(f"{'表示方式':<24}{'总字节':>16}{'字节/记录':>12}")
+
+    for label, build in [
+        ("旧版dataclass", build_legacy),
+        ("紧凑记录(slots+驻留)", build_compact),
+        ("列式数据仓库", build_repository),
+    ]:
+        used = measure(build, count)
+        print(f"{label:<24}{used:>16,}{used / count:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
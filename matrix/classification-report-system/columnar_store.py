@@ -0,0 +1,416 @@
+"""
+列式记录存储
+预期值/实际值使用uint8数组, 状态使用bool数组, 字符串维度字典编码为整数编码数组
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+# 列数据类型
+VALUE_DTYPE = np.uint8     # 预期值/实际值 (0-15)
+CODE_DTYPE = np.int32      # 维度字典编码
+
+
+class DimensionDictionary:
+    """维度字典 (字符串值 <-> 整数编码)"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        """编码单个值, 新值分配新编码"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def encode_many(self, values: Sequence[str]) -> np.ndarray:
+        """批量编码 (字典编码的输入列只编码被引用的不同取值)"""
+        if isinstance(values, DictionaryEncodedColumn):
+            mapping = np.zeros(len(values.values), dtype=CODE_DTYPE)
+            for code in np.flatnonzero(values.used_codes()).tolist():
+                mapping[code] = self.encode(values.values[code])
+            return mapping[values.indices]
+        codes = self.codes
+        encode = self.encode
+        return np.fromiter(
+            (codes[v] if v in codes else encode(v) for v in values),
+            dtype=CODE_DTYPE,
+            count=len(values)
+        )
+
+    @classmethod
+    def from_values(cls, values: Sequence[str]) -> "DimensionDictionary":
+        """由按编码排列的取值列表构建"""
+        dictionary = cls()
+        dictionary.values = list(values)
+        dictionary.codes = {v: code for code, v in enumerate(dictionary.values)}
+        return dictionary
+
+    def lookup(self, value: str) -> Optional[int]:
+        """查询值的编码, 不存在返回None"""
+        return self.codes.get(value)
+
+    def decode(self, code: int) -> str:
+        """解码单个编码"""
+        return self.values[code]
+
+    def truncate(self, size: int):
+        """丢弃编码size及之后的取值 (写入失败时回滚新增的取值)"""
+        for value in self.values[size:]:
+            del self.codes[value]
+        del self.values[size:]
+
+
+class DictionaryEncodedColumn:
+    """
+    字典编码的输入列 (编码数组 + 取值列表), 如Arrow/Parquet的字典列
+    批量导入时按不同取值编码/校验, 不逐行处理字符串
+    """
+
+    def __init__(
+        self,
+        indices: np.ndarray,
+        values: Sequence[Optional[str]],
+        null: Optional[np.ndarray] = None
+    ):
+        self.indices = indices
+        self.values = list(values)
+        self.null = null
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self.null is not None and self.null[index]:
+            return None
+        return self.values[self.indices[index]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def used_codes(self) -> np.ndarray:
+        """各取值是否被非空行引用 (bool数组)"""
+        indices = self.indices if self.null is None else self.indices[~self.null]
+        return np.bincount(indices, minlength=len(self.values)) > 0
+
+    def rows_where(self, predicate) -> np.ndarray:
+        """取值满足predicate的行号 (空值按None判断)"""
+        matched = [code for code, value in enumerate(self.values) if predicate(value)]
+        mask = np.isin(self.indices, matched)
+        if self.null is not None:
+            mask = np.where(self.null, bool(predicate(None)), mask)
+        return np.flatnonzero(mask)
+
+    def take(self, rows: Sequence[int]) -> "DictionaryEncodedColumn":
+        rows = np.asarray(rows, dtype=np.int64)
+        null = self.null[rows] if self.null is not None else None
+        return DictionaryEncodedColumn(self.indices[rows], self.values, null)
+
+
+class EncodedStringColumn:
+    """
+    UTF-8编码的只读字符串列 (字节数据 + 偏移量 + 空值标记), 可直接建立在内存映射的缓冲区上
+    按需解码; 首次追加时转换为普通列表 (写时复制)
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, null: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+        self._null = null
+        self._values: Optional[List[Optional[str]]] = None
+
+    @staticmethod
+    def encode(values: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """编码为 (uint8字节数据, int64偏移量[n+1], bool空值标记)"""
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        null = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+        return data, offsets, null
+
+    def __len__(self) -> int:
+        if self._values is not None:
+            return len(self._values)
+        return len(self._null)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self._values is not None:
+            return self._values[index]
+        if self._null[index]:
+            return None
+        return self._data[self._offsets[index]:self._offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def encoded(self, size: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """前size个值的编码形式 (字节数据, 偏移量, 空值标记); 已转换为列表时返回None"""
+        if self._values is not None:
+            return None
+        offsets = self._offsets[:size + 1]
+        return self._data[:offsets[-1]], offsets, self._null[:size]
+
+    def _materialize(self) -> List[Optional[str]]:
+        if self._values is None:
+            self._values = list(self)
+        return self._values
+
+    def append(self, value: Optional[str]):
+        self._materialize().append(value)
+
+    def extend(self, values: Iterable[Optional[str]]):
+        self._materialize().extend(values)
+
+    def truncate(self, size: int):
+        if len(self) > size:
+            del self._materialize()[size:]
+
+
+class ColumnarStore:
+    """
+    列式存储
+    数值列和编码列使用按需倍增的NumPy数组, 可选扩展字段使用Python列表
+    """
+
+    def __init__(
+        self,
+        dimension_fields: Sequence[str],
+        extra_fields: Sequence[str] = (),
+        initial_capacity: int = 1024
+    ):
+        self.dimension_fields = tuple(dimension_fields)
+        self.extra_fields = tuple(extra_fields)
+        self.initial_capacity = initial_capacity
+        self.dictionaries: Dict[str, DimensionDictionary] = {}
+        self.clear()
+
+    def clear(self):
+        """清空所有列和字典"""
+        self.size = 0
+        self._capacity = 0
+        self._expected = np.empty(0, dtype=VALUE_DTYPE)
+        self._actual = np.empty(0, dtype=VALUE_DTYPE)
+        self._passed = np.empty(0, dtype=bool)
+        self._codes = {f: np.empty(0, dtype=CODE_DTYPE) for f in self.dimension_fields}
+        self._extras: Dict[str, List[Optional[str]]] = {f: [] for f in self.extra_fields}
+        self.dictionaries = {f: DimensionDictionary() for f in self.dimension_fields}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_columns(
+        cls,
+        dimension_fields: Sequence[str],
+        extra_fields: Sequence[str],
+        expected: np.ndarray,
+        actual: np.ndarray,
+        passed: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        dictionaries: Dict[str, DimensionDictionary],
+        extras: Dict[str, Sequence[Optional[str]]]
+    ) -> "ColumnarStore":
+        """
+        由已有列数组构建 (不复制, 数组可以是只读的内存映射)
+        容量等于行数, 之后的追加会分配新数组, 不会写入原数组
+        """
+        store = cls.__new__(cls)
+        store.dimension_fields = tuple(dimension_fields)
+        store.extra_fields = tuple(extra_fields)
+        store.initial_capacity = 1024
+        store.size = len(expected)
+        store._capacity = store.size
+        store._expected = expected
+        store._actual = actual
+        store._passed = passed
+        store._codes = {f: codes[f] for f in store.dimension_fields}
+        store._extras = {f: extras[f] for f in store.extra_fields}
+        store.dictionaries = {f: dictionaries[f] for f in store.dimension_fields}
+        return store
+
+    def snapshot(self) -> "ColumnarStore":
+        """
+        只读快照: 与当前存储共享数组, 容量截断为当前行数
+        之后对原存储的追加只写入快照范围之外或新分配的数组, 快照内容保持不变
+        """
+        snap = ColumnarStore.__new__(ColumnarStore)
+        snap.dimension_fields = self.dimension_fields
+        snap.extra_fields = self.extra_fields
+        snap.initial_capacity = self.initial_capacity
+        snap.dictionaries = self.dictionaries
+        snap.size = self.size
+        snap._capacity = self.size
+        snap._expected = self._expected
+        snap._actual = self._actual
+        snap._passed = self._passed
+        snap._codes = dict(self._codes)
+        snap._extras = self._extras
+        return snap
+
+    # ---- 列访问 (返回长度为size的视图) ----
+
+    @property
+    def expected(self) -> np.ndarray:
+        return self._expected[:self.size]
+
+    @property
+    def actual(self) -> np.ndarray:
+        return self._actual[:self.size]
+
+    @property
+    def passed(self) -> np.ndarray:
+        return self._passed[:self.size]
+
+    def codes(self, field: str) -> np.ndarray:
+        """获取维度的编码列"""
+        return self._codes[field][:self.size]
+
+    def extras(self, field: str) -> List[Optional[str]]:
+        """获取扩展字段列"""
+        return self._extras[field]
+
+    # ---- 写入 ----
+
+    def _reserve(self, count: int):
+        """保证容量至少可再容纳count行"""
+        required = self.size + count
+        if required <= self._capacity:
+            return
+
+        capacity = max(self._capacity, self.initial_capacity)
+        while capacity < required:
+            capacity *= 2
+
+        def grow(array: np.ndarray, dtype=None) -> np.ndarray:
+            new_array = np.empty(capacity, dtype=dtype or array.dtype)
+            new_array[:self.size] = array[:self.size]
+            return new_array
+
+        self._expected = grow(self._expected)
+        self._actual = grow(self._actual)
+        self._passed = grow(self._passed)
+        # 从文件加载的编码列可能是窄类型, 扩容时恢复为CODE_DTYPE
+        self._codes = {f: grow(a, CODE_DTYPE) for f, a in self._codes.items()}
+        self._capacity = capacity
+
+    def append(
+        self,
+        expected: int,
+        actual: int,
+        passed: bool,
+        dimensions: Dict[str, str],
+        extras: Dict[str, Optional[str]] = None
+    ) -> int:
+        """追加单行, 返回行号"""
+        self._reserve(1)
+        row = self.size
+        self._expected[row] = expected
+        self._actual[row] = actual
+        self._passed[row] = passed
+        for field in self.dimension_fields:
+            self._codes[field][row] = self.dictionaries[field].encode(dimensions[field])
+        extras = extras or {}
+        for field in self.extra_fields:
+            self._extras[field].append(extras.get(field))
+        self.size = row + 1
+        return row
+
+    def extend(
+        self,
+        expected: Sequence[int],
+        actual: Sequence[int],
+        passed: Sequence[bool],
+        dimensions: Dict[str, Sequence[str]],
+        extras: Dict[str, Sequence[Optional[str]]] = None
+    ) -> Tuple[int, int]:
+        """批量追加列数据, 返回新增行区间 [start, stop)"""
+        count = len(expected)
+        self._reserve(count)
+        start, stop = self.size, self.size + count
+        self._expected[start:stop] = expected
+        self._actual[start:stop] = actual
+        self._passed[start:stop] = passed
+        for field in self.dimension_fields:
+            self._codes[field][start:stop] = self.dictionaries[field].encode_many(dimensions[field])
+        extras = extras or {}
+        for field in self.extra_fields:
+            values = extras.get(field)
+            self._extras[field].extend(values if values is not None else [None] * count)
+        self.size = stop
+        return start, stop
+
+    def truncate(self, size: int, dictionary_sizes: Dict[str, int]):
+        """
+        回滚到此前的行数与字典大小 (写入失败时), 丢弃之后追加的行、扩展字段值与字典取值
+        数组中size之后的内容不清除, 之后的追加直接覆盖
+        """
+        self.size = size
+        for field, values in self._extras.items():
+            if isinstance(values, list):
+                del values[size:]
+            else:
+                values.truncate(size)
+        for field, dictionary in self.dictionaries.items():
+            dictionary.truncate(dictionary_sizes[field])
+
+    # ---- 读取 ----
+
+    def row(self, index: int) -> Dict:
+        """解码单行为字段字典"""
+        data = {
+            "expected_value": int(self._expected[index]),
+            "actual_value": int(self._actual[index]),
+            "passed": bool(self._passed[index]),
+        }
+        for field in self.dimension_fields:
+            data[field] = self.dictionaries[field].values[self._codes[field][index]]
+        for field in self.extra_fields:
+            data[field] = self._extras[field][index]
+        return data
+
+    def rows(self, indices: Sequence[int] = None) -> List[Dict]:
+        """批量解码多行 (默认全部行)"""
+        if indices is None:
+            indices = np.arange(self.size)
+        indices = np.asarray(indices, dtype=np.int64)
+
+        expected = self._expected[indices].tolist()
+        actual = self._actual[indices].tolist()
+        passed = self._passed[indices].tolist()
+        dimension_columns = {
+            field: [self.dictionaries[field].values[c] for c in self._codes[field][indices].tolist()]
+            for field in self.dimension_fields
+        }
+        index_list = indices.tolist()
+        extra_columns = {
+            field: [self._extras[field][i] for i in index_list]
+            for field in self.extra_fields
+        }
+
+        rows = []
+        for pos in range(len(index_list)):
+            data = {
+                "expected_value": expected[pos],
+                "actual_value": actual[pos],
+                "passed": passed[pos],
+            }
+            for field, column in dimension_columns.items():
+                data[field] = column[pos]
+            for field, column in extra_columns.items():
+                data[field] = column[pos]
+            rows.append(data)
+        return rows
+
+    def nbytes(self) -> int:
+        """数组列占用的字节数 (按已分配容量)"""
+        total = self._expected.nbytes + self._actual.nbytes + self._passed.nbytes
+        total += sum(a.nbytes for a in self._codes.values())
+        return total
@@ -2,18 +2,90 @@
 混淆矩阵统计报表生成器
 支持召回率、精准率计算
 """
-from typing import List, Dict, Tuple
-from collections import defaultdict
+from functools import partial
+from typing import List, Dict, Tuple, Union, Sequence
 import numpy as np
-from data_model import ClassificationRecord, FilterCriteria, DataRepository
+from data_model import (
+    ClassificationRecord, FilterCriteria, DataRepository, RepositorySnapshot, RecordSelection,
+    DIMENSION_FIELDS
+)
+
+
+# 预测值类别数 (0-15)
+NUM_CLASSES = 16
+
+# 分组组合数不超过该值时直接按编码组合计数, 否则先压缩为实际出现的组合
+MAX_DENSE_GROUPS = 16384
+
+
+def confusion_counts(actual: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """
+    使用一次bincount统计混淆矩阵
+    返回 matrix[actual][expected] 的 16x16 计数矩阵
+    """
+    keys = actual.astype(np.intp) * NUM_CLASSES + expected
+    counts = np.bincount(keys, minlength=NUM_CLASSES * NUM_CLASSES)
+    return counts.reshape(NUM_CLASSES, NUM_CLASSES)
+
+
+def grouped_confusion_counts(
+    group_codes: np.ndarray,
+    num_groups: int,
+    actual: np.ndarray,
+    expected: np.ndarray
+) -> np.ndarray:
+    """
+    单次bincount按组统计混淆矩阵
+    返回 (num_groups, 16, 16) 计数张量, tensor[group][actual][expected]
+    """
+    cells = NUM_CLASSES * NUM_CLASSES
+    keys = group_codes.astype(np.intp) * cells
+    keys += actual.astype(np.intp) * NUM_CLASSES
+    keys += expected
+    counts = np.bincount(keys, minlength=num_groups * cells)
+    return counts.reshape(num_groups, NUM_CLASSES, NUM_CLASSES)
+
+
+def matrix_metrics(matrix: np.ndarray) -> Dict:
+    """
+    由计数矩阵计算精准率/召回率/合计 (向量化)
+    矩阵格式: matrix[actual][predicted]
+    """
+    total_expected = matrix.sum(axis=0)  # 每列求和 - 预测为X的总数
+    total_actual = matrix.sum(axis=1)    # 每行求和 - 实际为X的总数
+    correct = np.diagonal(matrix)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 精准率 (Precision): 预测为X且实际为X / 预测为X的总数
+        precision = np.where(
+            total_expected > 0, np.round(correct / total_expected * 100, 2), 0.0
+        )
+        # 召回率 (Recall): 实际为X且预测为X / 实际为X的总数
+        recall = np.where(
+            total_actual > 0, np.round(correct / total_actual * 100, 2), 0.0
+        )
+
+    return {
+        "matrix": matrix.tolist(),
+        "precision": precision.tolist(),
+        "recall": recall.tolist(),
+        "total_expected": total_expected.tolist(),
+        "total_actual": total_actual.tolist(),
+        "total_records": int(matrix.sum())
+    }
 
 
 class ConfusionMatrixGenerator:
     """混淆矩阵生成器"""
 
-    def __init__(self, records: List[ClassificationRecord]):
+    def __init__(self, records: Union[List[ClassificationRecord], RecordSelection]):
         self.records = records
         self.value_range = range(0, 16)  # 0-15
+        # 计算统一基于列数组进行
+        if isinstance(records, RecordSelection):
+            self.selection = records
+        else:
+            self.selection = RecordSelection.from_records(records)
 
     def generate_matrix_by_primary_category(self) -> Dict[str, Dict]:
         """
@@ -28,86 +100,135 @@ class ConfusionMatrixGenerator:
             }
         }
         """
-        # 按一级分类分组
-        category_groups = defaultdict(list)
-        for record in self.records:
-            category_groups[record.primary_category].append(record)
+        return self.generate_matrix_by(["primary_category"])
 
-        results = {}
-        for category, records in category_groups.items():
-            results[category] = self._calculate_matrix_metrics(records)
+    def generate_matrix_by(self, dimensions: Sequence[str]) -> Dict:
+        """
+        按任意维度 (支持多级) 分组生成混淆矩阵, 一次扫描完成全部分组
+        dimensions: 维度字段列表, 如 ["scenario"] 或 ["factor", "factor_value"]
+        返回: 按维度逐级嵌套的字典, 叶子为矩阵指标
+            {"factor_A": {"value_1": {"matrix": ..., ...}, ...}, ...}
+        """
+        dimensions = list(dimensions)
+        if not dimensions:
+            raise ValueError("至少需要一个分组维度")
+        for field in dimensions:
+            if field not in DIMENSION_FIELDS:
+                raise ValueError(f"不支持的分组维度: {field}")
 
+        tensor, group_codes = self._grouped_counts(dimensions)
+        dictionaries = [self._dictionary(field) for field in dimensions]
+
+        results = {}
+        for codes, matrix in zip(group_codes.tolist(), tensor):
+            node = results
+            for dictionary, code in zip(dictionaries[:-1], codes[:-1]):
+                node = node.setdefault(dictionary.decode(code), {})
+            node[dictionaries[-1].decode(codes[-1])] = matrix_metrics(matrix)
         return results
 
+    def _grouped_counts(self, dimensions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        一次扫描按维度组合统计
+        返回 (非空分组计数张量 (G, 16, 16), 分组编码 (G, 维度数)), 按编码字典序排列
+        """
+        columns = [self._codes(field) for field in dimensions]
+        sizes = [max(len(self._dictionary(field)), 1) for field in dimensions]
+        num_groups = int(np.prod(sizes, dtype=object))
+
+        if num_groups <= MAX_DENSE_GROUPS:
+            # 编码按混合进制合并为组合号
+            group_ids = np.zeros(len(columns[0]), dtype=np.intp)
+            for column, size in zip(columns, sizes):
+                group_ids *= size
+                group_ids += column
+            tensor = self._count_groups(group_ids, num_groups)
+            non_empty = np.flatnonzero(tensor.reshape(num_groups, -1).any(axis=1))
+            group_codes = np.stack(np.unravel_index(non_empty, sizes), axis=1)
+            return tensor[non_empty], group_codes
+
+        # 组合空间过大: 压缩为实际出现的组合
+        group_codes, group_ids = np.unique(
+            np.stack(columns, axis=1), axis=0, return_inverse=True
+        )
+        tensor = self._count_groups(group_ids.reshape(-1), len(group_codes))
+        return tensor, group_codes
+
+    # ---- 数据源相关的统计 (子类可基于其他数据源覆盖) ----
+
+    def _codes(self, field: str) -> np.ndarray:
+        """参与分组的维度编码列"""
+        return self.selection.codes(field)
+
+    def _dictionary(self, field: str):
+        """维度字典"""
+        return self.selection.dictionary(field)
+
+    def _count_groups(self, group_ids: np.ndarray, num_groups: int) -> np.ndarray:
+        """按分组号统计 (num_groups, 16, 16) 计数张量"""
+        return grouped_confusion_counts(
+            group_ids, num_groups, self.selection.actual, self.selection.expected
+        )
+
+    def _overall_counts(self) -> np.ndarray:
+        """总体 16x16 计数矩阵"""
+        return confusion_counts(self.selection.actual, self.selection.expected)
+
+    def _unique_count(self, field: str) -> int:
+        """维度唯一值数量 (编码出现标记)"""
+        codes = self.selection.codes(field)
+        if len(codes) == 0:
+            return 0
+        return int(np.count_nonzero(np.bincount(codes)))
+
     def generate_overall_matrix(self) -> Dict:
         """生成总体混淆矩阵"""
-        return self._calculate_matrix_metrics(self.records)
+        return matrix_metrics(self._overall_counts())
 
-    def _calculate_matrix_metrics(self, records: List[ClassificationRecord]) -> Dict:
+    def _calculate_matrix_metrics(self, actual: np.ndarray, expected: np.ndarray) -> Dict:
         """
         计算混淆矩阵及相关指标
         矩阵格式: matrix[actual][predicted]
         """
-        # 初始化16x16矩阵
-        matrix = np.zeros((16, 16), dtype=int)
-
-        # 填充矩阵
-        for record in records:
-            actual = record.actual_value
-            expected = record.expected_value
-            matrix[actual][expected] += 1
-
-        # 计算每个预测值的统计
-        total_expected = matrix.sum(axis=0)  # 每列求和 - 预测为X的总数
-        total_actual = matrix.sum(axis=1)    # 每行求和 - 实际为X的总数
-
-        # 计算精准率 (Precision): 预测为X且实际为X / 预测为X的总数
-        precision = []
-        for i in range(16):
-            if total_expected[i] > 0:
-                precision.append(round(matrix[i][i] / total_expected[i] * 100, 2))
-            else:
-                precision.append(0.0)
-
-        # 计算召回率 (Recall): 实际为X且预测为X / 实际为X的总数
-        recall = []
-        for i in range(16):
-            if total_actual[i] > 0:
-                recall.append(round(matrix[i][i] / total_actual[i] * 100, 2))
-            else:
-                recall.append(0.0)
-
-        return {
-            "matrix": matrix.tolist(),
-            "precision": precision,
-            "recall": recall,
-            "total_expected": total_expected.tolist(),
-            "total_actual": total_actual.tolist(),
-            "total_records": len(records)
-        }
+        return matrix_metrics(confusion_counts(actual, expected))
 
     def generate_detailed_report(self) -> Dict:
-        """生成详细报告（包含所有分类和总体）"""
+        """
+        生成详细报告（包含所有分类和总体）
+        一次分组统计得到各分类矩阵, 总体矩阵与汇总计数均由该张量推导
+        """
+        tensor, group_codes = self._grouped_counts(["primary_category"])
+        dictionary = self._dictionary("primary_category")
+        overall = tensor.sum(axis=0) if len(tensor) else confusion_counts(
+            np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        )
         report = {
-            "overall": self.generate_overall_matrix(),
-            "by_primary_category": self.generate_matrix_by_primary_category(),
-            "summary": self._generate_summary()
+            "overall": matrix_metrics(overall),
+            "by_primary_category": {
+                dictionary.decode(code): matrix_metrics(matrix)
+                for code, matrix in zip(group_codes[:, 0].tolist(), tensor)
+            },
+            "summary": self._generate_summary(overall, len(tensor))
         }
         return report
 
-    def _generate_summary(self) -> Dict:
-        """生成汇总统计"""
-        total = len(self.records)
-        passed = sum(1 for r in self.records if r.status.value == "pass")
+    def _generate_summary(self, overall: np.ndarray = None, num_categories: int = None) -> Dict:
+        """
+        生成汇总统计
+        overall/num_categories 为已计算的总体矩阵和一级分类数, 缺省时重新统计
+        """
+        if overall is None:
+            overall = self._overall_counts()
+
+        # status由预期值与实际值是否一致决定, 通过数即矩阵对角线之和
+        total = int(overall.sum())
+        passed = int(np.trace(overall))
         failed = total - passed
 
         # 统计各维度
-        primary_categories = set(r.primary_category for r in self.records)
-        secondary_categories = set(r.secondary_category for r in self.records)
-        use_cases = set(r.use_case for r in self.records)
-        scenarios = set(r.scenario for r in self.records)
-        verticals = set(r.vertical for r in self.records)
-        factors = set(r.factor for r in self.records)
+        unique_count = self._unique_count
+        if num_categories is None:
+            num_categories = unique_count("primary_category")
 
         return {
             "total_records": total,
@@ -115,16 +236,140 @@ class ConfusionMatrixGenerator:
             "failed": failed,
             "accuracy": round(passed / total * 100, 2) if total > 0 else 0,
             "unique_counts": {
-                "primary_categories": len(primary_categories),
-                "secondary_categories": len(secondary_categories),
-                "use_cases": len(use_cases),
-                "scenarios": len(scenarios),
-                "verticals": len(verticals),
-                "factors": len(factors)
+                "primary_categories": num_categories,
+                "secondary_categories": unique_count("secondary_category"),
+                "use_cases": unique_count("use_case"),
+                "scenarios": unique_count("scenario"),
+                "verticals": unique_count("vertical"),
+                "factors": unique_count("factor")
             }
         }
 
 
+class CubeReportGenerator(ConfusionMatrixGenerator):
+    """
+    基于预聚合数据的报表生成器, 输出与ConfusionMatrixGenerator一致
+    - 无筛选条件: 直接读取增量维护的总体/一级分类计数, 不访问历史记录
+    - 有筛选条件: 累加满足条件的立方体单元格
+    统计基于仓库的一个只读快照; 若计算期间有写入开始 (预聚合数据可能已包含快照之后的行),
+    改为从快照的列数据重新计算, 保证结果与快照一致
+    """
+
+    def __init__(
+        self,
+        repository: Union[DataRepository, RepositorySnapshot],
+        filter_criteria: FilterCriteria = None
+    ):
+        self.records = None
+        self.value_range = range(0, 16)  # 0-15
+        self.snapshot = repository.snapshot()
+        self.cube = self.snapshot.cube
+        self.state = self.snapshot.state
+        self.filter_criteria = filter_criteria
+        self.conditions = self.snapshot.criteria_codes(filter_criteria) if filter_criteria else {}
+        self.use_aggregates = True
+        self.selection = None
+        self._cells = None
+
+    @property
+    def use_state(self) -> bool:
+        """是否可直接使用增量状态 (无筛选条件)"""
+        return self.use_aggregates and not self.conditions
+
+    def _fall_back_to_rows(self):
+        """改为基于快照列数据计算 (父类路径)"""
+        self.use_aggregates = False
+        self._cells = None
+        self.selection = self.snapshot.select(self.filter_criteria)
+
+    def _consistent(self, compute):
+        """
+        基于预聚合数据计算, 结束后确认快照仍是最新的
+        期间有写入开始时, 结果 (或并发扩容导致的异常) 作废, 改为从快照列数据重新计算
+        """
+        if self.use_aggregates:
+            try:
+                result = compute()
+            except Exception:
+                if self.snapshot.is_current():
+                    raise
+            else:
+                if self.snapshot.is_current():
+                    return result
+            self._fall_back_to_rows()
+        return compute()
+
+    def generate_matrix_by(self, dimensions: Sequence[str]) -> Dict:
+        return self._consistent(partial(super().generate_matrix_by, dimensions))
+
+    def generate_overall_matrix(self) -> Dict:
+        return self._consistent(super().generate_overall_matrix)
+
+    def generate_detailed_report(self) -> Dict:
+        return self._consistent(super().generate_detailed_report)
+
+    def _selected_cells(self):
+        """满足条件的 (单元格编码, 单元格计数), 首次使用时计算"""
+        if self._cells is None:
+            self._cells = self.cube.select(self.conditions)
+        return self._cells
+
+    @property
+    def cell_codes(self) -> np.ndarray:
+        return self._selected_cells()[0]
+
+    @property
+    def cell_counts(self) -> np.ndarray:
+        return self._selected_cells()[1]
+
+    @property
+    def total_records(self) -> int:
+        """满足条件的记录数"""
+        def count():
+            if not self.use_aggregates:
+                return len(self.selection)
+            if self.use_state:
+                return self.state.total_records
+            return int(self.cell_counts.sum())
+        return self._consistent(count)
+
+    def _grouped_counts(self, dimensions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        if self.use_state and list(dimensions) == [self.state.group_field]:
+            groups = self.state.groups
+            non_empty = np.flatnonzero(groups.reshape(len(groups), NUM_CLASSES * NUM_CLASSES).any(axis=1))
+            return groups[non_empty], non_empty.reshape(-1, 1)
+        return super()._grouped_counts(dimensions)
+
+    def _codes(self, field: str) -> np.ndarray:
+        if not self.use_aggregates:
+            return super()._codes(field)
+        return self.cell_codes[:, self.cube.fields.index(field)]
+
+    def _dictionary(self, field: str):
+        return self.snapshot.store.dictionaries[field]
+
+    def _count_groups(self, group_ids: np.ndarray, num_groups: int) -> np.ndarray:
+        if not self.use_aggregates:
+            return super()._count_groups(group_ids, num_groups)
+        tensor = np.zeros((num_groups, NUM_CLASSES * NUM_CLASSES), dtype=np.int64)
+        np.add.at(tensor, group_ids, self.cell_counts)
+        return tensor.reshape(num_groups, NUM_CLASSES, NUM_CLASSES)
+
+    def _overall_counts(self) -> np.ndarray:
+        if not self.use_aggregates:
+            return super()._overall_counts()
+        if self.use_state:
+            return self.state.overall.copy()
+        return self.cell_counts.sum(axis=0).reshape(NUM_CLASSES, NUM_CLASSES)
+
+    def _unique_count(self, field: str) -> int:
+        if not self.use_aggregates:
+            return super()._unique_count(field)
+        if self.use_state:
+            return int(np.count_nonzero(self.state.value_counts(field)))
+        return len(np.unique(self._codes(field)))
+
+
 class ReportFormatter:
     """报表格式化器"""
 
@@ -218,17 +463,16 @@ def generate_report_from_repository(
     Returns:
         格式化的报告字符串
     """
-    # 获取记录
-    if filter_criteria:
-        records = repository.filter_records(filter_criteria)
+    # 基于预聚合立方体统计; SQL仓库在数据库中聚合
+    if hasattr(repository, "report_generator"):
+        generator = repository.report_generator(filter_criteria)
     else:
-        records = repository.get_all_records()
+        generator = CubeReportGenerator(repository, filter_criteria)
 
-    if not records:
+    if generator.total_records == 0:
         return "没有找到匹配的记录"
 
     # 生成矩阵
-    generator = ConfusionMatrixGenerator(records)
     report_data = generator.generate_detailed_report()
 
     # 格式化输出
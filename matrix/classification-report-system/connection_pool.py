@@ -0,0 +1,128 @@
+"""
+数据库连接池
+固定上限的DB-API连接池: 按需创建连接, 归还后复用; 连接数达到上限时等待其他请求归还
+并发请求各自持有连接, 不会在同一个连接上串行执行
+"""
+from contextlib import contextmanager
+from typing import Callable
+import queue
+import sqlite3
+import threading
+
+
+class PoolTimeoutError(RuntimeError):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """
+    连接池
+    factory: 创建新连接的函数 (如 lambda: pymysql.connect(...))
+    max_size: 最大连接数
+    timeout: 连接全部被占用时的最长等待秒数
+    """
+
+    def __init__(self, factory: Callable, max_size: int = 4, timeout: float = 30.0):
+        if max_size <= 0:
+            raise ValueError("max_size必须为正整数")
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+
+    @classmethod
+    def sqlite(cls, database: str, max_size: int = 4, timeout: float = 30.0) -> "ConnectionPool":
+        """SQLite连接池 (连接可在线程间传递)"""
+        return cls(
+            lambda: sqlite3.connect(database, check_same_thread=False), max_size, timeout
+        )
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("连接池已关闭")
+            self._in_use += 1
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        try:
+            if create:
+                return self.factory()
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._in_use -= 1
+            raise PoolTimeoutError(f"{self.timeout}秒内没有空闲的数据库连接")
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._created -= create
+            raise
+
+    def _release(self, connection, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._created -= 1
+                close = True
+            else:
+                close = False
+        if close:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        else:
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        借出一个连接, 结束后归还
+        发生异常时回滚; 若连接已不可用则关闭并从池中移除
+        """
+        connection = self._acquire()
+        broken = False
+        try:
+            yield connection
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._release(connection, broken)
+
+    def stats(self) -> dict:
+        """连接池状态"""
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            }
+
+    def close(self):
+        """关闭所有空闲连接, 借出中的连接归还时关闭"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            connection.close()
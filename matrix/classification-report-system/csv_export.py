@@ -0,0 +1,108 @@
+"""
+CSV / TSV 流式导出
+由列式存储逐块解码详细数据并生成文本块 (可再经gzip压缩), 适用于超过Excel行数上限的大数据量导出;
+整个文件不会同时驻留内存, Web接口以分块响应边生成边下载
+"""
+from itertools import islice
+from typing import Iterable, Iterator, Optional, Sequence, Union
+import csv
+import io
+import zlib
+from data_model import DataRepository, RepositorySnapshot, FilterCriteria, RecordSelection
+from excel_exporter import DETAIL_CHUNK_SIZE, DETAIL_HEADERS, iter_detail_rows
+
+
+# 分隔符
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+# 表头: display 与Excel详细数据sheet一致, fields 为记录字段名 (与 to_dict 的键相同)
+DETAIL_FIELDS = [
+    "primary_category", "secondary_category", "expected_value", "actual_value", "status",
+    "use_case", "scenario", "vertical", "factor", "factor_value",
+    "test_id", "timestamp", "notes"
+]
+HEADERS = {"display": DETAIL_HEADERS, "fields": DETAIL_FIELDS}
+
+
+def iter_csv(
+    selection: RecordSelection,
+    delimiter: str = ",",
+    header: Optional[Sequence[str]] = DETAIL_HEADERS,
+    chunk_size: int = DETAIL_CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    逐块生成CSV文本 (每块chunk_size行, 首块含表头), 列顺序同Excel详细数据sheet
+    header为None时不输出表头
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+
+    rows = iter_detail_rows(selection, chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_encoded(chunks: Iterable[str], encoding: str = "utf-8", bom: bool = False) -> Iterator[bytes]:
+    """文本块编码为字节块; bom为True时在开头写入UTF-8 BOM (便于Excel识别中文)"""
+    if bom:
+        yield b"\xef\xbb\xbf"
+    for chunk in chunks:
+        yield chunk.encode(encoding)
+
+
+def iter_gzip(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """将字节块流式压缩为gzip格式"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(
+    repository: Union[DataRepository, RepositorySnapshot],
+    criteria: FilterCriteria = None,
+    data_format: str = "csv",
+    header: str = "display",
+    compress: bool = False,
+    bom: bool = False,
+    chunk_size: int = DETAIL_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    按条件导出仓库当前快照的详细数据, 逐块生成文件内容 (字节)
+    data_format: csv / tsv; header: display / fields / none; compress: 是否gzip压缩
+    """
+    if data_format not in DELIMITERS:
+        raise ValueError(f"不支持的导出格式: {data_format}")
+    if header not in HEADERS and header != "none":
+        raise ValueError(f"不支持的表头: {header}")
+    selection = repository.snapshot().select(criteria)
+    chunks = iter_encoded(
+        iter_csv(selection, DELIMITERS[data_format], HEADERS.get(header), chunk_size), bom=bom
+    )
+    return iter_gzip(chunks) if compress else chunks
+
+
+def write_csv(
+    repository: Union[DataRepository, RepositorySnapshot],
+    path: str,
+    criteria: FilterCriteria = None,
+    **options
+) -> str:
+    """导出到文件 (选项见 iter_export), 返回文件路径"""
+    with open(path, "wb") as f:
+        for chunk in iter_export(repository, criteria, **options):
+            f.write(chunk)
+    return path
@@ -2,9 +2,34 @@
 分类预测数据模型
 支持多维度筛选和混淆矩阵统计
 """
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Optional, List, Dict, Sequence, Tuple
+import sys
+import threading
 from enum import Enum
+import numpy as np
+from columnar_store import ColumnarStore, DictionaryEncodedColumn
+from inverted_index import InvertedIndex, STATUS_FIELD
+from aggregate_cube import ConfusionCube, IncrementalConfusionState
+
+
+# 字典编码的字符串维度
+DIMENSION_FIELDS = (
+    "primary_category",
+    "secondary_category",
+    "use_case",
+    "scenario",
+    "vertical",
+    "factor",
+    "factor_value",
+)
+
+# 可选扩展字段
+EXTRA_FIELDS = ("timestamp", "test_id", "notes")
+
+# 预期值/实际值的合法范围
+MIN_VALUE, MAX_VALUE = 0, 15
 
 
 class ResultStatus(Enum):
@@ -13,9 +38,13 @@ class ResultStatus(Enum):
     FAIL = "fail"
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassificationRecord:
-    """单条分类预测记录"""
+    """
+    单条分类预测记录
+    使用__slots__ (无实例__dict__), 维度字符串驻留以共享重复值;
+    status为ResultStatus单例引用, 与布尔标记占用相同
+    """
     # 基本分类信息
     primary_category: str      # 一级分类
     secondary_category: str    # 二级分类
@@ -45,6 +74,12 @@ class ClassificationRecord:
         if isinstance(self.status, str):
             self.status = ResultStatus(self.status)
 
+        # 维度字符串驻留: 百万级记录共享同一份取值
+        for field in DIMENSION_FIELDS:
+            value = getattr(self, field)
+            if type(value) is str:
+                setattr(self, field, sys.intern(value))
+
         # 验证值范围
         if not (0 <= self.expected_value <= 15):
             raise ValueError(f"expected_value必须在0-15之间，当前值: {self.expected_value}")
@@ -129,38 +164,589 @@ class FilterCriteria:
             return False
         return True
 
+    def cache_key(self) -> tuple:
+        """规范化的条件键 (忽略空条件), 用于结果缓存"""
+        key = tuple(
+            (field, getattr(self, field)) for field in DIMENSION_FIELDS if getattr(self, field)
+        )
+        if self.status:
+            key += (("status", ResultStatus(self.status).value),)
+        return key
+
+
+def record_from_row(data: dict) -> ClassificationRecord:
+    """由列式存储解码出的行字典构造记录"""
+    return ClassificationRecord(
+        primary_category=data["primary_category"],
+        secondary_category=data["secondary_category"],
+        expected_value=data["expected_value"],
+        actual_value=data["actual_value"],
+        status=ResultStatus.PASS if data["passed"] else ResultStatus.FAIL,
+        use_case=data["use_case"],
+        scenario=data["scenario"],
+        vertical=data["vertical"],
+        factor=data["factor"],
+        factor_value=data["factor_value"],
+        timestamp=data["timestamp"],
+        test_id=data["test_id"],
+        notes=data["notes"]
+    )
+
+
+class RecordSelection:
+    """
+    记录选择视图: 列式存储快照 + 行号数组
+    矩阵计算直接使用列数组, 仅在调用records()时物化对象
+    """
+
+    def __init__(self, store: ColumnarStore, rows: Optional[np.ndarray] = None):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.store.size if self.rows is None else len(self.rows)
+
+    def _take(self, column: np.ndarray) -> np.ndarray:
+        return column if self.rows is None else column[self.rows]
+
+    @property
+    def expected(self) -> np.ndarray:
+        return self._take(self.store.expected)
+
+    @property
+    def actual(self) -> np.ndarray:
+        return self._take(self.store.actual)
+
+    @property
+    def passed(self) -> np.ndarray:
+        return self._take(self.store.passed)
+
+    def codes(self, field: str) -> np.ndarray:
+        """维度编码列"""
+        return self._take(self.store.codes(field))
+
+    def dictionary(self, field: str):
+        """维度字典"""
+        return self.store.dictionaries[field]
+
+    def records(self) -> List[ClassificationRecord]:
+        """物化为记录对象"""
+        return [record_from_row(data) for data in self.store.rows(self.rows)]
+
+    @classmethod
+    def from_records(cls, records: List[ClassificationRecord]) -> "RecordSelection":
+        """由记录列表构建 (临时列式存储)"""
+        repository = DataRepository()
+        repository.add_records(records)
+        return cls(repository.store)
+
+
+class BulkValidationError(ValueError):
+    """批量导入校验失败, errors 列出全部无效行 (行号/字段/原因)"""
+
+    def __init__(self, errors: List[Dict]):
+        self.errors = errors
+        invalid_rows = len(set(error["row"] for error in errors))
+        preview = "; ".join(
+            f"第{e['row']}行 {e['field']}: {e['message']}" for e in errors[:5]
+        )
+        more = " ..." if len(errors) > 5 else ""
+        super().__init__(f"{invalid_rows} 条记录校验失败: {preview}{more}")
+
+
+def _validate_values(values: Sequence, field: str, errors: List[Dict]) -> np.ndarray:
+    """校验预期值/实际值列为0-15的整数, 返回int64数组 (无效位置为0)"""
+    array = np.asarray(values) if len(values) else np.empty(0, dtype=np.int64)
+    if array.ndim != 1 or array.dtype.kind not in "iuf":
+        # 含非数值元素: 逐个转换以定位无效行
+        converted = np.zeros(len(values), dtype=np.float64)
+        for row, value in enumerate(values):
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+                converted[row] = value
+            else:
+                converted[row] = np.nan
+                errors.append({"row": row, "field": field, "message": f"不是整数: {value!r}"})
+        array = converted
+        not_number = np.isnan(array)
+    else:
+        not_number = np.zeros(len(array), dtype=bool)
+
+    if array.dtype.kind == "f":
+        non_integral = ~not_number & (array != np.floor(array))
+        for row in np.flatnonzero(non_integral).tolist():
+            errors.append({"row": row, "field": field, "message": f"不是整数: {values[row]!r}"})
+        not_number |= non_integral
+
+    out_of_range = ~not_number & ((array < MIN_VALUE) | (array > MAX_VALUE))
+    for row in np.flatnonzero(out_of_range).tolist():
+        errors.append({
+            "row": row,
+            "field": field,
+            "message": f"必须在{MIN_VALUE}-{MAX_VALUE}之间，当前值: {values[row]}"
+        })
+
+    valid = ~(not_number | out_of_range)
+    return np.where(valid, array, 0).astype(np.int64)
+
+
+def columns_from_dicts(rows: Sequence[Dict]) -> Dict[str, List]:
+    """将字典记录 (与to_dict格式相同) 转换为 ingest_columns 的列字典, 非字典行各字段为None"""
+    fields = ("expected_value", "actual_value", "status") + DIMENSION_FIELDS + EXTRA_FIELDS
+    return {
+        field: [row.get(field) if isinstance(row, dict) else None for row in rows]
+        for field in fields
+    }
+
+
+def validate_columns(columns: Dict[str, Sequence], skip_invalid: bool = False) -> Tuple[Dict, Dict]:
+    """
+    校验批量导入的列数据 (规则见 DataRepository.ingest_columns)
+    返回 (有效行的列数据 {"expected", "actual", "passed", "dimensions", "extras"},
+          {"accepted", "rejected", "errors"})
+    """
+    required = ("expected_value", "actual_value") + DIMENSION_FIELDS
+    missing = [field for field in required if field not in columns]
+    if missing:
+        raise ValueError(f"缺少必需的列: {', '.join(missing)}")
+
+    count = len(columns["expected_value"])
+    for field, values in columns.items():
+        if values is not None and len(values) != count:
+            raise ValueError(f"列 {field} 的长度 {len(values)} 与记录数 {count} 不一致")
+
+    errors: List[Dict] = []
+    expected = _validate_values(columns["expected_value"], "expected_value", errors)
+    actual = _validate_values(columns["actual_value"], "actual_value", errors)
+
+    statuses = columns.get("status")
+    if statuses is not None:
+        valid_status = {"pass", "fail", ResultStatus.PASS, ResultStatus.FAIL}
+        errors.extend(
+            {"row": row, "field": "status", "message": f"无效的状态: {statuses[row]!r}"}
+            for row in _rows_where(
+                statuses,
+                lambda value: value is not None
+                and not (isinstance(value, (str, ResultStatus)) and value in valid_status)
+            )
+        )
+
+    # 维度必须为字符串, 扩展字段为字符串或空 (其他类型不做隐式转换, 按无效行报告)
+    for field in DIMENSION_FIELDS:
+        values = columns[field]
+        errors.extend(
+            {
+                "row": row,
+                "field": field,
+                "message": "缺少字段值" if values[row] is None else f"不是字符串: {values[row]!r}"
+            }
+            for row in _rows_where(values, lambda value: not isinstance(value, str))
+        )
+    for field in EXTRA_FIELDS:
+        values = columns.get(field)
+        if values is not None:
+            errors.extend(
+                {"row": row, "field": field, "message": f"不是字符串: {values[row]!r}"}
+                for row in _rows_where(values, lambda value: value is not None and not isinstance(value, str))
+            )
+
+    invalid_rows = sorted(set(error["row"] for error in errors))
+    if invalid_rows and not skip_invalid:
+        raise BulkValidationError(sorted(errors, key=lambda e: e["row"]))
+
+    dimensions = {field: columns[field] for field in DIMENSION_FIELDS}
+    extras = {field: columns.get(field) for field in EXTRA_FIELDS}
+    if invalid_rows:
+        keep = np.ones(count, dtype=bool)
+        keep[invalid_rows] = False
+        kept_rows = np.flatnonzero(keep).tolist()
+        expected, actual = expected[keep], actual[keep]
+        dimensions = {
+            f: (v.take(kept_rows) if isinstance(v, DictionaryEncodedColumn) else [v[i] for i in kept_rows])
+            for f, v in dimensions.items()
+        }
+        extras = {
+            f: ([v[i] for i in kept_rows] if v is not None else None)
+            for f, v in extras.items()
+        }
+
+    prepared = {
+        "expected": expected.astype(np.uint8),
+        "actual": actual.astype(np.uint8),
+        # status由预期值与实际值是否一致决定
+        "passed": expected == actual,
+        "dimensions": dimensions,
+        "extras": extras,
+    }
+    return prepared, {
+        "accepted": int(len(expected)),
+        "rejected": len(invalid_rows),
+        "errors": sorted(errors, key=lambda e: e["row"])
+    }
+
+
+def _rows_where(values: Sequence, predicate) -> List[int]:
+    """值满足predicate的行号; 字典编码列按不同取值判断"""
+    if isinstance(values, DictionaryEncodedColumn):
+        return values.rows_where(predicate).tolist()
+    return [row for row, value in enumerate(values) if predicate(value)]
+
+
+class RepositorySnapshot:
+    """
+    数据仓库某一已提交版本的只读快照, 读取不加锁且不会看到写入一半的批次
+    - 列数据: 之后的写入只发生在快照行数之外或新分配的数组中, 快照内容不变
+    - 倒排索引: 行号数组只追加, 查询时按快照行数截断
+    - 立方体/增量状态: 由写入方原地累加, 基于它们的计算结束后需用 is_current() 确认期间没有写入开始
+    """
+
+    def __init__(
+        self,
+        repository: "DataRepository",
+        store: ColumnarStore,
+        index: InvertedIndex,
+        cube: ConfusionCube,
+        state: IncrementalConfusionState,
+        version: int,
+        write_seq: int
+    ):
+        self._repository = repository
+        self.store = store
+        self.index = index
+        self.cube = cube
+        self.state = state
+        self.version = version
+        self._write_seq = write_seq
+        # 字典只追加, 记录快照时的长度以过滤之后新增的取值
+        self._dictionary_sizes = {f: len(d) for f, d in store.dictionaries.items()}
+        self._records_cache: Optional[List[ClassificationRecord]] = None
+
+    def __len__(self) -> int:
+        return self.store.size
+
+    def snapshot(self) -> "RepositorySnapshot":
+        """与DataRepository接口一致, 返回自身"""
+        return self
+
+    def is_current(self) -> bool:
+        """快照之后是否还没有写入开始 (立方体/增量状态仍与快照一致)"""
+        return self._repository._write_seq == self._write_seq
+
+    def dictionary_values(self, field: str) -> List[str]:
+        """维度在快照中的取值 (按编码排列)"""
+        return self.store.dictionaries[field].values[:self._dictionary_sizes[field]]
+
+    def criteria_codes(self, criteria: FilterCriteria) -> dict:
+        """将筛选条件转换为 {字段: 编码}, 值不存在时编码为None"""
+        conditions = {}
+        for field in DIMENSION_FIELDS:
+            value = getattr(criteria, field)
+            if value:
+                code = self.store.dictionaries[field].lookup(value)
+                if code is not None and code >= self._dictionary_sizes[field]:
+                    code = None  # 快照之后才出现的取值
+                conditions[field] = code
+        if criteria.status:
+            conditions[STATUS_FIELD] = int(ResultStatus(criteria.status) == ResultStatus.PASS)
+        return conditions
+
+    def match_rows(self, criteria: FilterCriteria) -> np.ndarray:
+        """根据条件返回匹配的行号数组 (升序)"""
+        return self.index.match(self.criteria_codes(criteria), self.store.size)
+
+    def select(self, criteria: FilterCriteria = None) -> RecordSelection:
+        """返回筛选结果的列式视图 (不物化记录)"""
+        rows = self.match_rows(criteria) if criteria else None
+        return RecordSelection(self.store, rows)
+
+    def materialize(self, rows: Optional[np.ndarray]) -> List[ClassificationRecord]:
+        """将行号物化为记录对象 (None表示全部行)"""
+        return [record_from_row(data) for data in self.store.rows(rows)]
+
+    def filter_records(self, criteria: FilterCriteria) -> List[ClassificationRecord]:
+        """根据条件筛选记录"""
+        return self.materialize(self.match_rows(criteria))
+
+    def get_all_records(self) -> List[ClassificationRecord]:
+        """获取所有记录 (首次访问时物化)"""
+        if self._records_cache is None:
+            self._records_cache = self.materialize(None)
+        return self._records_cache
+
+    def get_unique_values(self, field: str) -> List[str]:
+        """获取某个字段的所有唯一值"""
+        if field in DIMENSION_FIELDS:
+            return sorted({str(v) for v in self.dictionary_values(field) if v})
+
+        values = set()
+        for record in self.get_all_records():
+            value = getattr(record, field, None)
+            if value:
+                values.add(str(value))
+        return sorted(list(values))
+
 
 class DataRepository:
-    """数据仓库"""
+    """
+    数据仓库
+    记录按列存储 (见 columnar_store.ColumnarStore), 仅在需要对象时才物化为ClassificationRecord
+    各维度维护倒排索引 (见 inverted_index.InvertedIndex), 筛选为行号集合求交
+    同时维护按维度组合预聚合的混淆计数立方体 (见 aggregate_cube.ConfusionCube)
+    以及总体/按一级分类的增量混淆计数 (见 aggregate_cube.IncrementalConfusionState)
+
+    并发模型: 写入方之间用锁串行, 每次写入完成后发布新的只读快照 (RepositorySnapshot);
+    读取方法都作用于调用时已发布的快照, 不加锁, 不会阻塞写入也不会被写入阻塞
+    """
 
     def __init__(self):
-        self.records: List[ClassificationRecord] = []
+        self._write_lock = threading.RLock()
+        # 写入序号, 每次写入开始时递增, 快照据此判断立方体/增量状态是否已被改动
+        self._write_seq = 0
+        # 数据版本号, 每次写入 (添加/清空) 递增, 用于缓存失效
+        self.version = 0
+        self._reset()
+        self._publish()
+
+    @classmethod
+    def from_parts(
+        cls,
+        store: ColumnarStore,
+        index: InvertedIndex,
+        cube: ConfusionCube,
+        state: IncrementalConfusionState,
+        version: Optional[int] = None
+    ) -> "DataRepository":
+        """
+        由已构建好的存储/索引/立方体/增量状态组装仓库 (如从数据集文件加载)
+        version: 组装后的数据版本 (如与数据库中数据的版本对应), 默认为1
+        """
+        repository = cls()
+        with repository._writing():
+            repository._store, repository._index, repository._cube, repository._state = (
+                store, index, cube, state
+            )
+            if version is not None:
+                # 写入区间结束时递增
+                repository.version = version - 1
+        return repository
+
+    def save(self, path: str) -> int:
+        """将当前快照保存为二进制数据集文件 (见 dataset_format), 返回文件字节数"""
+        from dataset_format import save_dataset
+        return save_dataset(self, path)
+
+    @classmethod
+    def open(cls, path: str) -> "DataRepository":
+        """以内存映射方式打开数据集文件, 列数据与索引按需分页读入, 不整体载入内存"""
+        from dataset_format import open_dataset
+        return open_dataset(path)
+
+    def import_parquet(self, path: str, **options) -> Dict:
+        """按行组流式追加Parquet文件中的记录 (见 arrow_io.read_parquet)"""
+        from arrow_io import read_parquet
+        return read_parquet(self, path, **options)
+
+    def export_parquet(self, path: str, criteria: FilterCriteria = None, **options) -> int:
+        """导出为Parquet文件 (见 arrow_io.write_parquet), 返回导出行数"""
+        from arrow_io import write_parquet
+        return write_parquet(self, path, criteria, **options)
+
+    def import_arrow(self, path: str, **options) -> Dict:
+        """追加Arrow IPC文件中的记录 (见 arrow_io.read_arrow)"""
+        from arrow_io import read_arrow
+        return read_arrow(self, path, **options)
+
+    def export_arrow(self, path: str, criteria: FilterCriteria = None, **options) -> int:
+        """导出为Arrow IPC文件 (见 arrow_io.write_arrow), 返回导出行数"""
+        from arrow_io import write_arrow
+        return write_arrow(self, path, criteria, **options)
+
+    def _reset(self):
+        """创建新的空结构 (旧结构仍被已发布的快照引用, 不原地清空)"""
+        self._store = ColumnarStore(DIMENSION_FIELDS, EXTRA_FIELDS)
+        self._index = InvertedIndex(DIMENSION_FIELDS)
+        self._cube = ConfusionCube(DIMENSION_FIELDS)
+        self._state = IncrementalConfusionState(DIMENSION_FIELDS)
+
+    def _publish(self):
+        self._snapshot = RepositorySnapshot(
+            self, self._store.snapshot(), self._index, self._cube, self._state,
+            self.version, self._write_seq
+        )
+
+    @contextmanager
+    def _writing(self):
+        """
+        写入区间: 串行化写入方, 完成后递增版本并发布新快照
+        写入失败时回滚本次追加的数据后重新发布 (版本不变), 之后的快照仍可使用立方体
+        """
+        with self._write_lock:
+            self._write_seq += 1
+            store = self._store
+            size = store.size
+            dictionary_sizes = {field: len(d) for field, d in store.dictionaries.items()}
+            try:
+                yield
+                self.version += 1
+            except BaseException:
+                if self._store is store:
+                    self._rollback(size, dictionary_sizes)
+                raise
+            finally:
+                self._publish()
+
+    def _rollback(self, size: int, dictionary_sizes: Dict[str, int]):
+        """撤销失败写入追加的行; 行已追加时索引/立方体/增量状态可能已部分更新, 按回滚后的数据重建"""
+        grown = self._store.size != size
+        self._store.truncate(size, dictionary_sizes)
+        if grown:
+            self._index = InvertedIndex(DIMENSION_FIELDS)
+            self._cube = ConfusionCube(DIMENSION_FIELDS)
+            self._state = IncrementalConfusionState(DIMENSION_FIELDS)
+            for structure in (self._index, self._cube, self._state):
+                structure.update(self._store, 0, size)
+
+    def snapshot(self) -> RepositorySnapshot:
+        """当前已提交数据的只读快照"""
+        return self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    @property
+    def store(self) -> ColumnarStore:
+        """底层列式存储"""
+        return self._store
+
+    @property
+    def cube(self) -> ConfusionCube:
+        """预聚合混淆计数立方体"""
+        return self._cube
+
+    @property
+    def state(self) -> IncrementalConfusionState:
+        """增量维护的总体/分组混淆计数"""
+        return self._state
+
+    @property
+    def records(self) -> List[ClassificationRecord]:
+        """兼容旧接口: 物化后的全部记录"""
+        return self.get_all_records()
 
     def add_record(self, record: ClassificationRecord):
         """添加记录"""
-        self.records.append(record)
+        with self._writing():
+            row = self._store.append(
+                record.expected_value,
+                record.actual_value,
+                record.status == ResultStatus.PASS,
+                {field: getattr(record, field) for field in DIMENSION_FIELDS},
+                {field: getattr(record, field) for field in EXTRA_FIELDS}
+            )
+            self._index.update(self._store, row, row + 1)
+            self._cube.update(self._store, row, row + 1)
+            self._state.update(self._store, row, row + 1)
 
     def add_records(self, records: List[ClassificationRecord]):
         """批量添加记录"""
-        self.records.extend(records)
+        if not records:
+            return
+        self._append_columns(
+            [r.expected_value for r in records],
+            [r.actual_value for r in records],
+            [r.status == ResultStatus.PASS for r in records],
+            {field: [getattr(r, field) for r in records] for field in DIMENSION_FIELDS},
+            {field: [getattr(r, field) for r in records] for field in EXTRA_FIELDS}
+        )
+
+    def _append_columns(self, expected, actual, passed, dimensions: Dict, extras: Dict):
+        """追加已校验的列数据并更新索引/立方体/增量状态"""
+        with self._writing():
+            start, stop = self._store.extend(expected, actual, passed, dimensions, extras)
+            self._index.update(self._store, start, stop)
+            self._cube.update(self._store, start, stop)
+            self._state.update(self._store, start, stop)
+
+    def ingest_columns(self, columns: Dict[str, Sequence], skip_invalid: bool = False) -> Dict:
+        """
+        批量导入列数据, 不逐条构造ClassificationRecord
+        columns: {字段名: 值序列}, 需包含expected_value/actual_value及全部维度字段;
+                 status可选 (若提供须为pass/fail), 实际以预期值与实际值是否一致为准
+                 维度值须为字符串, 扩展字段 (timestamp/test_id/notes) 须为字符串或None
+                 维度/状态列可以是DictionaryEncodedColumn (如Parquet字典列), 按不同取值编码与校验
+        skip_invalid: False时任一行无效即抛出BulkValidationError (不导入任何行);
+                      True时仅导入有效行
+        返回: {"accepted": 导入行数, "rejected": 无效行数, "errors": [...]}
+        """
+        prepared, result = validate_columns(columns, skip_invalid)
+        if result["accepted"]:
+            self._append_columns(**prepared)
+        return result
+
+    def ingest_dicts(self, rows: Sequence[Dict], skip_invalid: bool = False) -> Dict:
+        """
+        批量导入字典记录 (与to_dict格式相同), 见 ingest_columns
+        """
+        return self.ingest_columns(columns_from_dicts(rows), skip_invalid=skip_invalid)
+
+    # ---- 读取 (作用于当前快照) ----
+
+    def criteria_codes(self, criteria: FilterCriteria) -> dict:
+        """将筛选条件转换为 {字段: 编码}, 值不存在时编码为None"""
+        return self._snapshot.criteria_codes(criteria)
+
+    def match_rows(self, criteria: FilterCriteria) -> np.ndarray:
+        """根据条件返回匹配的行号数组 (升序)"""
+        return self._snapshot.match_rows(criteria)
+
+    def select(self, criteria: FilterCriteria = None) -> RecordSelection:
+        """返回筛选结果的列式视图 (不物化记录)"""
+        return self._snapshot.select(criteria)
+
+    def materialize(self, rows: Optional[np.ndarray]) -> List[ClassificationRecord]:
+        """将行号物化为记录对象 (None表示全部行)"""
+        return self._snapshot.materialize(rows)
 
     def filter_records(self, criteria: FilterCriteria) -> List[ClassificationRecord]:
         """根据条件筛选记录"""
-        return [record for record in self.records if criteria.matches(record)]
+        return self._snapshot.filter_records(criteria)
 
     def get_all_records(self) -> List[ClassificationRecord]:
-        """获取所有记录"""
-        return self.records
+        """获取所有记录 (每个快照首次访问时物化)"""
+        return self._snapshot.get_all_records()
+
+    def replace_with(self, other: "DataRepository"):
+        """
+        用离线构建完成的仓库 (新一代数据) 整体替换当前数据
+        新数据的导入与索引全部在other中完成, 这里只交换引用, 替换前的读取始终看到完整的旧数据
+        替换后other与当前仓库共享底层结构, 不应再向other写入
+        """
+        if other is self:
+            return
+        with self._writing():
+            self._store, self._index, self._cube, self._state = (
+                other._store, other._index, other._cube, other._state
+            )
+            # 版本号必须大于两者, 避免与替换前缓存的结果冲突
+            self.version = max(self.version, other.version)
+
+    def append_from(self, other: "DataRepository") -> int:
+        """将另一仓库的全部记录作为一个批次追加到当前数据, 返回追加的行数"""
+        store = other.snapshot().store
+        if store.size == 0:
+            return 0
+        dimensions = {
+            field: [store.dictionaries[field].values[c] for c in store.codes(field).tolist()]
+            for field in DIMENSION_FIELDS
+        }
+        extras = {field: store.extras(field)[:store.size] for field in EXTRA_FIELDS}
+        self._append_columns(store.expected, store.actual, store.passed, dimensions, extras)
+        return store.size
 
     def clear(self):
         """清空所有记录"""
-        self.records.clear()
+        with self._writing():
+            self._reset()
 
     def get_unique_values(self, field: str) -> List[str]:
         """获取某个字段的所有唯一值"""
-        values = set()
-        for record in self.records:
-            value = getattr(record, field, None)
-            if value:
-                values.add(str(value))
-        return sorted(list(values))
+        return self._snapshot.get_unique_values(field)
@@ -0,0 +1,259 @@
+"""
+二进制数据集格式
+将数据仓库的一个快照 (列数据 + 倒排索引 + 预聚合计数) 连续写入一块缓冲区/文件,
+加载时直接在缓冲区 (共享内存/内存映射) 上建立NumPy视图, 列数据和索引不复制
+
+布局:
+    MAGIC (8字节) | 头部长度 (uint64, 小端) | 头部JSON (UTF-8) | 填充 | 数组1 | 填充 | 数组2 ...
+头部JSON记录行数、字段、维度字典取值以及各数组的 dtype/shape/偏移量, 数组按64字节对齐
+维度编码列按字典大小使用int8/int16/int32, 索引行号与字符串偏移量在取值允许时使用较窄的整数类型
+"""
+from typing import Dict, List, Tuple, Union
+import json
+import mmap
+import os
+import struct
+import tempfile
+import numpy as np
+from columnar_store import ColumnarStore, DimensionDictionary, EncodedStringColumn
+from inverted_index import InvertedIndex
+from aggregate_cube import ConfusionCube, IncrementalConfusionState
+from data_model import DataRepository, RepositorySnapshot, DIMENSION_FIELDS, EXTRA_FIELDS
+
+
+MAGIC = b"CRSDSET1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_PREFIX = struct.Struct("<8sQ")
+
+
+class DatasetFormatError(ValueError):
+    """数据集文件/缓冲区格式错误"""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _narrow(array: np.ndarray, max_value: int) -> np.ndarray:
+    """按取值上限选用最窄的有符号整数类型"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return array.astype(dtype, copy=False)
+    return array
+
+
+def dataset_arrays(
+    repository: Union[DataRepository, RepositorySnapshot]
+) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """将仓库当前快照展开为 (头部元数据, {数组名: 数组})"""
+    snapshot = repository.snapshot()
+    store = snapshot.store
+    size = store.size
+
+    arrays: Dict[str, np.ndarray] = {
+        "expected": store.expected,
+        "actual": store.actual,
+        "passed": store.passed,
+    }
+    for field in DIMENSION_FIELDS:
+        arrays[f"codes/{field}"] = _narrow(store.codes(field), len(snapshot.dictionary_values(field)))
+    for field in EXTRA_FIELDS:
+        column = store.extras(field)
+        encoded = column.encoded(size) if isinstance(column, EncodedStringColumn) else None
+        data, offsets, null = encoded or EncodedStringColumn.encode(column[:size])
+        arrays[f"extras/{field}/data"] = data
+        arrays[f"extras/{field}/offsets"] = _narrow(offsets, int(offsets[-1]))
+        arrays[f"extras/{field}/null"] = null
+
+    index, cube, state = snapshot.index, snapshot.cube, snapshot.state
+    derived = _derived_arrays(index, cube, state, size)
+    if not snapshot.is_current():
+        # 导出期间有写入开始, 索引/预聚合数据可能已包含快照之后的行, 改为从快照列数据重建
+        index = InvertedIndex(DIMENSION_FIELDS)
+        cube = ConfusionCube(DIMENSION_FIELDS)
+        state = IncrementalConfusionState(DIMENSION_FIELDS, state.group_field)
+        for structure in (index, cube, state):
+            structure.update(store, 0, size)
+        derived = _derived_arrays(index, cube, state, size)
+    arrays.update(derived)
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "size": size,
+        "dimension_fields": list(DIMENSION_FIELDS),
+        "extra_fields": list(EXTRA_FIELDS),
+        "dictionaries": {field: snapshot.dictionary_values(field) for field in DIMENSION_FIELDS},
+        "group_field": state.group_field,
+    }
+    return metadata, arrays
+
+
+def _derived_arrays(
+    index: InvertedIndex,
+    cube: ConfusionCube,
+    state: IncrementalConfusionState,
+    size: int
+) -> Dict[str, np.ndarray]:
+    """索引与预聚合计数的数组 (均为副本, 不受之后写入影响)"""
+    arrays = {}
+    for field in index.fields:
+        rows, offsets = index.to_arrays(field)
+        arrays[f"index/{field}/rows"] = _narrow(rows, size)
+        arrays[f"index/{field}/offsets"] = offsets
+    arrays["cube/cell_codes"] = cube.cell_codes.copy()
+    arrays["cube/counts"] = cube.counts.copy()
+    arrays["state/overall"] = state.overall.copy()
+    arrays["state/groups"] = state.groups.copy()
+    for field in DIMENSION_FIELDS:
+        arrays[f"state/value_counts/{field}"] = state.value_counts(field).copy()
+    return arrays
+
+
+def plan_layout(metadata: Dict, arrays: Dict[str, np.ndarray]) -> Tuple[bytes, List, int]:
+    """
+    计算布局
+    返回 (MAGIC + 头部长度 + 头部JSON, [(偏移量, 数组)], 总字节数)
+    """
+    # 数组区从头部之后开始, 头部长度依赖偏移量, 先按数组相对偏移计算
+    entries = {}
+    placements = []
+    relative = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        relative = _align(relative)
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": relative,
+        }
+        placements.append((relative, array))
+        relative += array.nbytes
+
+    header = json.dumps(
+        dict(metadata, arrays=entries), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    data_start = _align(_PREFIX.size + len(header))
+    prefix = _PREFIX.pack(MAGIC, len(header)) + header
+
+    # 头部中的偏移量为相对数组区的偏移, 加载时加上数组区起点
+    placements = [(data_start + offset, array) for offset, array in placements]
+    return prefix, placements, data_start + relative
+
+
+def write_dataset(buffer, prefix: bytes, placements: List) -> None:
+    """将布局写入可写缓冲区 (长度不小于总字节数)"""
+    view = memoryview(buffer).cast("B")
+    view[:len(prefix)] = prefix
+    for offset, array in placements:
+        view[offset:offset + array.nbytes] = array.reshape(-1).view(np.uint8)
+
+
+def read_header(buffer) -> Tuple[Dict, int]:
+    """解析头部, 返回 (头部元数据, 数组区起点)"""
+    view = memoryview(buffer).cast("B")
+    if len(view) < _PREFIX.size:
+        raise DatasetFormatError("数据集过短")
+    magic, header_length = _PREFIX.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise DatasetFormatError("不是数据集格式 (MAGIC不匹配)")
+    header = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + header_length]).decode("utf-8"))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise DatasetFormatError(f"不支持的数据集版本: {header.get('format_version')}")
+    return header, _align(_PREFIX.size + header_length)
+
+
+def save_dataset(repository: Union[DataRepository, RepositorySnapshot], path: str) -> int:
+    """
+    将仓库当前快照保存为数据集文件, 返回文件字节数
+    先写同目录下的独立临时文件再改名: 同一路径上的读取方不会看到写了一半的文件,
+    并发保存互不干扰 (后改名者的内容生效); 写入失败时删除临时文件
+    """
+    metadata, arrays = dataset_arrays(repository)
+    prefix, placements, total = plan_layout(metadata, arrays)
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+    try:
+        with open(fd, "wb+") as f:
+            f.truncate(total)
+            with mmap.mmap(f.fileno(), total) as buffer:
+                write_dataset(buffer, prefix, placements)
+                buffer.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return total
+
+
+def open_dataset(path: str) -> DataRepository:
+    """
+    以只读内存映射方式打开数据集文件
+    列数据按需分页读入; 仓库不再使用后映射自动释放, 文件被删除/替换后已打开的映射仍然有效
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return load_dataset(buffer)
+
+
+def load_dataset(buffer) -> DataRepository:
+    """
+    在缓冲区上加载数据集为数据仓库
+    列数据/字符串列/倒排索引/立方体直接引用缓冲区 (不复制, NumPy视图持有缓冲区的引用);
+    增量状态体积很小, 复制一份
+    加载后的仓库可以继续写入: 追加/累加前会分配新数组, 不会修改缓冲区
+    """
+    header, data_start = read_header(buffer)
+    if header["dimension_fields"] != list(DIMENSION_FIELDS) or \
+            header["extra_fields"] != list(EXTRA_FIELDS):
+        raise DatasetFormatError("数据集字段与当前数据模型不一致")
+
+    def array(name: str) -> np.ndarray:
+        entry = header["arrays"][name]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        result = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + entry["offset"])
+        if result.flags.writeable:
+            # 共享缓冲区上的视图只读, 防止原地修改影响其他进程
+            result = result.view()
+            result.flags.writeable = False
+        return result.reshape(entry["shape"])
+
+    store = ColumnarStore.from_columns(
+        DIMENSION_FIELDS,
+        EXTRA_FIELDS,
+        expected=array("expected"),
+        actual=array("actual"),
+        passed=array("passed"),
+        codes={field: array(f"codes/{field}") for field in DIMENSION_FIELDS},
+        dictionaries={
+            field: DimensionDictionary.from_values(header["dictionaries"][field])
+            for field in DIMENSION_FIELDS
+        },
+        extras={
+            field: EncodedStringColumn(
+                array(f"extras/{field}/data"),
+                array(f"extras/{field}/offsets"),
+                array(f"extras/{field}/null"),
+            )
+            for field in EXTRA_FIELDS
+        }
+    )
+    index = InvertedIndex.from_arrays(DIMENSION_FIELDS, {
+        field: (array(f"index/{field}/rows"), array(f"index/{field}/offsets"))
+        for field in InvertedIndex(DIMENSION_FIELDS).fields
+    })
+    cube = ConfusionCube.from_arrays(DIMENSION_FIELDS, array("cube/cell_codes"), array("cube/counts"))
+    state = IncrementalConfusionState.from_arrays(
+        DIMENSION_FIELDS,
+        array("state/overall"),
+        array("state/groups"),
+        {field: array(f"state/value_counts/{field}") for field in DIMENSION_FIELDS},
+        group_field=header["group_field"]
+    )
+    return DataRepository.from_parts(store, index, cube, state)
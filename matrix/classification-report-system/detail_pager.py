@@ -0,0 +1,209 @@
+"""
+详细数据游标分页
+匹配行号由倒排索引求得 (可选按任意字段排序), 排序结果与总数可按 (数据版本, 条件, 排序) 缓存;
+每页只物化本页的记录。续页令牌记录上一页末行的 (排序值, 行号), 按键集定位下一页起点,
+数据追加后继续翻页不会跳过或重复已有记录
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Union
+import base64
+import hashlib
+import json
+import numpy as np
+from data_model import (
+    DataRepository, RepositorySnapshot, FilterCriteria, DIMENSION_FIELDS, EXTRA_FIELDS
+)
+from report_cache import ReportCache, approximate_size
+
+
+# 可排序字段
+SORT_FIELDS = ("expected_value", "actual_value", "status") + DIMENSION_FIELDS + EXTRA_FIELDS
+
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursorError(ValueError):
+    """续页令牌无效, 或与本次的筛选条件/排序不一致"""
+
+
+class DetailOrder:
+    """
+    筛选结果的行顺序
+    rows: 按顺序排列的行号; 排序时 keys 为对应的排序键 (升序, 降序时已反转), values 为排序字段的不同取值 (升序)
+    同一排序值按行号升序排列
+    """
+
+    def __init__(
+        self,
+        rows: np.ndarray,
+        keys: Optional[np.ndarray] = None,
+        values: Optional[List] = None,
+        descending: bool = False
+    ):
+        self.rows = rows
+        self.keys = keys
+        self.values = values
+        self.descending = descending
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        """估算占用的内存 (字节), 供缓存按大小限制"""
+        total = self.rows.nbytes
+        if self.keys is not None:
+            total += self.keys.nbytes + approximate_size(self.values)
+        return total
+
+    def value_at(self, position: int):
+        """某位置的排序值 (未排序时为None)"""
+        if self.keys is None:
+            return None
+        key = int(self.keys[position])
+        return self.values[len(self.values) - 1 - key if self.descending else key]
+
+    def start_after(self, value, row: int) -> int:
+        """(排序值, 行号) 之后第一行的位置; 排序值不在当前数据中时定位到其应处的位置"""
+        if self.keys is None:
+            return int(np.searchsorted(self.rows, row, side="right"))
+
+        rank = bisect_left(self.values, value)
+        if rank == len(self.values) or self.values[rank] != value:
+            key = len(self.values) - rank if self.descending else rank
+            return int(np.searchsorted(self.keys, key, side="left"))
+
+        key = len(self.values) - 1 - rank if self.descending else rank
+        low = int(np.searchsorted(self.keys, key, side="left"))
+        high = int(np.searchsorted(self.keys, key, side="right"))
+        return low + int(np.searchsorted(self.rows[low:high], row, side="right"))
+
+
+def _sort_ranks(snapshot: RepositorySnapshot, rows: np.ndarray, field: str):
+    """各行排序字段的名次 (按取值升序) 及不同取值列表; 空值按空字符串排序"""
+    store = snapshot.store
+    if field in DIMENSION_FIELDS:
+        dictionary = ["" if v is None else v for v in snapshot.dictionary_values(field)]
+        values = sorted(set(dictionary))
+        position = {value: rank for rank, value in enumerate(values)}
+        code_ranks = np.array([position[v] for v in dictionary], dtype=np.int64)
+        return code_ranks[store.codes(field)[rows]], values
+
+    if field in EXTRA_FIELDS:
+        column = store.extras(field)
+        column = np.array(["" if column[i] is None else str(column[i]) for i in rows.tolist()], dtype=object)
+    elif field == "status":
+        # fail < pass
+        column = store.passed[rows].astype(np.int64)
+    else:
+        column = (store.expected if field == "expected_value" else store.actual)[rows]
+    values, ranks = np.unique(column, return_inverse=True)
+    return ranks.astype(np.int64), values.tolist()
+
+
+def build_order(
+    repository: Union[DataRepository, RepositorySnapshot],
+    criteria: FilterCriteria = None,
+    sort_by: str = None,
+    descending: bool = False
+) -> DetailOrder:
+    """计算筛选结果的行顺序 (默认按行号, 即导入顺序)"""
+    if sort_by is not None and sort_by not in SORT_FIELDS:
+        raise ValueError(f"不支持的排序字段: {sort_by}")
+    snapshot = repository.snapshot()
+    rows = snapshot.match_rows(criteria) if criteria else np.arange(len(snapshot), dtype=np.int64)
+    if sort_by is None:
+        return DetailOrder(rows)
+
+    ranks, values = _sort_ranks(snapshot, rows, sort_by)
+    keys = len(values) - 1 - ranks if descending else ranks
+    order = np.lexsort((rows, keys))
+    return DetailOrder(rows[order], keys[order], values, descending)
+
+
+def _fingerprint(criteria: Optional[FilterCriteria], sort_by: Optional[str], descending: bool) -> str:
+    content = json.dumps([criteria.cache_key() if criteria else (), sort_by, descending], ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(state: Dict) -> str:
+    """续页令牌 (URL安全的base64)"""
+    data = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str) -> Dict:
+    """解析续页令牌, 格式错误时抛出 InvalidCursorError"""
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(data.decode("utf-8"))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError(f"续页令牌无效: {e}") from None
+    if not isinstance(state, dict) or not isinstance(state.get("r"), int) or "f" not in state:
+        raise InvalidCursorError("续页令牌无效")
+    return state
+
+
+def fetch_page(
+    repository: Union[DataRepository, RepositorySnapshot],
+    criteria: FilterCriteria = None,
+    page_size: int = 50,
+    cursor: str = None,
+    offset: int = 0,
+    sort_by: str = None,
+    descending: bool = False,
+    cache: ReportCache = None
+) -> Dict:
+    """
+    获取一页详细数据
+    cursor: 上一页返回的 next_cursor, 提供时忽略offset
+    cache: 缓存行顺序 (及总数), 翻页时不重复筛选和排序; 每个条目约占 8-16 字节/匹配行,
+    宜使用按字节限制的独立缓存, 而不是报表结果缓存
+    返回: {"records": 本页记录, "total": 匹配总数, "offset": 本页起始位置, "next_cursor": 续页令牌 (最后一页为None)}
+    """
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size必须在1-{MAX_PAGE_SIZE}之间")
+    if offset < 0:
+        raise ValueError("offset不能为负数")
+    if sort_by is not None and sort_by not in SORT_FIELDS:
+        raise ValueError(f"不支持的排序字段: {sort_by}")
+    descending = bool(descending) and sort_by is not None
+    snapshot = repository.snapshot()
+
+    if cache is not None:
+        order = cache.get_or_compute(
+            snapshot, criteria,
+            lambda: build_order(snapshot, criteria, sort_by, descending),
+            kind=("detail_order", sort_by, descending)
+        )
+    else:
+        order = build_order(snapshot, criteria, sort_by, descending)
+
+    fingerprint = _fingerprint(criteria, sort_by, descending)
+    if cursor:
+        state = decode_cursor(cursor)
+        if state["f"] != fingerprint:
+            raise InvalidCursorError("续页令牌与本次的筛选条件或排序不一致")
+        try:
+            start = order.start_after(state.get("k"), state["r"])
+        except TypeError:
+            raise InvalidCursorError("续页令牌无效") from None
+    else:
+        start = int(offset)
+
+    stop = min(start + page_size, len(order))
+    page_rows = order.rows[start:stop]
+    next_cursor = None
+    if stop < len(order):
+        next_cursor = encode_cursor({
+            "f": fingerprint,
+            "k": order.value_at(stop - 1),
+            "r": int(order.rows[stop - 1])
+        })
+
+    return {
+        "records": snapshot.materialize(page_rows) if len(page_rows) else [],
+        "total": len(order),
+        "offset": start,
+        "next_cursor": next_cursor
+    }
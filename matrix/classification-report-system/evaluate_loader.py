@@ -0,0 +1,238 @@
+"""
+评估矩阵库导入
+从评估矩阵系统的数据库 (evaluate-matrix-system/sql/schema.sql) 按 report_id/task_id 读取
+task_evaluate_matrix_detail 明细, 按 task_evaluate_matrix_param 的配置映射为分类记录字段, 分批写入数据仓库
+
+- 明细按用例逐个查询 (走主键前缀/idx_report_task_case 索引), 游标 fetchmany 分批读取, 内存占用与明细量无关
+- 通过连接池取得连接, 不同任务的并发请求各自使用独立连接
+- actural_value -> actual_value, predicted_value -> expected_value; 非0-15整数的明细 (如 'N/A'、空值)
+  与评估系统的"有效样本"规则一致, 作为无效行跳过并计入 rows_rejected
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+from connection_pool import ConnectionPool
+from data_model import DataRepository, DIMENSION_FIELDS, EXTRA_FIELDS
+from stream_ingest import ingest_batches
+
+
+DETAIL_TABLE = "task_evaluate_matrix_detail"
+PARAM_TABLE = "task_evaluate_matrix_param"
+
+# 明细列
+DETAIL_COLUMNS = (
+    "report_id", "task_id", "case_id", "corpus_id",
+    "actural_value", "predicted_value", "desc_value", "create_time",
+)
+
+# 参数配置列
+PARAM_COLUMNS = (
+    "report_id", "task_id", "case_id",
+    "actural_value_field", "actural_id_field", "predicted_value_field", "predicted_id_field",
+    "desc_value_field", "matrix_strategy",
+)
+
+# 分类记录字段 -> 来源: 明细列名, 或 "param.<列名>" 表示该用例参数配置中的值
+# 一级分类为用例 (每个用例一个矩阵, 与评估系统按用例出报告一致), 因子/因子值为参数配置的实际值/预测值字段名
+DEFAULT_FIELD_MAPPING = {
+    "primary_category": "case_id",
+    "secondary_category": "desc_value",
+    "use_case": "case_id",
+    "scenario": "task_id",
+    "vertical": "report_id",
+    "factor": "param.actural_value_field",
+    "factor_value": "param.predicted_value_field",
+    "timestamp": "create_time",
+    "test_id": "corpus_id",
+    "notes": "desc_value",
+}
+
+# 每批读取的明细行数
+DEFAULT_BATCH_SIZE = 10000
+
+# SQLite版表结构 (与schema.sql的列和索引一致), 用于本地测试/开发
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_evaluate_matrix_param (
+    report_id VARCHAR(64) NOT NULL,
+    task_id VARCHAR(64) NOT NULL,
+    case_id VARCHAR(64) NOT NULL,
+    actural_value_field VARCHAR(128) DEFAULT NULL,
+    actural_id_field VARCHAR(128) DEFAULT NULL,
+    predicted_value_field VARCHAR(128) DEFAULT NULL,
+    predicted_id_field VARCHAR(128) DEFAULT NULL,
+    desc_value_field VARCHAR(128) DEFAULT NULL,
+    matrix_strategy VARCHAR(64) DEFAULT 'auto',
+    create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    update_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (report_id, task_id, case_id)
+);
+CREATE INDEX IF NOT EXISTS idx_param_report_task ON task_evaluate_matrix_param (report_id, task_id);
+CREATE INDEX IF NOT EXISTS idx_param_task ON task_evaluate_matrix_param (task_id);
+CREATE TABLE IF NOT EXISTS task_evaluate_matrix_detail (
+    report_id VARCHAR(64) NOT NULL,
+    task_id VARCHAR(64) NOT NULL,
+    case_id VARCHAR(64) NOT NULL,
+    corpus_id VARCHAR(128) NOT NULL,
+    actural_value VARCHAR(64) DEFAULT NULL,
+    predicted_value VARCHAR(64) DEFAULT NULL,
+    desc_value VARCHAR(255) DEFAULT NULL,
+    create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    update_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (report_id, task_id, case_id, corpus_id)
+);
+CREATE INDEX IF NOT EXISTS idx_report_task ON task_evaluate_matrix_detail (report_id, task_id);
+CREATE INDEX IF NOT EXISTS idx_report_task_case ON task_evaluate_matrix_detail (report_id, task_id, case_id);
+CREATE INDEX IF NOT EXISTS idx_actural_predicted ON task_evaluate_matrix_detail (actural_value, predicted_value);
+"""
+
+
+def create_sqlite_schema(connection):
+    """在SQLite连接上创建评估矩阵表"""
+    connection.executescript(SQLITE_SCHEMA)
+    connection.commit()
+
+
+def parse_value(value):
+    """
+    将明细中的字符串值解析为整数 (与评估系统 parseIntOrNull 一致, 去除首尾空白)
+    无法解析时原样返回, 由导入校验记为无效行
+    """
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return value
+    return value
+
+
+class EvaluateMatrixLoader:
+    """
+    评估矩阵明细导入器
+    pool: 连接池 (ConnectionPool)
+    paramstyle: 占位符风格, "qmark" (SQLite: ?) 或 "format" (pymysql/MySQLdb: %s)
+    cursor_factory: 由连接创建游标的函数; MySQL可传入服务端游标以流式读取,
+                    如 lambda conn: conn.cursor(pymysql.cursors.SSCursor)
+    field_mapping: 覆盖 DEFAULT_FIELD_MAPPING 中的部分字段
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        paramstyle: str = "qmark",
+        cursor_factory: Callable = None,
+        field_mapping: Dict[str, str] = None
+    ):
+        if batch_size <= 0:
+            raise ValueError("batch_size必须为正整数")
+        if paramstyle not in ("qmark", "format"):
+            raise ValueError(f"不支持的占位符风格: {paramstyle}")
+        self.pool = pool
+        self.batch_size = batch_size
+        self.placeholder = "?" if paramstyle == "qmark" else "%s"
+        self.cursor_factory = cursor_factory or (lambda connection: connection.cursor())
+        self.field_mapping = dict(DEFAULT_FIELD_MAPPING, **(field_mapping or {}))
+        for field, source in self.field_mapping.items():
+            if field not in DIMENSION_FIELDS + EXTRA_FIELDS:
+                raise ValueError(f"未知的记录字段: {field}")
+            column = source[len("param."):] if source.startswith("param.") else source
+            if column not in (PARAM_COLUMNS if source.startswith("param.") else DETAIL_COLUMNS):
+                raise ValueError(f"未知的来源列: {source}")
+
+    def _where(self, columns: Sequence[str]) -> str:
+        return " AND ".join(f"{column} = {self.placeholder}" for column in columns)
+
+    def load_params(self, report_id: str, task_id: str, connection=None) -> List[Dict]:
+        """查询报告+任务下各用例的参数配置 (按case_id排序)"""
+        sql = (
+            f"SELECT {', '.join(PARAM_COLUMNS)} FROM {PARAM_TABLE} "
+            f"WHERE {self._where(['report_id', 'task_id'])} ORDER BY case_id"
+        )
+        if connection is None:
+            with self.pool.connection() as connection:
+                return self.load_params(report_id, task_id, connection)
+        cursor = self.cursor_factory(connection)
+        try:
+            cursor.execute(sql, (report_id, task_id))
+            return [dict(zip(PARAM_COLUMNS, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def iter_batches(
+        self,
+        report_id: str,
+        task_id: str,
+        case_ids: Optional[Sequence[str]] = None
+    ) -> Iterator[Dict[str, List]]:
+        """
+        逐批读取明细并映射为 ingest_columns 的列字典
+        只读取有参数配置的用例 (与评估系统一致); case_ids 可进一步限定用例
+        整个读取过程占用连接池中的一个连接
+        """
+        detail_columns = sorted(set(
+            source for source in self.field_mapping.values() if not source.startswith("param.")
+        ) | {"actural_value", "predicted_value"})
+        sql = (
+            f"SELECT {', '.join(detail_columns)} FROM {DETAIL_TABLE} "
+            f"WHERE {self._where(['report_id', 'task_id', 'case_id'])} ORDER BY corpus_id"
+        )
+
+        with self.pool.connection() as connection:
+            for param in self.load_params(report_id, task_id, connection):
+                if case_ids is not None and param["case_id"] not in case_ids:
+                    continue
+                cursor = self.cursor_factory(connection)
+                try:
+                    cursor.execute(sql, (report_id, task_id, param["case_id"]))
+                    while True:
+                        rows = cursor.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        yield self._map_rows(detail_columns, rows, param)
+                finally:
+                    cursor.close()
+
+    def _map_rows(self, detail_columns: List[str], rows: List, param: Dict) -> Dict[str, List]:
+        """明细行映射为列字典"""
+        position = {column: index for index, column in enumerate(detail_columns)}
+        columns = {
+            "actual_value": [parse_value(row[position["actural_value"]]) for row in rows],
+            "expected_value": [parse_value(row[position["predicted_value"]]) for row in rows],
+        }
+        for field, source in self.field_mapping.items():
+            if source.startswith("param."):
+                value = param[source[len("param."):]]
+                values = [None if value is None else str(value)] * len(rows)
+            else:
+                index = position[source]
+                values = [None if row[index] is None else str(row[index]) for row in rows]
+            if field in DIMENSION_FIELDS:
+                # 维度不允许为空, 缺失时记为空字符串
+                values = [value if value is not None else "" for value in values]
+            columns[field] = values
+        return columns
+
+    def load(
+        self,
+        repository: DataRepository,
+        report_id: str,
+        task_id: str,
+        case_ids: Optional[Sequence[str]] = None,
+        max_errors: int = 100,
+        on_batch: Callable[[Dict], None] = None
+    ) -> Dict:
+        """
+        将报告+任务的明细追加到仓库, 无效明细跳过
+        返回值见 stream_ingest.ingest_stream
+        """
+        return ingest_batches(
+            repository,
+            self.iter_batches(report_id, task_id, case_ids),
+            skip_invalid=True,
+            max_errors=max_errors,
+            on_batch=on_batch
+        )
+
+    def load_repository(self, report_id: str, task_id: str, **options) -> DataRepository:
+        """读取报告+任务的明细到新的数据仓库"""
+        repository = DataRepository()
+        self.load(repository, report_id, task_id, **options)
+        return repository
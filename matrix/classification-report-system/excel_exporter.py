@@ -1,27 +1,348 @@
 """
 Excel报表导出器
 支持混淆矩阵、详细数据、多sheet导出
+汇总统计/混淆矩阵/详细数据sheet直接生成sheet XML (见 xlsx_writer)
 """
-from typing import List, Dict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Dict, Tuple, Union
+from zipfile import ZipFile, ZIP_DEFLATED
 import pandas as pd
+import openpyxl
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.drawing.spreadsheet_drawing import SpreadsheetDrawing
+from openpyxl.packaging.relationship import RelationshipList
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from data_model import ClassificationRecord, DataRepository, FilterCriteria
-from confusion_matrix import ConfusionMatrixGenerator
+from openpyxl.writer.excel import ExcelWriter
+from data_model import (
+    ClassificationRecord, DataRepository, RepositorySnapshot, FilterCriteria, RecordSelection
+)
+from confusion_matrix import CubeReportGenerator
+from xlsx_writer import COLUMN_LETTERS, cell_xml, row_xml, value_xml, worksheet_xml
+from sheet_pool import SheetRenderPool
 import numpy as np
 
 
+# 详细数据sheet的表头
+DETAIL_HEADERS = [
+    "一级分类", "二级分类", "预期值", "实际值", "状态(Pass/Fail)",
+    "用例", "场景", "垂类", "因子", "因子值",
+    "测试ID", "时间戳", "备注"
+]
+
+# 状态列 (从1开始)
+STATUS_COLUMN = 5
+
+# 详细数据每次从列式存储解码的行数
+DETAIL_CHUNK_SIZE = 10000
+
+# 报表使用的命名样式 (每个工作簿注册一次, 单元格只引用样式名)
+HEADER_STYLE = "crs_header"
+PASS_STYLE = "crs_pass"
+FAIL_STYLE = "crs_fail"
+TITLE_STYLE = "crs_title"
+SHEET_TITLE_STYLE = "crs_sheet_title"
+BOLD_STYLE = "crs_bold"
+DIAGONAL_STYLE = "crs_diagonal"
+
+
+def _register_report_styles(wb: Workbook) -> Dict[str, int]:
+    """
+    在工作簿中注册报表使用的命名样式, 返回 {样式名: 单元格样式编号}
+    普通工作簿中按固定顺序预先分配单元格样式编号, 使直接生成或在其他进程中生成的sheet XML中的样式编号一致
+    """
+    styles = [
+        NamedStyle(
+            name=HEADER_STYLE,
+            font=Font(bold=True, color="FFFFFF"),
+            fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+            alignment=Alignment(horizontal='center')
+        ),
+        NamedStyle(
+            name=PASS_STYLE,
+            fill=PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+        ),
+        NamedStyle(
+            name=FAIL_STYLE,
+            fill=PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
+        ),
+        NamedStyle(
+            name=TITLE_STYLE,
+            font=Font(size=16, bold=True),
+            alignment=Alignment(horizontal='center')
+        ),
+        NamedStyle(
+            name=SHEET_TITLE_STYLE,
+            font=Font(size=14, bold=True),
+            alignment=Alignment(horizontal='center')
+        ),
+        NamedStyle(name=BOLD_STYLE, font=Font(bold=True)),
+        NamedStyle(
+            name=DIAGONAL_STYLE,
+            fill=PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
+        ),
+    ]
+    for style in styles:
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+    if wb.write_only:
+        return {}
+
+    scratch = wb.create_sheet()
+    style_ids = {}
+    for column, style in enumerate(styles, 1):
+        cell = scratch.cell(row=1, column=column)
+        cell.style = style.name
+        style_ids[style.name] = cell.style_id  # 分配样式编号
+    wb.remove(scratch)
+    return style_ids
+
+
+@lru_cache(maxsize=1)
+def _report_style_ids() -> Dict[str, int]:
+    """新工作簿注册报表样式后的单元格样式编号 (所有导出工作簿相同)"""
+    return _register_report_styles(Workbook())
+
+
+def _summary_sheet_xml(summary: Dict) -> Iterator[bytes]:
+    """汇总统计sheet的XML, 布局与 ExcelExporter._create_summary_sheet 一致"""
+    styles = _report_style_ids()
+    header = styles[HEADER_STYLE]
+    rows = [
+        row_xml(1, [cell_xml("A1", "汇总统计报告", styles[TITLE_STYLE])]),
+        row_xml(3, [cell_xml("A3", "指标", header), cell_xml("B3", "数值", header)]),
+    ]
+    stats = [
+        ("总记录数", summary['total_records']),
+        ("通过数 (PASS)", summary['passed']),
+        ("失败数 (FAIL)", summary['failed']),
+        ("准确率 (%)", summary['accuracy']),
+    ]
+    row = 4
+    for label, value in stats:
+        rows.append(row_xml(row, [cell_xml(f"A{row}", label), cell_xml(f"B{row}", value)]))
+        row += 1
+
+    row += 1
+    rows.append(row_xml(row, [cell_xml(f"A{row}", "维度统计", styles[BOLD_STYLE])]))
+    row += 1
+    rows.append(row_xml(row, [cell_xml(f"A{row}", "维度", header), cell_xml(f"B{row}", "唯一值数量", header)]))
+    for key, value in summary['unique_counts'].items():
+        row += 1
+        rows.append(row_xml(row, [cell_xml(f"A{row}", key), cell_xml(f"B{row}", value)]))
+
+    return worksheet_xml(f"A1:B{row}", [(1, 25), (2, 15)], rows, ["A1:B1"])
+
+
+# 混淆矩阵sheet的固定部分: 表头行与列宽
+_MATRIX_HEADERS = ["实际\\预测"] + [f"预测{i}" for i in range(16)] + ["SUM", "召回率(%)"]
+_MATRIX_WIDTHS = [(1, 12)] + [(i, 8) for i in range(2, 20)]
+
+
+def _matrix_sheet_xml(sheet_name: str, matrix_data: Dict) -> Iterator[bytes]:
+    """混淆矩阵sheet的XML, 布局 (含对角线高亮) 与 ExcelExporter._create_confusion_matrix_sheet 一致"""
+    styles = _report_style_ids()
+    matrix = matrix_data["matrix"]
+    precision = matrix_data["precision"]
+    recall = matrix_data["recall"]
+    total_expected = matrix_data["total_expected"]
+    total_actual = matrix_data["total_actual"]
+    diagonal = styles[DIAGONAL_STYLE]
+    bold = styles[BOLD_STYLE]
+    letters = COLUMN_LETTERS
+
+    rows = [
+        row_xml(1, [cell_xml("A1", sheet_name, styles[SHEET_TITLE_STYLE])]),
+        row_xml(3, [
+            cell_xml(f"{letters[col]}3", title, styles[HEADER_STYLE])
+            for col, title in enumerate(_MATRIX_HEADERS, 1)
+        ]),
+    ]
+    for i in range(16):
+        row = i + 4
+        cells = [cell_xml(f"A{row}", f"实际{i}")]
+        for j in range(16):
+            value = matrix[i][j]
+            cells.append(cell_xml(f"{letters[j + 2]}{row}", value, diagonal if i == j and value > 0 else 0))
+        cells.append(cell_xml(f"R{row}", total_actual[i]))
+        cells.append(cell_xml(f"S{row}", recall[i]))
+        rows.append(row_xml(row, cells))
+
+    rows.append(row_xml(20, (
+        [cell_xml("A20", "SUM", bold)]
+        + [cell_xml(f"{letters[i + 2]}20", total_expected[i]) for i in range(16)]
+        + [cell_xml("R20", sum(total_expected)), cell_xml("S20", "-")]
+    )))
+    rows.append(row_xml(21, (
+        [cell_xml("A21", "精准率(%)", bold)]
+        + [cell_xml(f"{letters[i + 2]}21", precision[i]) for i in range(16)]
+        + [cell_xml("R21", "-"), cell_xml("S21", "-")]
+    )))
+    return worksheet_xml("A1:S21", _MATRIX_WIDTHS, rows, ["A1:S1"])
+
+
+# 交给进程池的每组最少sheet数 (每组一次管道往返)
+MIN_SHEETS_PER_TASK = 8
+
+
+def render_matrix_sheets(items: List[Tuple[str, Dict]]) -> List[bytes]:
+    """进程池任务 (sheet_pool工作进程中执行): 生成一组混淆矩阵sheet [(sheet名称, 矩阵数据)] 的XML"""
+    return [b"".join(_matrix_sheet_xml(sheet_name, matrix_data)) for sheet_name, matrix_data in items]
+
+
+def _pooled_sheet_xml(future: Future, offset: int) -> Iterator[bytes]:
+    """保存到该sheet时才等待所在组的结果, 前面sheet的写入与后续组的生成重叠"""
+    yield future.result()[offset]
+
+
+# _PrerenderedExcelWriter 依赖 openpyxl ExcelWriter 的内部实现 (write_worksheet/_archive/manifest),
+# 只在验证过的版本上启用; 其他版本的 export_full_report 经openpyxl逐单元格生成, 内容相同
+_PRERENDER_OPENPYXL_VERSIONS = ("3.1",)
+PRERENDER_SUPPORTED = ".".join(openpyxl.__version__.split(".")[:2]) in _PRERENDER_OPENPYXL_VERSIONS
+
+
+class _PrerenderedExcelWriter(ExcelWriter):
+    """保存工作簿时, 对已生成XML的sheet (bytes或按段生成的bytes) 直接写入压缩包"""
+
+    def __init__(self, workbook: Workbook, archive: ZipFile, prerendered: Dict[str, Iterable[bytes]]):
+        super().__init__(workbook, archive)
+        self.prerendered = prerendered
+
+    def write_worksheet(self, ws):
+        xml = self.prerendered.get(ws.title)
+        if xml is None:
+            return super().write_worksheet(ws)
+        ws._drawing = SpreadsheetDrawing()
+        ws._rels = RelationshipList()
+        with self._archive.open(ws.path[1:], "w") as stream:
+            for chunk in ([xml] if isinstance(xml, bytes) else xml):
+                stream.write(chunk)
+        self.manifest.append(ws)
+
+
+def _save_workbook(wb: Workbook, output_path: str, prerendered: Dict[str, Iterable[bytes]]):
+    """保存工作簿, prerendered中的sheet (工作簿中为同名空sheet) 写入已生成的XML"""
+    if not prerendered:
+        wb.save(output_path)
+        return
+    wb.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+    with ZipFile(output_path, 'w', ZIP_DEFLATED, allowZip64=True) as archive:
+        _PrerenderedExcelWriter(wb, archive, prerendered).write_data()
+
+
+def iter_detail_rows(selection: RecordSelection, chunk_size: int = DETAIL_CHUNK_SIZE) -> Iterator[list]:
+    """
+    逐行生成详细数据sheet的行值 (列顺序同 DETAIL_HEADERS), 扩展字段为空时为空字符串
+    按块从列式存储解码, 不物化记录对象; 内存占用只与chunk_size有关
+    """
+    store = selection.store
+    rows = np.arange(len(selection)) if selection.rows is None else selection.rows
+    dimension_order = (
+        "primary_category", "secondary_category", None, None, None,
+        "use_case", "scenario", "vertical", "factor", "factor_value"
+    )
+    extra_order = ("test_id", "timestamp", "notes")
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        index_list = chunk.tolist()
+        dimensions = {
+            field: [store.dictionaries[field].values[c] for c in store.codes(field)[chunk].tolist()]
+            for field in dimension_order if field
+        }
+        extras = {}
+        for field in extra_order:
+            column = store.extras(field)
+            extras[field] = [column[i] or "" for i in index_list]
+        status = ["PASS" if p else "FAIL" for p in store.passed[chunk].tolist()]
+
+        yield from zip(
+            dimensions["primary_category"],
+            dimensions["secondary_category"],
+            store.expected[chunk].tolist(),
+            store.actual[chunk].tolist(),
+            status,
+            dimensions["use_case"],
+            dimensions["scenario"],
+            dimensions["vertical"],
+            dimensions["factor"],
+            dimensions["factor_value"],
+            extras["test_id"],
+            extras["timestamp"],
+            extras["notes"],
+        )
+
+
+def _detail_sheet_xml(
+    selection: RecordSelection,
+    on_rows: Callable[[int], None] = None,
+    chunk_size: int = DETAIL_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    详细数据sheet的XML, 内容与 ExcelExporter._create_detail_data_sheet 一致
+    行按块解码并直接生成XML (不创建单元格对象), 保存时逐块写入压缩包; on_rows 每写完一块时以已写行数调用
+    """
+    styles = _report_style_ids()
+    status_styles = {"PASS": f' s="{styles[PASS_STYLE]}"', "FAIL": f' s="{styles[FAIL_STYLE]}"'}
+    letters = COLUMN_LETTERS[1:len(DETAIL_HEADERS) + 1]
+    status_index = STATUS_COLUMN - 1
+    # 维度/数值列取值重复度高, 按取值缓存XML片段
+    cached_columns = set(range(10))
+    fragments: Dict = {}
+    total = len(selection)
+
+    def rows() -> Iterator[str]:
+        yield row_xml(1, [
+            cell_xml(f"{letter}1", title, styles[HEADER_STYLE]) for letter, title in zip(letters, DETAIL_HEADERS)
+        ])
+        block = []
+        for row, values in enumerate(iter_detail_rows(selection, chunk_size), 2):
+            cells = []
+            for column, (letter, value) in enumerate(zip(letters, values)):
+                if column in cached_columns:
+                    fragment = fragments.get(value)
+                    if fragment is None:
+                        fragment = fragments[value] = value_xml(value)
+                else:
+                    fragment = value_xml(value)
+                style = status_styles[value] if column == status_index else ""
+                cells.append(f'<c r="{letter}{row}"{style}{fragment}</c>')
+            block.append(f'<row r="{row}">{"".join(cells)}</row>')
+            if len(block) == chunk_size:
+                yield "".join(block)
+                block = []
+                if on_rows:
+                    on_rows(row - 1)
+        if block:
+            yield "".join(block)
+        if on_rows:
+            on_rows(total)
+
+    return worksheet_xml(
+        f"A1:{letters[-1]}{total + 1}",
+        [(column, 15) for column in range(1, len(DETAIL_HEADERS) + 1)],
+        rows(),
+        frozen_rows=1
+    )
+
+
 class ExcelExporter:
     """Excel导出器"""
 
-    def __init__(self, repository: DataRepository):
+    def __init__(self, repository: Union[DataRepository, RepositorySnapshot]):
         self.repository = repository
 
     def export_full_report(
         self,
         output_path: str,
-        filter_criteria: FilterCriteria = None
+        filter_criteria: FilterCriteria = None,
+        report_data: Dict = None,
+        on_progress: Callable[[Dict], None] = None,
+        native_sheets: bool = True,
+        pool: SheetRenderPool = None
     ):
         """
         导出完整报告到Excel
@@ -30,54 +351,121 @@ class ExcelExporter:
         2. 总体混淆矩阵
         3. 各一级分类混淆矩阵
         4. 详细数据列表
+
+        report_data: 已生成的详细报告 (如缓存结果), 缺省时重新计算
+        on_progress: 进度回调, 每完成一个sheet及详细数据每写入一块行时调用, 参数为
+                     {"stage": writing/saving, "sheets_done", "sheets_total", "rows_written", "rows_total"};
+                     native_sheets时详细数据在保存阶段写入
+        native_sheets: 汇总统计/混淆矩阵/详细数据sheet直接生成XML (默认, 详细数据逐块写入, 内存占用不随行数增长);
+                       False时 (或openpyxl版本未经验证时) 经openpyxl逐单元格创建, 内容相同
+        pool: 常驻sheet生成进程池 (sheet_pool.SheetRenderPool), native_sheets时各一级分类混淆矩阵sheet
+              分组交给工作进程并行生成XML; 缺省时在保存过程中依次生成
         """
-        # 获取记录
-        if filter_criteria:
-            records = self.repository.filter_records(filter_criteria)
-        else:
-            records = self.repository.get_all_records()
+        native_sheets = native_sheets and PRERENDER_SUPPORTED
 
-        if not records:
+        # 获取记录 (列式视图), 记录与统计基于同一快照
+        snapshot = self.repository.snapshot()
+        records = snapshot.select(filter_criteria)
+
+        if len(records) == 0:
             raise ValueError("没有找到匹配的记录")
 
-        # 生成混淆矩阵数据
-        generator = ConfusionMatrixGenerator(records)
-        report_data = generator.generate_detailed_report()
+        # 生成混淆矩阵数据 (预聚合立方体)
+        if report_data is None:
+            generator = CubeReportGenerator(snapshot, filter_criteria)
+            report_data = generator.generate_detailed_report()
+
+        progress = {
+            "stage": "writing",
+            "sheets_done": 0,
+            "sheets_total": 3 + len(report_data["by_primary_category"]),
+            "rows_written": 0,
+            "rows_total": len(records),
+        }
+
+        def report(**changes):
+            progress.update(changes)
+            if on_progress:
+                on_progress(dict(progress))
 
         # 创建Excel工作簿
         wb = Workbook()
         wb.remove(wb.active)  # 删除默认sheet
+        _register_report_styles(wb)
+        # 已生成XML的sheet: 工作簿中只保留同名空sheet占位, 保存时写入XML
+        prerendered = {}
 
         # 1. 汇总统计sheet
-        self._create_summary_sheet(wb, report_data["summary"])
+        if native_sheets:
+            prerendered[wb.create_sheet("汇总统计").title] = _summary_sheet_xml(report_data["summary"])
+        else:
+            self._create_summary_sheet(wb, report_data["summary"])
+        report(sheets_done=1)
 
         # 2. 总体混淆矩阵sheet
-        self._create_confusion_matrix_sheet(
-            wb,
-            "总体混淆矩阵",
-            report_data["overall"]
-        )
+        self._add_matrix_sheet(wb, "总体混淆矩阵", report_data["overall"], prerendered, native_sheets)
+        report(sheets_done=2)
 
         # 3. 各一级分类混淆矩阵sheet
-        for category, matrix_data in report_data["by_primary_category"].items():
-            sheet_name = f"分类-{category[:20]}"  # 限制sheet名称长度
-            self._create_confusion_matrix_sheet(wb, sheet_name, matrix_data)
-
-        # 4. 详细数据列表sheet
-        self._create_detail_data_sheet(wb, records)
+        category_sheets = [
+            (f"分类-{category[:20]}", matrix_data)  # 限制sheet名称长度
+            for category, matrix_data in report_data["by_primary_category"].items()
+        ]
+        if native_sheets and pool is not None and len(category_sheets) > 1:
+            # 全部分组先提交, 保存时按sheet顺序取结果
+            task_size = max(MIN_SHEETS_PER_TASK, -(-len(category_sheets) // (pool.processes * 4)))
+            for start in range(0, len(category_sheets), task_size):
+                group = category_sheets[start:start + task_size]
+                future = pool.submit(group)
+                for offset, (sheet_name, _) in enumerate(group):
+                    prerendered[wb.create_sheet(sheet_name).title] = _pooled_sheet_xml(future, offset)
+                    report(sheets_done=progress["sheets_done"] + 1)
+        else:
+            for sheet_name, matrix_data in category_sheets:
+                self._add_matrix_sheet(wb, sheet_name, matrix_data, prerendered, native_sheets)
+                report(sheets_done=progress["sheets_done"] + 1)
+
+        # 4. 详细数据列表sheet: native时保存过程中逐块生成XML写入 (进度在保存阶段报告)
+        if native_sheets:
+            def detail_rows_written(rows_written: int):
+                if rows_written == len(records):
+                    report(rows_written=rows_written, sheets_done=progress["sheets_total"])
+                else:
+                    report(rows_written=rows_written)
+
+            prerendered[wb.create_sheet("详细数据").title] = _detail_sheet_xml(records, detail_rows_written)
+            report(stage="saving")
+        else:
+            self._create_detail_data_sheet(
+                wb, records, on_rows=lambda rows_written: report(rows_written=rows_written)
+            )
+            report(sheets_done=progress["sheets_total"], stage="saving")
 
         # 保存文件
-        wb.save(output_path)
+        _save_workbook(wb, output_path, prerendered)
         return output_path
 
+    def _add_matrix_sheet(
+        self,
+        wb: Workbook,
+        sheet_name: str,
+        matrix_data: Dict,
+        prerendered: Dict,
+        native: bool
+    ):
+        """添加混淆矩阵sheet: native时占位并记录直接生成的XML, 否则经openpyxl逐单元格创建"""
+        if native:
+            prerendered[wb.create_sheet(sheet_name).title] = _matrix_sheet_xml(sheet_name, matrix_data)
+        else:
+            self._create_confusion_matrix_sheet(wb, sheet_name, matrix_data)
+
     def _create_summary_sheet(self, wb: Workbook, summary: Dict):
         """创建汇总统计sheet"""
         ws = wb.create_sheet("汇总统计")
 
         # 标题
         ws['A1'] = "汇总统计报告"
-        ws['A1'].font = Font(size=16, bold=True)
-        ws['A1'].alignment = Alignment(horizontal='center')
+        ws['A1'].style = TITLE_STYLE
         ws.merge_cells('A1:B1')
 
         # 基本统计
@@ -102,7 +490,7 @@ class ExcelExporter:
         # 维度统计
         row += 1
         ws[f'A{row}'] = "维度统计"
-        ws[f'A{row}'].font = Font(bold=True)
+        ws[f'A{row}'].style = BOLD_STYLE
         row += 1
 
         ws[f'A{row}'] = "维度"
@@ -136,8 +524,7 @@ class ExcelExporter:
 
         # 标题
         ws['A1'] = sheet_name
-        ws['A1'].font = Font(size=14, bold=True)
-        ws['A1'].alignment = Alignment(horizontal='center')
+        ws['A1'].style = SHEET_TITLE_STYLE
         ws.merge_cells(f'A1:{get_column_letter(19)}1')
 
         # 表头 (第3行)
@@ -166,11 +553,7 @@ class ExcelExporter:
 
                 # 对角线高亮（正确预测）
                 if i == j and matrix[i][j] > 0:
-                    ws[f'{col}{row}'].fill = PatternFill(
-                        start_color="90EE90",
-                        end_color="90EE90",
-                        fill_type="solid"
-                    )
+                    ws[f'{col}{row}'].style = DIAGONAL_STYLE
 
             # SUM列
             ws[f'{get_column_letter(18)}{row}'] = total_actual[i]
@@ -182,7 +565,7 @@ class ExcelExporter:
 
         # SUM行
         ws[f'A{row}'] = "SUM"
-        ws[f'A{row}'].font = Font(bold=True)
+        ws[f'A{row}'].style = BOLD_STYLE
 
         for i in range(16):
             col = get_column_letter(i + 2)
@@ -195,7 +578,7 @@ class ExcelExporter:
 
         # 精准率行
         ws[f'A{row}'] = "精准率(%)"
-        ws[f'A{row}'].font = Font(bold=True)
+        ws[f'A{row}'].style = BOLD_STYLE
 
         for i in range(16):
             col = get_column_letter(i + 2)
@@ -209,68 +592,36 @@ class ExcelExporter:
         for i in range(2, 20):
             ws.column_dimensions[get_column_letter(i)].width = 8
 
-    def _create_detail_data_sheet(self, wb: Workbook, records: List[ClassificationRecord]):
-        """创建详细数据列表sheet"""
+        return ws
+
+    def _create_detail_data_sheet(
+        self,
+        wb: Workbook,
+        selection: RecordSelection,
+        on_rows: Callable[[int], None] = None
+    ):
+        """创建详细数据列表sheet, on_rows 每写入 DETAIL_CHUNK_SIZE 行及写完时以已写行数调用"""
         ws = wb.create_sheet("详细数据")
+        _register_report_styles(wb)
 
         # 表头
-        headers = [
-            "一级分类", "二级分类", "预期值", "实际值", "状态(Pass/Fail)",
-            "用例", "场景", "垂类", "因子", "因子值",
-            "测试ID", "时间戳", "备注"
-        ]
-
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(
-                start_color="4472C4",
-                end_color="4472C4",
-                fill_type="solid"
+        ws.append(DETAIL_HEADERS)
+        for col_idx in range(1, len(DETAIL_HEADERS) + 1):
+            ws.cell(row=1, column=col_idx).style = HEADER_STYLE
+
+        # 数据行, PASS/FAIL着色
+        for row_idx, values in enumerate(iter_detail_rows(selection), 2):
+            ws.append(values)
+            ws.cell(row=row_idx, column=STATUS_COLUMN).style = (
+                PASS_STYLE if values[STATUS_COLUMN - 1] == "PASS" else FAIL_STYLE
             )
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.alignment = Alignment(horizontal='center')
-
-        # 数据行
-        for row_idx, record in enumerate(records, 2):
-            data = [
-                record.primary_category,
-                record.secondary_category,
-                record.expected_value,
-                record.actual_value,
-                record.status.value.upper(),
-                record.use_case,
-                record.scenario,
-                record.vertical,
-                record.factor,
-                record.factor_value,
-                record.test_id or "",
-                record.timestamp or "",
-                record.notes or ""
-            ]
-
-            for col_idx, value in enumerate(data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.value = value
-
-                # PASS/FAIL着色
-                if col_idx == 5:  # 状态列
-                    if value == "PASS":
-                        cell.fill = PatternFill(
-                            start_color="90EE90",
-                            end_color="90EE90",
-                            fill_type="solid"
-                        )
-                    else:
-                        cell.fill = PatternFill(
-                            start_color="FFB6C1",
-                            end_color="FFB6C1",
-                            fill_type="solid"
-                        )
+            if on_rows and (row_idx - 1) % DETAIL_CHUNK_SIZE == 0:
+                on_rows(row_idx - 1)
+        if on_rows:
+            on_rows(len(selection))
 
         # 调整列宽
-        for col_idx in range(1, len(headers) + 1):
+        for col_idx in range(1, len(DETAIL_HEADERS) + 1):
             ws.column_dimensions[get_column_letter(col_idx)].width = 15
 
         # 冻结首行
@@ -279,14 +630,7 @@ class ExcelExporter:
     def _style_header_row(self, ws, row: int, num_cols: int = 2):
         """设置表头行样式"""
         for col_idx in range(1, num_cols + 1):
-            cell = ws.cell(row=row, column=col_idx)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(
-                start_color="4472C4",
-                end_color="4472C4",
-                fill_type="solid"
-            )
-            cell.alignment = Alignment(horizontal='center')
+            ws.cell(row=row, column=col_idx).style = HEADER_STYLE
 
     def export_simple_excel(
         self,
@@ -314,3 +658,61 @@ class ExcelExporter:
         # 导出到Excel
         df.to_excel(output_path, index=False, sheet_name="数据")
         return output_path
+
+    def export_simple_parquet(
+        self,
+        output_path: str,
+        filter_criteria: FilterCriteria = None,
+        columns: List[str] = None
+    ):
+        """
+        导出简单的Parquet（仅包含详细数据）
+        直接由列式存储导出, 不物化记录; 列名与上传格式一致, 可直接用 import_parquet 导入
+        """
+        from arrow_io import write_parquet
+        write_parquet(self.repository, output_path, filter_criteria, columns)
+        return output_path
+
+    def export_detail_excel(
+        self,
+        output_path: str,
+        filter_criteria: FilterCriteria = None,
+        chunk_size: int = DETAIL_CHUNK_SIZE
+    ) -> int:
+        """
+        流式导出详细数据Excel (单个"详细数据"sheet, 格式与完整报告中的一致)
+        使用只写工作簿: 行由生成器逐块解码并直接写入文件, 内存占用不随行数增长;
+        样式为工作簿级命名样式, 状态单元格共用两个预设样式的单元格
+        返回导出行数
+        """
+        selection = self.repository.snapshot().select(filter_criteria)
+
+        wb = Workbook(write_only=True)
+        _register_report_styles(wb)
+        ws = wb.create_sheet("详细数据")
+
+        # 列宽与冻结窗格须在写入行之前设置
+        for col_idx in range(1, len(DETAIL_HEADERS) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 15
+        ws.freeze_panes = "A2"
+
+        header = []
+        for title in DETAIL_HEADERS:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.style = HEADER_STYLE
+            header.append(cell)
+        ws.append(header)
+
+        # 行立即写出, 状态单元格可在行间复用
+        pass_cell = WriteOnlyCell(ws, value="PASS")
+        pass_cell.style = PASS_STYLE
+        fail_cell = WriteOnlyCell(ws, value="FAIL")
+        fail_cell.style = FAIL_STYLE
+        status_index = STATUS_COLUMN - 1
+        for values in iter_detail_rows(selection, chunk_size):
+            values = list(values)
+            values[status_index] = pass_cell if values[status_index] == "PASS" else fail_cell
+            ws.append(values)
+
+        wb.save(output_path)
+        return len(selection)
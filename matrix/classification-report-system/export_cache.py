@@ -0,0 +1,243 @@
+"""
+导出文件缓存
+按 (仓库版本, 规范化筛选条件, 导出选项) 的摘要缓存已生成的导出文件, 总大小有上限, LRU淘汰
+数据版本前进后旧版本的文件全部删除; 目录中不属于运行中进程的遗留文件在启动时清除
+取得的文件由调用方持有引用直到使用完毕 (如下载响应结束), 期间被淘汰/失效的文件在释放后才删除
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Set, Union
+import hashlib
+import io
+import json
+import os
+import threading
+import uuid
+from data_model import DataRepository, RepositorySnapshot, FilterCriteria
+
+
+def process_alive(pid: int) -> bool:
+    """进程是否仍在运行 (用于判断以进程号开头的文件是否为遗留文件)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class _LeasedFile(io.BufferedReader):
+    """关闭时释放缓存引用的只读文件"""
+
+    def __init__(self, path: str, release: Callable[[str], None]):
+        super().__init__(io.FileIO(path, "rb"))
+        self._path = path
+        self._release = release
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release(self._path)
+
+
+class ExportFileCache:
+    """
+    线程安全的导出文件缓存
+    directory: 缓存目录 (文件名以进程号开头, 多个进程可共用同一目录)
+    max_bytes: 缓存文件总大小上限; 单个文件超过上限时仍保留 (作为唯一条目), 直到下一个文件写入
+    acquire 返回的文件须以 release 释放 (或使用 lease/open); 持有期间不会删除
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes必须为正整数")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._prefix = f"{os.getpid()}-"
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        # 文件路径 -> 未释放的引用数; 待删除但仍被引用的文件在最后一次释放时删除
+        self._leases: Dict[str, int] = {}
+        self._doomed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        os.makedirs(directory, exist_ok=True)
+        self._remove_orphans()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        **options
+    ) -> str:
+        """缓存键: (仓库版本, 规范化筛选条件, 导出选项) 的SHA-256摘要"""
+        criteria_key = criteria.cache_key() if criteria else ()
+        content = json.dumps(
+            [repository.version, criteria_key, sorted(options.items())],
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def acquire(
+        self,
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        create: Callable[[str], None],
+        suffix: str = ".xlsx",
+        **options
+    ) -> str:
+        """
+        返回缓存文件路径并持有引用, 使用完毕后须调用 release(path); 未命中时调用 create(path) 生成文件后加入缓存
+        options: 影响文件内容的导出选项 (如导出类型), 参与缓存键
+        基于旧版本快照 (或生成期间数据版本已前进) 的文件不加入缓存, 释放后删除
+        """
+        key = self.make_key(repository, criteria, suffix=suffix, **options)
+        with self._lock:
+            self._invalidate_stale(repository.version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._lease(entry["path"])
+            self.misses += 1
+
+        # 生成过程不持有锁: 写入临时文件后原子改名; 并发的相同请求可能重复生成, 多余的文件释放后删除
+        path = os.path.join(self.directory, f"{self._prefix}{key}-{uuid.uuid4().hex[:8]}{suffix}")
+        partial = f"{path}.partial"
+        try:
+            create(partial)
+            os.replace(partial, path)
+        except BaseException:
+            self._remove_file(partial)
+            raise
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._lease(path)
+            if repository.version != self._version or key in self._entries:
+                self._doomed.add(path)
+                return path
+            self._entries[key] = {"path": path, "size": size}
+            total = sum(entry["size"] for entry in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, entry = self._entries.popitem(last=False)
+                total -= entry["size"]
+                self._discard(entry["path"])
+                self.evictions += 1
+        return path
+
+    def release(self, path: str):
+        """释放 acquire 取得的文件; 文件已被淘汰/失效且不再被引用时删除"""
+        with self._lock:
+            count = self._leases.get(path, 0) - 1
+            if count > 0:
+                self._leases[path] = count
+                return
+            self._leases.pop(path, None)
+            if path in self._doomed:
+                self._doomed.discard(path)
+                self._remove_file(path)
+
+    @contextmanager
+    def lease(
+        self,
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        create: Callable[[str], None],
+        suffix: str = ".xlsx",
+        **options
+    ) -> Iterator[str]:
+        """acquire/release 的上下文管理器形式"""
+        path = self.acquire(repository, criteria, create, suffix, **options)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def open(
+        self,
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        create: Callable[[str], None],
+        suffix: str = ".xlsx",
+        **options
+    ) -> BinaryIO:
+        """取得缓存文件并以只读方式打开, 文件关闭时释放 (适用于在请求返回后才读完的下载响应)"""
+        path = self.acquire(repository, criteria, create, suffix, **options)
+        try:
+            return _LeasedFile(path, self.release)
+        except BaseException:
+            self.release(path)
+            raise
+
+    def _lease(self, path: str) -> str:
+        self._leases[path] = self._leases.get(path, 0) + 1
+        return path
+
+    def _discard(self, path: str):
+        """删除不再属于缓存的文件; 仍被引用时推迟到释放后 (调用时持有锁)"""
+        if self._leases.get(path):
+            self._doomed.add(path)
+        else:
+            self._remove_file(path)
+
+    def _invalidate_stale(self, version: int):
+        """数据版本前进: 旧版本的文件不可能再命中, 全部删除 (调用时持有锁); 版本落后时保持不变"""
+        if self._version is None or version > self._version:
+            self.invalidations += len(self._entries)
+            for entry in self._entries.values():
+                self._discard(entry["path"])
+            self._entries.clear()
+            self._version = version
+
+    def _remove_orphans(self):
+        """删除本进程此前遗留的文件及已退出进程的文件"""
+        for name in os.listdir(self.directory):
+            pid = name.split("-", 1)[0]
+            if not pid.isdigit():
+                continue
+            if name.startswith(self._prefix) or not process_alive(int(pid)):
+                self._remove_file(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """清空缓存并删除文件 (保留计数器)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            for entry in self._entries.values():
+                self._discard(entry["path"])
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """监控指标"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "leased_files": len(self._leases),
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+            }
@@ -0,0 +1,199 @@
+"""
+后台导出任务
+导出请求提交后立即返回任务ID, 由固定大小的线程池在后台生成文件; 可查询进度, 完成后凭任务ID下载
+排队任务数有上限, 已结束的任务及其文件在保留期后清除
+文件名以进程号开头, 启动时清除本进程此前及已退出进程遗留的文件
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+import os
+import threading
+import time
+import uuid
+from export_cache import process_alive
+
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """排队中的导出任务已达上限"""
+
+
+class ExportJobManager:
+    """
+    导出任务管理器 (线程安全)
+    output_dir: 导出文件目录
+    max_workers: 同时执行的导出任务数
+    max_queued: 等待执行的任务数上限, 超出时 submit 抛出 QueueFullError
+    retention_seconds: 已结束任务 (及其文件) 的保留时间; 过期任务在提交/查询时及后台定期清除
+    purge_interval: 后台清除的间隔秒数 (None不启动后台清除)
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        max_workers: int = 2,
+        max_queued: int = 8,
+        retention_seconds: float = 3600,
+        purge_interval: Optional[float] = 60
+    ):
+        if max_workers <= 0:
+            raise ValueError("max_workers必须为正整数")
+        if max_queued < 0:
+            raise ValueError("max_queued不能为负数")
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._prefix = f"{os.getpid()}-"
+        os.makedirs(output_dir, exist_ok=True)
+        self._remove_orphans()
+        if purge_interval:
+            threading.Thread(
+                target=self._purge_periodically, args=(purge_interval,), name="export-purge", daemon=True
+            ).start()
+
+    def _purge_periodically(self, interval: float):
+        while not self._stopped.wait(interval):
+            self.purge_expired()
+
+    def submit(self, task: Callable[[str, Callable[[Dict], None]], None], suffix: str = ".xlsx") -> str:
+        """
+        提交导出任务, 返回任务ID (随机生成, 同时作为下载凭证)
+        task(output_path, on_progress): 将文件写到output_path, 可调用on_progress(dict)报告进度
+        """
+        self.purge_expired()
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job["state"] == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFullError(f"排队中的导出任务已达上限 ({self.max_queued})")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "state": QUEUED,
+                "progress": {},
+                "error": None,
+                "path": os.path.join(self.output_dir, f"{self._prefix}{job_id}{suffix}"),
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+        self._executor.submit(self._run, job_id, task)
+        return job_id
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(changes)
+
+    def _run(self, job_id: str, task: Callable):
+        with self._lock:
+            path = self._jobs[job_id]["path"]
+        self._update(job_id, state=RUNNING, started_at=time.time())
+
+        def on_progress(progress: Dict):
+            self._update(job_id, progress=dict(progress))
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            task(path, on_progress)
+        except Exception as e:
+            self._remove_file(path)
+            self._update(job_id, state=FAILED, error=str(e), finished_at=time.time())
+        else:
+            self._update(job_id, state=DONE, finished_at=time.time())
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """任务状态 (不存在或已清除时返回None)"""
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._status(job)
+
+    @staticmethod
+    def _status(job: Dict) -> Dict:
+        status = {k: v for k, v in job.items() if k not in ("path", "progress")}
+        status.update(job["progress"])
+        return status
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """已完成任务的文件路径, 未完成/失败/不存在时返回None"""
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != DONE:
+                return None
+            return job["path"]
+
+    def open_result(self, job_id: str) -> Tuple[Optional[Dict], Optional[BinaryIO]]:
+        """
+        返回 (任务状态, 已打开的结果文件); 任务不存在或已清除时为 (None, None), 未完成/失败时文件为None
+        文件在锁内打开, 之后任务过期清除 (删除文件) 不影响已打开的文件, 调用方负责关闭
+        """
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            if job["state"] != DONE:
+                return self._status(job), None
+            try:
+                return self._status(job), open(job["path"], "rb")
+            except FileNotFoundError:
+                # 文件已被外部删除: 视为任务已清除
+                del self._jobs[job_id]
+                return None, None
+
+    def stats(self) -> Dict:
+        """各状态的任务数"""
+        self.purge_expired()
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+        return dict(counts, max_workers=self.max_workers, max_queued=self.max_queued)
+
+    def purge_expired(self, now: float = None) -> int:
+        """清除超过保留时间的已结束任务及其文件, 返回清除的任务数"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job["finished_at"] is not None and now - job["finished_at"] >= self.retention_seconds
+            ]
+            for job in expired:
+                del self._jobs[job["job_id"]]
+        for job in expired:
+            self._remove_file(job["path"])
+        return len(expired)
+
+    def _remove_orphans(self):
+        """删除本进程此前遗留的文件及已退出进程的文件"""
+        for name in os.listdir(self.output_dir):
+            pid = name.split("-", 1)[0]
+            if not pid.isdigit():
+                continue
+            if name.startswith(self._prefix) or not process_alive(int(pid)):
+                self._remove_file(os.path.join(self.output_dir, name))
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def shutdown(self, wait: bool = True):
+        """停止接受任务及后台清除, wait为True时等待执行中的任务完成"""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
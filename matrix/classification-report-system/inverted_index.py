@@ -0,0 +1,182 @@
+"""
+维度倒排索引
+每个维度值 -> 升序行号数组, 多条件筛选转化为行号集合求交
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from columnar_store import ColumnarStore
+
+
+ROW_DTYPE = np.int64
+
+# 状态伪维度 (编码: 0=fail, 1=pass)
+STATUS_FIELD = "status"
+
+
+class PostingList:
+    """只追加的升序行号数组"""
+
+    def __init__(self, initial_capacity: int = 16):
+        self._rows = np.empty(initial_capacity, dtype=ROW_DTYPE)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def from_array(cls, rows: np.ndarray) -> "PostingList":
+        """由已有升序行号数组构建 (不复制; 追加时分配新数组)"""
+        posting = cls.__new__(cls)
+        posting._rows = rows
+        posting._size = len(rows)
+        return posting
+
+    def _reserve(self, count: int):
+        required = self._size + count
+        if required <= len(self._rows):
+            return
+        capacity = max(len(self._rows), 16)
+        while capacity < required:
+            capacity *= 2
+        rows = np.empty(capacity, dtype=ROW_DTYPE)
+        rows[:self._size] = self._rows[:self._size]
+        self._rows = rows
+
+    def append(self, row: int):
+        self._reserve(1)
+        self._rows[self._size] = row
+        self._size += 1
+
+    def extend(self, rows: np.ndarray):
+        self._reserve(len(rows))
+        self._rows[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows[:self._size]
+
+
+class InvertedIndex:
+    """各维度 (含状态) 的倒排索引, 随仓库写入增量维护"""
+
+    def __init__(self, dimension_fields: Sequence[str]):
+        self.fields = tuple(dimension_fields) + (STATUS_FIELD,)
+        self.clear()
+
+    def clear(self):
+        """清空索引"""
+        self._postings: Dict[str, List[PostingList]] = {f: [] for f in self.fields}
+
+    def to_arrays(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        导出某维度的索引为紧凑形式 (行号, 偏移量)
+        编码c的行号为 rows[offsets[c]:offsets[c + 1]]
+        """
+        postings = self._postings[field]
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in postings], out=offsets[1:])
+        rows = np.concatenate([p.rows for p in postings]) if postings else np.empty(0, dtype=ROW_DTYPE)
+        return rows.astype(ROW_DTYPE, copy=False), offsets
+
+    @classmethod
+    def from_arrays(
+        cls,
+        dimension_fields: Sequence[str],
+        arrays: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    ) -> "InvertedIndex":
+        """由 to_arrays 导出的 {字段: (行号, 偏移量)} 构建, 行号数组不复制"""
+        index = cls(dimension_fields)
+        for field in index.fields:
+            rows, offsets = arrays[field]
+            index._postings[field] = [
+                PostingList.from_array(rows[start:stop])
+                for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+            ]
+        return index
+
+    def _field_codes(self, store: ColumnarStore, field: str, start: int, stop: int) -> np.ndarray:
+        if field == STATUS_FIELD:
+            return store.passed[start:stop].astype(np.int32)
+        return store.codes(field)[start:stop]
+
+    def update(self, store: ColumnarStore, start: int, stop: int):
+        """将存储中 [start, stop) 的新行加入索引"""
+        count = stop - start
+        if count <= 0:
+            return
+
+        for field in self.fields:
+            postings = self._postings[field]
+            codes = self._field_codes(store, field, start, stop)
+
+            if count == 1:
+                code = int(codes[0])
+                while len(postings) <= code:
+                    postings.append(PostingList())
+                postings[code].append(start)
+                continue
+
+            # 批量: 稳定排序后按编码分段追加, 保证各行号数组仍为升序
+            order = np.argsort(codes, kind="stable")
+            sorted_codes = codes[order]
+            unique_codes, offsets = np.unique(sorted_codes, return_index=True)
+            bounds = np.append(offsets, count)
+            rows = order.astype(ROW_DTYPE) + start
+            while len(postings) <= int(unique_codes[-1]):
+                postings.append(PostingList())
+            for i, code in enumerate(unique_codes.tolist()):
+                postings[code].extend(rows[bounds[i]:bounds[i + 1]])
+
+    def lookup(self, field: str, code: int, total_rows: Optional[int] = None) -> np.ndarray:
+        """
+        获取维度值对应的行号数组
+        total_rows: 只返回小于该值的行号 (读取快照时截掉快照之后写入的行)
+        """
+        postings = self._postings[field]
+        if code >= len(postings):
+            return np.empty(0, dtype=ROW_DTYPE)
+        rows = postings[code].rows
+        if total_rows is not None:
+            rows = rows[:np.searchsorted(rows, total_rows)]
+        return rows
+
+    def count(self, field: str, code: int) -> int:
+        """维度值对应的行数"""
+        postings = self._postings[field]
+        return len(postings[code]) if code < len(postings) else 0
+
+    def intersect(self, row_lists: List[np.ndarray], total_rows: int) -> np.ndarray:
+        """
+        多个升序行号数组求交
+        从最短的数组开始; 候选集较小时用二分查找, 否则使用位图
+        """
+        if not row_lists:
+            return np.arange(total_rows, dtype=ROW_DTYPE)
+
+        row_lists = sorted(row_lists, key=len)
+        result = row_lists[0]
+        for rows in row_lists[1:]:
+            if len(result) == 0:
+                break
+            if len(result) * np.log2(len(rows) + 2) < len(rows) + total_rows / 8:
+                positions = np.searchsorted(rows, result)
+                positions[positions == len(rows)] = 0
+                result = result[rows[positions] == result] if len(rows) else result[:0]
+            else:
+                bitmap = np.zeros(total_rows, dtype=bool)
+                bitmap[rows] = True
+                result = result[bitmap[result]]
+        return result
+
+    def match(self, conditions: Dict[str, Optional[int]], total_rows: int) -> np.ndarray:
+        """
+        按 {字段: 编码} 条件求匹配行号
+        编码为None表示该值不存在, 结果为空
+        """
+        row_lists = []
+        for field, code in conditions.items():
+            if code is None:
+                return np.empty(0, dtype=ROW_DTYPE)
+            row_lists.append(self.lookup(field, code, total_rows))
+        return self.intersect(row_lists, total_rows)
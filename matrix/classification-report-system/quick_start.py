@@ -50,6 +50,10 @@ def generate_sample_data():
     print(f"✅ 已生成 {len(records)} 条示例数据")
     print(f"✅ 数据已保存到: sample_data.json")
 
+    # 保存为二进制数据集, 可通过 DataRepository.open 以内存映射方式直接打开
+    repository.save("sample_data.dataset")
+    print(f"✅ 数据集已保存到: sample_data.dataset")
+
     return repository
 
 
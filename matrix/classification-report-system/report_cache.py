@@ -0,0 +1,143 @@
+"""
+报表结果缓存
+按 (仓库版本, 规范化筛选条件, 报表类型) 缓存计算结果, 条目数与估算总大小均有上限, LRU淘汰,
+记录命中/未命中/淘汰次数
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+import sys
+import threading
+from data_model import DataRepository, RepositorySnapshot, FilterCriteria
+
+
+def approximate_size(value: Any) -> int:
+    """
+    估算对象占用的内存 (字节): 递归累加容器及元素的 sys.getsizeof;
+    带 nbytes 属性的对象 (numpy数组等) 按 nbytes 计, 同一对象只计一次
+    """
+    seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int):
+            total += nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+class ReportCache:
+    """
+    线程安全的LRU报表缓存
+    max_entries: 条目数上限; max_bytes: 条目估算总大小上限 (见 approximate_size), 超过上限的单个结果不缓存
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        if max_entries <= 0:
+            raise ValueError("max_entries必须为正整数")
+        if max_bytes <= 0:
+            raise ValueError("max_bytes必须为正整数")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        kind: Hashable = "detailed"
+    ) -> Hashable:
+        """缓存键: (仓库版本, 规范化筛选条件, 报表类型)"""
+        criteria_key = criteria.cache_key() if criteria else ()
+        return (repository.version, criteria_key, kind)
+
+    def get_or_compute(
+        self,
+        repository: Union[DataRepository, RepositorySnapshot],
+        criteria: Optional[FilterCriteria],
+        compute: Callable[[], Any],
+        kind: Hashable = "detailed"
+    ) -> Any:
+        """
+        获取缓存结果, 未命中时调用compute计算并缓存
+        仓库版本前进时旧版本条目不可能再命中, 统一清除;
+        基于旧版本快照的请求 (版本落后于缓存) 直接计算, 不读写缓存
+        """
+        key = self.make_key(repository, criteria, kind)
+        with self._lock:
+            self._invalidate_stale(key[0])
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # 计算过程不持有锁, 并发的相同请求可能重复计算
+        value = compute()
+        size = approximate_size(value)
+
+        with self._lock:
+            if key[0] == self._version and key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = value
+                self._sizes[key] = size
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._bytes -= self._sizes.pop(evicted)
+                    self.evictions += 1
+        return value
+
+    def _invalidate_stale(self, version: int):
+        """版本前进时清除旧版本条目 (调用时持有锁); 版本落后时保持不变"""
+        if self._version is None or version > self._version:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self._version = version
+
+    def clear(self):
+        """清空缓存 (保留计数器)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """监控指标"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+            }
@@ -0,0 +1,154 @@
+"""
+多进程共享数据集
+加载进程将数据仓库快照发布为共享内存目录 (默认 /dev/shm) 中的一代数据集文件 (见 dataset_format),
+各工作进程以只读内存映射方式挂载, 同一份物理内存被所有进程共享, 挂载不复制列数据与索引
+
+目录内容:
+    <name>.<代号>.dataset   各代数据集
+    <name>.current           当前代的指针 (JSON, 原子替换)
+    <name>.lock              发布锁 (多个进程同时发布时串行化)
+"""
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+import fcntl
+import json
+import os
+import threading
+from data_model import DataRepository, RepositorySnapshot
+from dataset_format import save_dataset, open_dataset
+
+
+DEFAULT_DIRECTORY = "/dev/shm"
+
+# 发布新一代后保留的旧代数 (刚读取到旧指针的进程仍可打开)
+KEEP_GENERATIONS = 1
+
+
+def _pointer_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.current")
+
+
+def _generation_path(directory: str, name: str, generation: int) -> str:
+    return os.path.join(directory, f"{name}.{generation}.dataset")
+
+
+def read_pointer(directory: str, name: str) -> Optional[Dict]:
+    """读取当前代指针, 尚未发布时返回None"""
+    try:
+        with open(_pointer_path(directory, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class SharedDatasetPublisher:
+    """加载方: 将仓库快照发布为新一代共享数据集"""
+
+    def __init__(self, name: str = "classification_report", directory: str = DEFAULT_DIRECTORY):
+        self.name = name
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @contextmanager
+    def locked(self):
+        """
+        跨进程的发布锁 (可重入)
+        在锁内先挂载当前代再基于它写入并发布, 可避免多个进程并发追加时互相覆盖
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(os.path.join(self.directory, f"{self.name}.lock"), "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def publish(self, repository: Union[DataRepository, RepositorySnapshot]) -> int:
+        """写入新一代数据集并切换指针, 返回代号"""
+        snapshot = repository.snapshot()
+        with self.locked():
+            pointer = read_pointer(self.directory, self.name)
+            generation = (pointer["generation"] if pointer else 0) + 1
+            path = _generation_path(self.directory, self.name, generation)
+            # 先写临时文件再改名, 挂载方不会看到写了一半的数据集
+            save_dataset(snapshot, path)
+
+            temp_pointer = _pointer_path(self.directory, self.name) + ".tmp"
+            with open(temp_pointer, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation, "path": path, "size": len(snapshot)}, f)
+            os.replace(temp_pointer, _pointer_path(self.directory, self.name))
+
+            self._remove_old(generation)
+            return generation
+
+    def _remove_old(self, generation: int):
+        """删除过旧的代 (已挂载的进程不受影响, 映射在其释放前一直有效)"""
+        prefix = f"{self.name}."
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith(prefix) and filename.endswith(".dataset")):
+                continue
+            try:
+                old = int(filename[len(prefix):-len(".dataset")])
+            except ValueError:
+                continue
+            if old < generation - KEEP_GENERATIONS:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except FileNotFoundError:
+                    pass
+
+    def unlink(self):
+        """删除全部代与指针 (关闭服务时调用)"""
+        prefix = f"{self.name}."
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except FileNotFoundError:
+                    pass
+
+
+class SharedDatasetReader:
+    """挂载方: 跟踪当前代, 有新一代发布时重新挂载"""
+
+    def __init__(self, name: str = "classification_report", directory: str = DEFAULT_DIRECTORY):
+        self.name = name
+        self.directory = directory
+        self.generation = 0
+        self._repository: Optional[DataRepository] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Optional[DataRepository]:
+        """
+        检查指针, 有新一代时挂载并返回新仓库; 没有变化时返回None
+        指针所指的代可能刚被发布方删除, 此时重新读取指针
+        """
+        for _ in range(3):
+            pointer = read_pointer(self.directory, self.name)
+            if pointer is None or pointer["generation"] == self.generation:
+                return None
+            with self._lock:
+                if pointer["generation"] == self.generation:
+                    return None
+                try:
+                    repository = open_dataset(pointer["path"])
+                except FileNotFoundError:
+                    continue
+                self.generation = pointer["generation"]
+                self._repository = repository
+                return repository
+        return None
+
+    def repository(self) -> Optional[DataRepository]:
+        """当前已挂载的仓库 (先检查是否有新一代)"""
+        self.refresh()
+        return self._repository
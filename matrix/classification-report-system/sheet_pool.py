@@ -0,0 +1,137 @@
+"""
+常驻sheet XML生成进程池
+完整报告中各一级分类的混淆矩阵sheet可分组交给工作进程并行生成XML (见 ExcelExporter.export_full_report 的 pool 参数)
+
+工作进程以独立的解释器运行本模块 (python sheet_pool.py), 通过标准输入/输出收发长度前缀的pickle消息:
+- 用subprocess启动 (fork后立即exec), 可以在多线程的Web进程中安全创建/替换工作进程
+- 不经multiprocessing的主模块重新导入, 工作进程只导入导出所需的模块, 不会导入web_app
+进程池在应用启动时创建一次, 之后各导出请求共用; 工作进程异常退出时自动替换
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Tuple
+import os
+import pickle
+import queue
+import struct
+import subprocess
+import sys
+
+
+# 消息头: 消息体字节数
+_HEADER = struct.Struct("<Q")
+
+# 工作进程的启动命令 (以脚本方式运行本模块, 模块所在目录自动加入导入路径)
+WORKER_COMMAND = [sys.executable, os.path.abspath(__file__)]
+
+
+class SheetRenderError(RuntimeError):
+    """工作进程生成sheet失败或异常退出"""
+
+
+def write_message(stream: BinaryIO, message) -> None:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def read_message(stream: BinaryIO):
+    """读取一条消息, 对端已关闭时抛出EOFError"""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("管道已关闭")
+    (length,) = _HEADER.unpack(header)
+    data = stream.read(length)
+    if len(data) < length:
+        raise EOFError("管道已关闭")
+    return pickle.loads(data)
+
+
+class _Worker:
+    """一个工作进程及其管道 (同一时间只由一个线程使用)"""
+
+    def __init__(self):
+        self.process = subprocess.Popen(WORKER_COMMAND, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def call(self, items: List[Tuple[str, Dict]]) -> List[bytes]:
+        try:
+            write_message(self.process.stdin, items)
+            ok, result = read_message(self.process.stdout)
+        except (EOFError, OSError) as e:
+            raise SheetRenderError(f"sheet生成进程异常退出: {e}") from None
+        if not ok:
+            raise SheetRenderError(f"sheet生成失败: {result}")
+        return result
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self):
+        """关闭输入管道 (工作进程读到EOF后退出) 并等待退出"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+class SheetRenderPool:
+    """
+    固定数量工作进程的sheet XML生成池 (线程安全)
+    processes: 工作进程数, 创建时全部启动
+    """
+
+    def __init__(self, processes: int):
+        if processes <= 0:
+            raise ValueError("processes必须为正整数")
+        self.processes = processes
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        # 每个分派线程同一时间占用一个工作进程
+        self._dispatcher = ThreadPoolExecutor(max_workers=processes, thread_name_prefix="sheet-render")
+        for _ in range(processes):
+            self._idle.put(_Worker())
+
+    def submit(self, items: List[Tuple[str, Dict]]) -> Future:
+        """提交一组混淆矩阵sheet [(sheet名称, 矩阵数据)], Future的结果为各sheet的XML (顺序同items)"""
+        return self._dispatcher.submit(self._render, items)
+
+    def _render(self, items: List[Tuple[str, Dict]]) -> List[bytes]:
+        worker = self._idle.get()
+        try:
+            return worker.call(items)
+        finally:
+            if not worker.alive():
+                worker.stop()
+                worker = _Worker()
+            self._idle.put(worker)
+
+    def close(self):
+        """等待已提交的任务完成后停止全部工作进程"""
+        self._dispatcher.shutdown(wait=True)
+        for _ in range(self.processes):
+            self._idle.get().stop()
+
+
+def _serve():
+    """工作进程主循环: 逐条读取任务并写回结果, 输入管道关闭 (主进程退出/关闭进程池) 时退出"""
+    from excel_exporter import render_matrix_sheets
+
+    requests, responses = sys.stdin.buffer, sys.stdout.buffer
+    # 标准输出专用于消息, 其他输出转到标准错误
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            items = read_message(requests)
+        except EOFError:
+            return
+        try:
+            response = (True, render_matrix_sheets(items))
+        except Exception as e:
+            response = (False, f"{type(e).__name__}: {e}")
+        write_message(responses, response)
+
+
+if __name__ == "__main__":
+    _serve()
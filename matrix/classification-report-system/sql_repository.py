@@ -0,0 +1,479 @@
+"""
+SQLite数据仓库
+与DataRepository接口一致的数据库实现 (SQLite作为MySQL的本地替代):
+筛选条件转换为走索引的WHERE子句, 混淆矩阵计数由数据库 GROUP BY actual_value, expected_value 完成,
+报表统计不把原始行取到Python中
+明细/导出/分页等按行号工作的接口 (snapshot/match_rows/materialize 及文件导入导出) 作用于
+整表读入内存的版本快照 (每个数据版本读取一次)
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import sqlite3
+import threading
+import numpy as np
+from aggregate_cube import ConfusionCube, IncrementalConfusionState
+from columnar_store import ColumnarStore, DimensionDictionary
+from confusion_matrix import ConfusionMatrixGenerator, NUM_CLASSES
+from data_model import (
+    ClassificationRecord, DataRepository, FilterCriteria, RecordSelection, RepositorySnapshot, ResultStatus,
+    DIMENSION_FIELDS, EXTRA_FIELDS, record_from_row, validate_columns, columns_from_dicts
+)
+from inverted_index import InvertedIndex
+
+
+# 表中的记录列 (不含自增主键)
+RECORD_COLUMNS = ("expected_value", "actual_value", "passed") + DIMENSION_FIELDS + EXTRA_FIELDS
+
+# 逐批写入/读取的行数
+BATCH_SIZE = 10000
+
+
+class SqlDataRepository:
+    """
+    基于SQLite的数据仓库
+    - 每个维度建立 (维度, actual_value, expected_value) 覆盖索引, 单维度筛选的计数只读索引
+    - (actual_value, expected_value) 索引对应评估库的 idx_actural_predicted, 用于无筛选的总体计数
+    - version 在每次写入后递增 (用于报表缓存); 其他进程直接写库不会更新该版本号
+    - snapshot() 将整表读入内存 (列式存储 + 索引 + 立方体), 版本与 version 一致, 写入前重复调用返回同一快照;
+      占用内存与内存仓库相当, 统计请使用 report_generator
+    """
+
+    def __init__(self, database: str = ":memory:", table: str = "classification_record"):
+        self.database = database
+        self.table = table
+        self.version = 0
+        self._lock = threading.RLock()
+        self._snapshot: Optional[RepositorySnapshot] = None
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        if database != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        dimension_columns = ",\n".join(f"    {field} TEXT NOT NULL" for field in DIMENSION_FIELDS)
+        extra_columns = ",\n".join(f"    {field} TEXT" for field in EXTRA_FIELDS)
+        with self._lock, self._connection:
+            self._connection.execute(f"""CREATE TABLE IF NOT EXISTS {self.table} (
+    id INTEGER PRIMARY KEY,
+    expected_value INTEGER NOT NULL,
+    actual_value INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+{dimension_columns},
+{extra_columns}
+)""")
+            self._create_indexes(self._connection)
+
+    def _index_columns(self) -> Dict[str, str]:
+        """
+        {索引名: 索引列}
+        维度索引附带一级分类与 (actual_value, expected_value), 按单个维度筛选的详细报表只读索引
+        """
+        indexes = {f"idx_{self.table}_actual_expected": "actual_value, expected_value"}
+        for field in DIMENSION_FIELDS:
+            columns = [field] + (["primary_category"] if field != "primary_category" else [])
+            indexes[f"idx_{self.table}_{field}"] = ", ".join(columns + ["actual_value", "expected_value"])
+        return indexes
+
+    def _create_indexes(self, connection):
+        for name, columns in self._index_columns().items():
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({columns})")
+
+    def _drop_indexes(self, connection):
+        for name in self._index_columns():
+            connection.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._connection.close()
+
+    @contextmanager
+    def _writing(self):
+        """写事务: 成功提交后递增版本号, 异常时回滚"""
+        with self._lock:
+            with self._connection:
+                yield self._connection
+            self.version += 1
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[Tuple]:
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    # ---- 筛选条件 ----
+
+    @staticmethod
+    def where_clause(criteria: FilterCriteria = None, after_id: Optional[int] = None) -> Tuple[str, List]:
+        """
+        将筛选条件转换为参数化WHERE子句, 返回 (子句, 参数)
+        after_id: 只包含主键大于该值的行 (分批读取)
+        """
+        conditions, params = [], []
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        if criteria:
+            for field in DIMENSION_FIELDS:
+                value = getattr(criteria, field)
+                if value:
+                    conditions.append(f"{field} = ?")
+                    params.append(value)
+            if criteria.status:
+                conditions.append("passed = ?")
+                params.append(int(ResultStatus(criteria.status) == ResultStatus.PASS))
+        if not conditions:
+            return "", params
+        return "WHERE " + " AND ".join(conditions), params
+
+    # ---- 写入 ----
+
+    def _insert_columns(self, connection, expected, actual, passed, dimensions: Dict, extras: Dict):
+        """在当前写事务中插入已校验的列数据"""
+        count = len(expected)
+        columns = [
+            np.asarray(expected).tolist(),
+            np.asarray(actual).tolist(),
+            np.asarray(passed, dtype=np.int8).tolist(),
+        ]
+        columns += [dimensions[field] for field in DIMENSION_FIELDS]
+        columns += [
+            extras.get(field) if extras.get(field) is not None else [None] * count
+            for field in EXTRA_FIELDS
+        ]
+        placeholders = ", ".join("?" * len(RECORD_COLUMNS))
+        sql = f"INSERT INTO {self.table} ({', '.join(RECORD_COLUMNS)}) VALUES ({placeholders})"
+        connection.executemany(sql, zip(*columns))
+
+    def add_record(self, record: ClassificationRecord):
+        """添加单条记录"""
+        self.add_records([record])
+
+    def add_records(self, records: List[ClassificationRecord]):
+        """批量添加记录 (单个事务)"""
+        if not records:
+            return
+        with self._writing() as connection:
+            self._insert_columns(
+                connection,
+                [r.expected_value for r in records],
+                [r.actual_value for r in records],
+                [r.status == ResultStatus.PASS for r in records],
+                {field: [getattr(r, field) for r in records] for field in DIMENSION_FIELDS},
+                {field: [getattr(r, field) for r in records] for field in EXTRA_FIELDS}
+            )
+
+    def ingest_columns(self, columns: Dict[str, Sequence], skip_invalid: bool = False) -> Dict:
+        """批量导入列数据, 校验规则与返回值见 DataRepository.ingest_columns"""
+        prepared, result = validate_columns(columns, skip_invalid)
+        if result["accepted"]:
+            with self._writing() as connection:
+                self._insert_columns(connection, **prepared)
+        return result
+
+    def ingest_dicts(self, rows: Sequence[Dict], skip_invalid: bool = False) -> Dict:
+        """批量导入字典记录, 见 ingest_columns"""
+        return self.ingest_columns(columns_from_dicts(rows), skip_invalid=skip_invalid)
+
+    def _copy_from(self, connection, other: DataRepository) -> int:
+        """
+        在当前写事务中分批插入内存仓库当前快照的全部记录
+        表为空时先删除索引, 插入后再整体重建 (比逐行维护索引快得多)
+        """
+        store = other.snapshot().store
+        rebuild = connection.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone() is None
+        if rebuild:
+            self._drop_indexes(connection)
+        for start in range(0, store.size, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, store.size)
+            extras = {}
+            for field in EXTRA_FIELDS:
+                column = store.extras(field)
+                extras[field] = [column[i] for i in range(start, stop)]
+            self._insert_columns(
+                connection,
+                store.expected[start:stop],
+                store.actual[start:stop],
+                store.passed[start:stop],
+                {
+                    field: [store.dictionaries[field].values[code] for code in store.codes(field)[start:stop].tolist()]
+                    for field in DIMENSION_FIELDS
+                },
+                extras
+            )
+        if rebuild:
+            self._create_indexes(connection)
+        return store.size
+
+    def append_from(self, other: DataRepository) -> int:
+        """追加内存仓库当前快照中的全部记录 (单个事务), 返回追加的记录数"""
+        with self._writing() as connection:
+            return self._copy_from(connection, other)
+
+    def replace_with(self, other: DataRepository):
+        """在一个事务内用内存仓库的记录替换全部记录"""
+        with self._writing() as connection:
+            connection.execute(f"DELETE FROM {self.table}")
+            self._copy_from(connection, other)
+
+    def clear(self):
+        """清空所有记录"""
+        with self._writing() as connection:
+            connection.execute(f"DELETE FROM {self.table}")
+
+    @classmethod
+    def open(cls, path: str, database: str = ":memory:", table: str = "classification_record") -> "SqlDataRepository":
+        """以数据集文件 (见 dataset_format) 的内容创建数据库仓库 (替换表中已有记录)"""
+        from dataset_format import open_dataset
+        repository = cls(database, table)
+        repository.replace_with(open_dataset(path))
+        return repository
+
+    def import_parquet(self, path: str, **options) -> Dict:
+        """按行组流式追加Parquet文件中的记录 (见 arrow_io.read_parquet)"""
+        from arrow_io import read_parquet
+        return read_parquet(self, path, **options)
+
+    def import_arrow(self, path: str, **options) -> Dict:
+        """追加Arrow IPC文件中的记录 (见 arrow_io.read_arrow)"""
+        from arrow_io import read_arrow
+        return read_arrow(self, path, **options)
+
+    # ---- 版本快照 (整表读入内存) ----
+
+    def snapshot(self) -> RepositorySnapshot:
+        """
+        当前数据的只读快照, 版本与 version 一致; 读取期间持有锁, 不会看到写入一半的事务
+        同一版本只读取一次, 之后的写入不影响已返回的快照
+        """
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != self.version:
+                store = self._load_store()
+                index = InvertedIndex(DIMENSION_FIELDS)
+                cube = ConfusionCube(DIMENSION_FIELDS)
+                state = IncrementalConfusionState(DIMENSION_FIELDS)
+                for structure in (index, cube, state):
+                    structure.update(store, 0, store.size)
+                self._snapshot = DataRepository.from_parts(
+                    store, index, cube, state, version=self.version
+                ).snapshot()
+            return self._snapshot
+
+    @property
+    def store(self) -> ColumnarStore:
+        """当前快照的列式存储"""
+        return self.snapshot().store
+
+    @property
+    def cube(self) -> ConfusionCube:
+        """当前快照的预聚合混淆计数立方体"""
+        return self.snapshot().cube
+
+    @property
+    def state(self) -> IncrementalConfusionState:
+        """当前快照的总体/分组混淆计数"""
+        return self.snapshot().state
+
+    @property
+    def records(self) -> List[ClassificationRecord]:
+        """兼容旧接口: 物化后的全部记录"""
+        return self.get_all_records()
+
+    def criteria_codes(self, criteria: FilterCriteria) -> dict:
+        """将筛选条件转换为当前快照中的 {字段: 编码}"""
+        return self.snapshot().criteria_codes(criteria)
+
+    def match_rows(self, criteria: FilterCriteria) -> np.ndarray:
+        """根据条件返回当前快照中匹配的行号数组 (升序, 即主键顺序)"""
+        return self.snapshot().match_rows(criteria)
+
+    def materialize(self, rows: Optional[np.ndarray]) -> List[ClassificationRecord]:
+        """将当前快照的行号物化为记录对象 (None表示全部行)"""
+        return self.snapshot().materialize(rows)
+
+    def save(self, path: str) -> int:
+        """将当前快照保存为二进制数据集文件 (见 dataset_format), 返回文件字节数"""
+        from dataset_format import save_dataset
+        return save_dataset(self.snapshot(), path)
+
+    def export_parquet(self, path: str, criteria: FilterCriteria = None, **options) -> int:
+        """导出为Parquet文件 (见 arrow_io.write_parquet), 返回导出行数"""
+        from arrow_io import write_parquet
+        return write_parquet(self, path, criteria, **options)
+
+    def export_arrow(self, path: str, criteria: FilterCriteria = None, **options) -> int:
+        """导出为Arrow IPC文件 (见 arrow_io.write_arrow), 返回导出行数"""
+        from arrow_io import write_arrow
+        return write_arrow(self, path, criteria, **options)
+
+    # ---- 读取 ----
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def count(self, criteria: FilterCriteria = None) -> int:
+        """满足条件的记录数"""
+        where, params = self.where_clause(criteria)
+        return self._query(f"SELECT COUNT(*) FROM {self.table} {where}", params)[0][0]
+
+    def count_distinct(self, fields: Sequence[str], criteria: FilterCriteria = None) -> Dict[str, int]:
+        """满足条件的记录中各维度的不同取值数 (一次查询)"""
+        for field in fields:
+            if field not in DIMENSION_FIELDS:
+                raise ValueError(f"不支持的维度: {field}")
+        where, params = self.where_clause(criteria)
+        if not where:
+            # 无筛选条件时逐个维度查询, 每次只读该维度的索引
+            return {
+                field: self._query(f"SELECT COUNT(DISTINCT {field}) FROM {self.table}")[0][0]
+                for field in fields
+            }
+        counts = ", ".join(f"COUNT(DISTINCT {field})" for field in fields)
+        row = self._query(f"SELECT {counts} FROM {self.table} {where}", params)[0]
+        return dict(zip(fields, row))
+
+    def confusion_counts(
+        self,
+        criteria: FilterCriteria = None,
+        dimensions: Sequence[str] = ()
+    ) -> List[Tuple]:
+        """
+        在数据库中按 (维度..., actual_value, expected_value) 分组计数
+        返回 [(维度值..., actual_value, expected_value, 计数)], 按维度值排序
+        """
+        for field in dimensions:
+            if field not in DIMENSION_FIELDS:
+                raise ValueError(f"不支持的分组维度: {field}")
+        where, params = self.where_clause(criteria)
+        keys = ", ".join(list(dimensions) + ["actual_value", "expected_value"])
+        order = f"ORDER BY {', '.join(dimensions)}" if dimensions else ""
+        return self._query(
+            f"SELECT {keys}, COUNT(*) FROM {self.table} {where} GROUP BY {keys} {order}", params
+        )
+
+    def explain(self, criteria: FilterCriteria = None, dimensions: Sequence[str] = ()) -> List[str]:
+        """confusion_counts 的查询计划 (用于确认使用了索引)"""
+        where, params = self.where_clause(criteria)
+        keys = ", ".join(list(dimensions) + ["actual_value", "expected_value"])
+        rows = self._query(
+            f"EXPLAIN QUERY PLAN SELECT {keys}, COUNT(*) FROM {self.table} {where} GROUP BY {keys}",
+            params
+        )
+        return [row[-1] for row in rows]
+
+    def iter_rows(self, criteria: FilterCriteria = None, batch_size: int = BATCH_SIZE) -> Iterator[Dict]:
+        """
+        按主键顺序分批读取满足条件的行 (字段字典, 与列式存储的行格式一致)
+        每批按主键续读 (id > 上一批末行), 批次之间不占用连接
+        """
+        last_id = None
+        while True:
+            where, params = self.where_clause(criteria, last_id)
+            rows = self._query(
+                f"SELECT id, {', '.join(RECORD_COLUMNS)} FROM {self.table} {where} "
+                f"ORDER BY id LIMIT ?",
+                params + [batch_size]
+            )
+            for row in rows:
+                yield dict(zip(RECORD_COLUMNS, row[1:]))
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def filter_records(self, criteria: FilterCriteria) -> List[ClassificationRecord]:
+        """根据条件筛选记录"""
+        return [record_from_row(row) for row in self.iter_rows(criteria)]
+
+    def get_all_records(self) -> List[ClassificationRecord]:
+        """获取所有记录"""
+        return self.filter_records(None)
+
+    def select(self, criteria: FilterCriteria = None) -> RecordSelection:
+        """将满足条件的行读入内存列式视图 (用于明细/导出; 统计请使用 report_generator)"""
+        return RecordSelection(self._load_store(criteria))
+
+    def _load_store(self, criteria: FilterCriteria = None) -> ColumnarStore:
+        """将满足条件的行按主键顺序读入列式存储"""
+        store = ColumnarStore(DIMENSION_FIELDS, EXTRA_FIELDS)
+        rows = list(self.iter_rows(criteria))
+        store.extend(
+            [row["expected_value"] for row in rows],
+            [row["actual_value"] for row in rows],
+            [bool(row["passed"]) for row in rows],
+            {field: [row[field] for row in rows] for field in DIMENSION_FIELDS},
+            {field: [row[field] for row in rows] for field in EXTRA_FIELDS}
+        )
+        return store
+
+    def get_unique_values(self, field: str) -> List[str]:
+        """获取某个字段的所有唯一值 (格式与DataRepository一致; 维度/数值字段只读索引)"""
+        if field == "status":
+            rows = self._query(f"SELECT DISTINCT passed FROM {self.table}")
+            return sorted(str(ResultStatus.PASS if row[0] else ResultStatus.FAIL) for row in rows)
+        if field not in ("expected_value", "actual_value") + DIMENSION_FIELDS + EXTRA_FIELDS:
+            return []
+        rows = self._query(f"SELECT DISTINCT {field} FROM {self.table} WHERE {field} IS NOT NULL")
+        # 与内存仓库一致: 空值 (含预期值/实际值0) 不计入, 按字符串排序
+        return sorted({str(row[0]) for row in rows if row[0]})
+
+    def report_generator(self, filter_criteria: FilterCriteria = None) -> "SqlReportGenerator":
+        """在数据库中聚合的报表生成器"""
+        return SqlReportGenerator(self, filter_criteria)
+
+
+class SqlReportGenerator(ConfusionMatrixGenerator):
+    """
+    基于SQL聚合的报表生成器, 输出与ConfusionMatrixGenerator一致
+    分组计数/总体计数/唯一值数均由数据库计算, 只取回聚合结果
+    """
+
+    def __init__(self, repository: SqlDataRepository, filter_criteria: FilterCriteria = None):
+        self.records = None
+        self.selection = None
+        self.value_range = range(0, 16)  # 0-15
+        self.repository = repository
+        self.filter_criteria = filter_criteria
+        # 分组结果中出现的维度取值 (按查询结果编码)
+        self._dictionaries: Dict[str, DimensionDictionary] = {}
+        self._unique_counts: Optional[Dict[str, int]] = None
+
+    @property
+    def total_records(self) -> int:
+        """满足条件的记录数"""
+        return self.repository.count(self.filter_criteria)
+
+    def _grouped_counts(self, dimensions: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        rows = self.repository.confusion_counts(self.filter_criteria, dimensions)
+        dictionaries = [DimensionDictionary() for _ in dimensions]
+        self._dictionaries.update(zip(dimensions, dictionaries))
+
+        width = len(dimensions)
+        group_keys, matrices = [], []
+        for row in rows:
+            key = row[:width]
+            if not group_keys or group_keys[-1] != key:
+                group_keys.append(key)
+                matrices.append(np.zeros((NUM_CLASSES, NUM_CLASSES), dtype=np.int64))
+            actual, expected, count = row[width:]
+            matrices[-1][actual, expected] = count
+
+        group_codes = np.array(
+            [[d.encode(value) for d, value in zip(dictionaries, key)] for key in group_keys],
+            dtype=np.intp
+        ).reshape(len(group_keys), width)
+        tensor = np.array(matrices, dtype=np.int64).reshape(len(matrices), NUM_CLASSES, NUM_CLASSES)
+        return tensor, group_codes
+
+    def _dictionary(self, field: str) -> DimensionDictionary:
+        return self._dictionaries.get(field, DimensionDictionary())
+
+    def _overall_counts(self) -> np.ndarray:
+        matrix = np.zeros((NUM_CLASSES, NUM_CLASSES), dtype=np.int64)
+        for actual, expected, count in self.repository.confusion_counts(self.filter_criteria):
+            matrix[actual, expected] = count
+        return matrix
+
+    def _unique_count(self, field: str) -> int:
+        # 汇总所需的各维度唯一值数在首次使用时一次查询得到
+        if self._unique_counts is None:
+            self._unique_counts = self.repository.count_distinct(DIMENSION_FIELDS, self.filter_criteria)
+        return self._unique_counts[field]
@@ -0,0 +1,239 @@
+"""
+流式数据导入
+逐块读取 NDJSON / JSON数组 请求体, 按固定批大小写入数据仓库, 内存占用与总数据量无关
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import codecs
+import json
+import re
+import time
+from data_model import DataRepository, BulkValidationError, columns_from_dicts
+
+
+# 每次从输入流读取的字节数
+READ_CHUNK_SIZE = 1 << 16
+
+# 单条记录的最大文本长度, 防止格式错误时无限缓冲
+MAX_ELEMENT_SIZE = 1 << 20
+
+# 默认批大小
+DEFAULT_BATCH_SIZE = 10000
+
+# 数组中数值元素之后的分隔符
+_NUMBER_END = re.compile(r"[,\]\s]")
+
+
+class StreamFormatError(ValueError):
+    """流数据格式错误"""
+
+
+def _iter_text(stream) -> Iterator[str]:
+    """按块读取二进制流并增量解码为UTF-8文本"""
+    chunk_size = READ_CHUNK_SIZE
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+
+def iter_ndjson(stream) -> Iterator[Dict]:
+    """逐行解析NDJSON (每行一个JSON对象, 空行忽略)"""
+    buffer = ""
+    line_number = 0
+
+    def parse(line: str):
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError as e:
+            raise StreamFormatError(f"第{line_number}行不是合法的JSON: {e.msg}")
+
+    for text in _iter_text(stream):
+        buffer += text
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        if len(buffer) > MAX_ELEMENT_SIZE:
+            raise StreamFormatError(f"第{line_number + 1}行超过最大长度 {MAX_ELEMENT_SIZE}")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield parse(line)
+
+    if buffer.strip():
+        line_number += 1
+        yield parse(buffer)
+
+
+def iter_json_array(stream) -> Iterator[Dict]:
+    """
+    增量解析JSON数组 [ {...}, {...}, ... ]
+    也接受与 /api/data/upload 相同的 {"records": [...]} 包装 (records须为首个键)
+    """
+    decoder = json.JSONDecoder()
+    chunks = _iter_text(stream)
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        """读取更多文本, 返回是否读到数据"""
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        try:
+            text = next(chunks)
+        except StopIteration:
+            eof = True
+            return False
+        buffer = buffer[position:] + text
+        position = 0
+        return True
+
+    def next_char() -> Optional[str]:
+        """跳过空白, 返回下一个非空白字符 (不消费)"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return None
+
+    def expect_prefix(prefix: str):
+        nonlocal position
+        while len(buffer) - position < len(prefix) and fill():
+            pass
+        if buffer[position:position + len(prefix)] != prefix:
+            raise StreamFormatError(f"期望 {prefix!r}")
+        position += len(prefix)
+
+    first = next_char()
+    if first == "{":
+        # {"records": [...]} 包装
+        expect_prefix("{")
+        next_char()
+        expect_prefix('"records"')
+        next_char()
+        expect_prefix(":")
+        first = next_char()
+    if first != "[":
+        raise StreamFormatError("请求体应为JSON数组或 {\"records\": [...]}")
+    expect_prefix("[")
+
+    expect_value = True
+    while True:
+        char = next_char()
+        if char is None:
+            raise StreamFormatError("JSON数组未结束")
+        if char == "]":
+            position += 1
+            return
+        if char == ",":
+            if expect_value:
+                raise StreamFormatError("JSON数组中存在多余的逗号")
+            position += 1
+            expect_value = True
+            continue
+        if not expect_value:
+            raise StreamFormatError("JSON数组元素之间缺少逗号")
+
+        if char in "-0123456789":
+            # 数值没有结束符, 在块边界可能只读到一部分 (如 123 只读到 12): 读到其后的分隔符或输入结束后再解析
+            while _NUMBER_END.search(buffer, position) is None:
+                if len(buffer) - position > MAX_ELEMENT_SIZE:
+                    raise StreamFormatError(f"数组元素超过最大长度 {MAX_ELEMENT_SIZE}")
+                if not fill():
+                    break
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError as e:
+                if len(buffer) - position > MAX_ELEMENT_SIZE:
+                    raise StreamFormatError(f"数组元素超过最大长度 {MAX_ELEMENT_SIZE}")
+                if not fill():
+                    raise StreamFormatError(f"数组元素不是合法的JSON: {e.msg}")
+        position = end
+        expect_value = False
+        yield value
+
+
+def ingest_stream(
+    repository: DataRepository,
+    rows: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    skip_invalid: bool = True,
+    max_errors: int = 100,
+    on_batch: Callable[[Dict], None] = None
+) -> Dict:
+    """
+    按批将记录流写入仓库
+    skip_invalid: True时跳过无效行并记录错误; False时遇到含无效行的批次抛出BulkValidationError
+                  (此前的批次已写入)
+    on_batch: 每写入一批后回调, 参数为当前进度
+    返回: {"rows_received", "rows_accepted", "rows_rejected", "batches", "errors", "elapsed_seconds"}
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size必须为正整数")
+
+    def batches() -> Iterator[Dict[str, List]]:
+        batch: List[Dict] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield columns_from_dicts(batch)
+                batch = []
+        if batch:
+            yield columns_from_dicts(batch)
+
+    return ingest_batches(repository, batches(), skip_invalid, max_errors, on_batch)
+
+
+def ingest_batches(
+    repository: DataRepository,
+    batches: Iterable[Dict[str, Sequence]],
+    skip_invalid: bool = True,
+    max_errors: int = 100,
+    on_batch: Callable[[Dict], None] = None
+) -> Dict:
+    """
+    按批写入列数据 (每批为 ingest_columns 的列字典), 参数与返回值见 ingest_stream
+    错误中的行号为整个输入中的行号
+    """
+    started = time.time()
+    progress = {
+        "rows_received": 0,
+        "rows_accepted": 0,
+        "rows_rejected": 0,
+        "batches": 0,
+        "errors": [],
+    }
+
+    for columns in batches:
+        offset = progress["rows_received"]
+        try:
+            result = repository.ingest_columns(columns, skip_invalid=skip_invalid)
+        except BulkValidationError as e:
+            for error in e.errors:
+                error["row"] += offset
+            raise
+        progress["rows_received"] += result["accepted"] + result["rejected"]
+        progress["rows_accepted"] += result["accepted"]
+        progress["rows_rejected"] += result["rejected"]
+        progress["batches"] += 1
+        room = max_errors - len(progress["errors"])
+        for error in result["errors"][:max(room, 0)]:
+            progress["errors"].append(dict(error, row=error["row"] + offset))
+        if on_batch:
+            on_batch(dict(progress, errors=None))
+
+    progress["elapsed_seconds"] = round(time.time() - started, 3)
+    return progress
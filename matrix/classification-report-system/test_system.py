@@ -3,8 +3,12 @@
 验证各个模块的功能是否正常
 """
 import sys
-from data_model import DataRepository, ClassificationRecord, FilterCriteria, ResultStatus
-from confusion_matrix import ConfusionMatrixGenerator, generate_report_from_repository
+from data_model import (
+    DataRepository, ClassificationRecord, FilterCriteria, ResultStatus, BulkValidationError
+)
+from confusion_matrix import (
+    ConfusionMatrixGenerator, CubeReportGenerator, generate_report_from_repository
+)
 from excel_exporter import ExcelExporter
 
 
@@ -320,6 +324,2259 @@ def test_filter_criteria():
         return False
 
 
+def test_columnar_repository():
+    """测试列式存储仓库"""
+    print("\n" + "=" * 60)
+    print("测试7: 列式存储")
+    print("=" * 60)
+
+    try:
+        import numpy as np
+
+        repo = DataRepository()
+        records = []
+        for i in range(20):
+            records.append(ClassificationRecord(
+                primary_category=f"分类{i % 3}",
+                secondary_category="子分类",
+                expected_value=i % 16,
+                actual_value=(i * 3) % 16,
+                status="pass",
+                use_case="用例",
+                scenario="场景A" if i % 2 else "场景B",
+                vertical="垂类",
+                factor="因子",
+                factor_value="值",
+                test_id=f"T{i}"
+            ))
+        repo.add_records(records[:10])
+        for record in records[10:]:
+            repo.add_record(record)
+
+        store = repo.store
+        assert len(repo) == 20, "应有20条记录"
+        assert store.expected.dtype == np.uint8, "预期值应为uint8"
+        assert store.passed.dtype == np.bool_, "状态应为bool数组"
+        assert len(store.dictionaries["primary_category"]) == 3, "一级分类应编码为3个值"
+
+        # 物化结果与原始记录一致, 写入后缓存失效
+        materialized = repo.get_all_records()
+        assert [r.to_dict() for r in materialized] == [r.to_dict() for r in records]
+        assert repo.get_all_records() is materialized, "未写入时应复用物化结果"
+        repo.add_record(records[0])
+        assert len(repo.get_all_records()) == 21, "写入后应重新物化"
+
+        # 筛选
+        criteria = FilterCriteria(primary_category="分类1", scenario="场景A")
+        expected = [r for r in repo.get_all_records() if criteria.matches(r)]
+        filtered = repo.filter_records(criteria)
+        assert [r.to_dict() for r in filtered] == [r.to_dict() for r in expected]
+        assert repo.filter_records(FilterCriteria(vertical="不存在")) == []
+
+        # 唯一值与原实现一致: 非字符串取值转换为字符串后排序
+        mixed = ClassificationRecord(
+            primary_category=2024, secondary_category="子类", expected_value=1, actual_value=1,
+            status="pass", use_case="用例", scenario="场景A", vertical="垂类", factor="因子", factor_value="值"
+        )
+        repo.add_record(mixed)
+        assert repo.get_unique_values("primary_category") == sorted(
+            {str(r.primary_category) for r in repo.get_all_records()}
+        )
+
+        repo.clear()
+        assert len(repo) == 0 and repo.get_all_records() == []
+
+        print("✅ 列式存储测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 列式存储测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_inverted_index_filter():
+    """测试倒排索引筛选"""
+    print("\n" + "=" * 60)
+    print("测试8: 倒排索引筛选")
+    print("=" * 60)
+
+    try:
+        import random
+        from example_usage import create_sample_data
+
+        random.seed(7)
+        records = create_sample_data(300)
+        repo = DataRepository()
+        repo.add_records(records[:200])
+        for record in records[200:]:
+            repo.add_record(record)
+
+        all_records = repo.get_all_records()
+        for _ in range(50):
+            sample = random.choice(records)
+            fields = random.sample(
+                ["use_case", "scenario", "vertical", "factor",
+                 "factor_value", "primary_category", "secondary_category"],
+                random.randint(1, 4)
+            )
+            criteria = FilterCriteria(**{f: getattr(sample, f) for f in fields})
+            if random.random() < 0.3:
+                criteria.status = random.choice([ResultStatus.PASS, ResultStatus.FAIL])
+
+            expected = [r.test_id for r in all_records if criteria.matches(r)]
+            actual = [r.test_id for r in repo.filter_records(criteria)]
+            assert actual == expected, f"索引筛选结果不一致: {criteria}"
+
+        repo.clear()
+        assert repo.filter_records(FilterCriteria(primary_category="电商")) == []
+        repo.add_records(records[:10])
+        assert len(repo.filter_records(FilterCriteria())) == 10, "清空后索引应重建"
+
+        print("✅ 倒排索引筛选测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 倒排索引筛选测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_vectorized_matrix_kernel():
+    """测试向量化混淆矩阵计算与逐条统计结果一致"""
+    print("\n" + "=" * 60)
+    print("测试9: 向量化矩阵计算")
+    print("=" * 60)
+
+    try:
+        import random
+        from example_usage import create_sample_data
+
+        def reference_metrics(records):
+            # 逐条累加的参考实现
+            matrix = [[0] * 16 for _ in range(16)]
+            for r in records:
+                matrix[r.actual_value][r.expected_value] += 1
+            total_expected = [sum(matrix[i][j] for i in range(16)) for j in range(16)]
+            total_actual = [sum(row) for row in matrix]
+            precision = [
+                round(matrix[i][i] / total_expected[i] * 100, 2) if total_expected[i] else 0.0
+                for i in range(16)
+            ]
+            recall = [
+                round(matrix[i][i] / total_actual[i] * 100, 2) if total_actual[i] else 0.0
+                for i in range(16)
+            ]
+            return {
+                "matrix": matrix,
+                "precision": precision,
+                "recall": recall,
+                "total_expected": total_expected,
+                "total_actual": total_actual,
+                "total_records": len(records)
+            }
+
+        random.seed(11)
+        records = create_sample_data(400)
+        repo = DataRepository()
+        repo.add_records(records)
+
+        for source in (records, repo.select()):
+            report = ConfusionMatrixGenerator(source).generate_detailed_report()
+            assert report["overall"] == reference_metrics(records), "总体矩阵不一致"
+
+            categories = {}
+            for r in records:
+                categories.setdefault(r.primary_category, []).append(r)
+            assert list(report["by_primary_category"]) == list(categories), "分类顺序不一致"
+            for name, group in categories.items():
+                assert report["by_primary_category"][name] == reference_metrics(group)
+
+        # 筛选视图
+        criteria = FilterCriteria(scenario="PC端")
+        selected = ConfusionMatrixGenerator(repo.select(criteria)).generate_overall_matrix()
+        assert selected == reference_metrics([r for r in records if criteria.matches(r)])
+
+        print("✅ 向量化矩阵计算测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 向量化矩阵计算测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_single_pass_report():
+    """测试单次分组统计的详细报告"""
+    print("\n" + "=" * 60)
+    print("测试10: 单次分组统计报告")
+    print("=" * 60)
+
+    try:
+        import random
+        from example_usage import create_sample_data
+        from confusion_matrix import grouped_confusion_counts
+
+        random.seed(5)
+        records = create_sample_data(500)
+        repo = DataRepository()
+        repo.add_records(records)
+
+        criteria = FilterCriteria(vertical="零售")
+        selected = [r for r in records if criteria.matches(r)]
+        report = ConfusionMatrixGenerator(repo.select(criteria)).generate_detailed_report()
+
+        # 汇总与逐条统计一致
+        summary = report["summary"]
+        passed = sum(1 for r in selected if r.status == ResultStatus.PASS)
+        assert summary["total_records"] == len(selected)
+        assert summary["passed"] == passed
+        assert summary["failed"] == len(selected) - passed
+        assert summary["unique_counts"] == {
+            "primary_categories": len(set(r.primary_category for r in selected)),
+            "secondary_categories": len(set(r.secondary_category for r in selected)),
+            "use_cases": len(set(r.use_case for r in selected)),
+            "scenarios": len(set(r.scenario for r in selected)),
+            "verticals": len(set(r.vertical for r in selected)),
+            "factors": len(set(r.factor for r in selected))
+        }
+
+        # 各分类矩阵之和等于总体矩阵
+        import numpy as np
+        by_category = report["by_primary_category"]
+        assert set(by_category) == set(r.primary_category for r in selected)
+        total = sum(np.array(m["matrix"]) for m in by_category.values())
+        assert total.tolist() == report["overall"]["matrix"]
+
+        tensor = grouped_confusion_counts(
+            np.array([0, 1, 1, 2]), 3, np.array([1, 2, 2, 15]), np.array([1, 3, 3, 0])
+        )
+        assert tensor.shape == (3, 16, 16)
+        assert tensor[1][2][3] == 2 and tensor[2][15][0] == 1 and tensor.sum() == 4
+
+        print("✅ 单次分组统计报告测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 单次分组统计报告测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_group_by_dimensions():
+    """测试任意维度分组矩阵"""
+    print("\n" + "=" * 60)
+    print("测试11: 任意维度分组")
+    print("=" * 60)
+
+    try:
+        import random
+        import confusion_matrix
+        from example_usage import create_sample_data
+
+        random.seed(9)
+        records = create_sample_data(400)
+        repo = DataRepository()
+        repo.add_records(records)
+        generator = ConfusionMatrixGenerator(repo.select())
+
+        # 单维度分组与逐组筛选结果一致
+        by_scenario = generator.generate_matrix_by(["scenario"])
+        for scenario, metrics in by_scenario.items():
+            expected = ConfusionMatrixGenerator(
+                repo.select(FilterCriteria(scenario=scenario))
+            ).generate_overall_matrix()
+            assert metrics == expected, f"场景 {scenario} 的矩阵不一致"
+
+        # 多级分组 (稠密路径与压缩路径结果一致)
+        nested = generator.generate_matrix_by(["factor", "factor_value"])
+        original_limit = confusion_matrix.MAX_DENSE_GROUPS
+        confusion_matrix.MAX_DENSE_GROUPS = 1
+        try:
+            assert generator.generate_matrix_by(["factor", "factor_value"]) == nested
+        finally:
+            confusion_matrix.MAX_DENSE_GROUPS = original_limit
+
+        pairs = set((r.factor, r.factor_value) for r in records)
+        assert set((f, v) for f in nested for v in nested[f]) == pairs
+        for factor, values in nested.items():
+            for value, metrics in values.items():
+                count = sum(1 for r in records if r.factor == factor and r.factor_value == value)
+                assert metrics["total_records"] == count
+
+        assert generator.generate_matrix_by(["primary_category"]) == \
+            generator.generate_matrix_by_primary_category()
+
+        try:
+            generator.generate_matrix_by(["unknown"])
+            assert False, "未知维度应抛出ValueError"
+        except ValueError:
+            pass
+
+        print("✅ 任意维度分组测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 任意维度分组测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_aggregate_cube():
+    """测试预聚合立方体报表"""
+    print("\n" + "=" * 60)
+    print("测试12: 预聚合立方体")
+    print("=" * 60)
+
+    try:
+        import random
+        from example_usage import create_sample_data
+
+        random.seed(13)
+        records = create_sample_data(600)
+        repo = DataRepository()
+        repo.add_records(records[:400])
+        for record in records[400:]:
+            repo.add_record(record)
+
+        assert repo.cube.counts.sum() == 600, "立方体计数应等于记录数"
+
+        criteria_list = [
+            None,
+            FilterCriteria(primary_category="电商"),
+            FilterCriteria(scenario="移动端", factor="地域"),
+            FilterCriteria(vertical="资讯", status=ResultStatus.FAIL),
+            FilterCriteria(status=ResultStatus.PASS),
+        ]
+        for criteria in criteria_list:
+            cube_generator = CubeReportGenerator(repo, criteria)
+            row_generator = ConfusionMatrixGenerator(repo.select(criteria))
+            assert cube_generator.total_records == len(row_generator.selection)
+            assert cube_generator.generate_detailed_report() == \
+                row_generator.generate_detailed_report(), f"立方体报表不一致: {criteria}"
+            assert cube_generator.generate_matrix_by(["factor", "factor_value"]) == \
+                row_generator.generate_matrix_by(["factor", "factor_value"])
+
+        empty = CubeReportGenerator(repo, FilterCriteria(use_case="不存在"))
+        assert empty.total_records == 0
+
+        repo.clear()
+        assert len(repo.cube) == 0 and CubeReportGenerator(repo).total_records == 0
+
+        print("✅ 预聚合立方体测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 预聚合立方体测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_incremental_state():
+    """测试增量维护的混淆计数"""
+    print("\n" + "=" * 60)
+    print("测试13: 增量混淆计数")
+    print("=" * 60)
+
+    try:
+        import random
+        from example_usage import create_sample_data
+
+        random.seed(17)
+        records = create_sample_data(300)
+        repo = DataRepository()
+        for i in range(0, 300, 60):
+            repo.add_records(records[i:i + 30])
+            for record in records[i + 30:i + 60]:
+                repo.add_record(record)
+
+            # 每次追加后增量状态与全量重算一致, 且不访问立方体/历史记录
+            generator = CubeReportGenerator(repo)
+            report = generator.generate_detailed_report()
+            assert generator.use_state and generator._cells is None
+            assert report == ConfusionMatrixGenerator(repo.select()).generate_detailed_report()
+
+        # 删除路径: 反向更新后状态与立方体回到追加前
+        state, cube = repo.state, repo.cube
+        before_overall = state.overall.copy()
+        before_cells = cube.counts.copy()
+        repo.add_records(records[:50])
+        state.update(repo.store, 300, 350, sign=-1)
+        cube.update(repo.store, 300, 350, sign=-1)
+        assert (state.overall == before_overall).all()
+        assert (cube.counts[:len(before_cells)] == before_cells).all()
+        assert not cube.counts[len(before_cells):].any()
+
+        repo.clear()
+        assert repo.state.total_records == 0
+        assert CubeReportGenerator(repo).total_records == 0
+
+        print("✅ 增量混淆计数测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 增量混淆计数测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_report_cache():
+    """测试报表缓存"""
+    print("\n" + "=" * 60)
+    print("测试14: 报表缓存")
+    print("=" * 60)
+
+    try:
+        from example_usage import create_sample_data
+        from report_cache import ReportCache, approximate_size
+
+        repo = DataRepository()
+        repo.add_records(create_sample_data(100))
+        cache = ReportCache(max_entries=2)
+        calls = []
+
+        def compute(criteria):
+            def run():
+                calls.append(criteria)
+                return CubeReportGenerator(repo, criteria).generate_detailed_report()
+            return run
+
+        c1 = FilterCriteria(scenario="移动端")
+        c1_same = FilterCriteria(scenario="移动端", use_case="")  # 空条件视为未设置
+        c2 = FilterCriteria(scenario="PC端")
+        c3 = FilterCriteria(status=ResultStatus.FAIL)
+
+        first = cache.get_or_compute(repo, c1, compute(c1))
+        assert cache.get_or_compute(repo, c1_same, compute(c1_same)) is first
+        assert len(calls) == 1 and cache.hits == 1 and cache.misses == 1
+
+        cache.get_or_compute(repo, c2, compute(c2))
+        cache.get_or_compute(repo, c3, compute(c3))
+        assert cache.evictions == 1 and len(cache) == 2, "超出容量应淘汰最久未使用条目"
+
+        # 写入后版本递增, 旧结果失效
+        version = repo.version
+        repo.add_records(create_sample_data(10))
+        assert repo.version == version + 1
+        refreshed = cache.get_or_compute(repo, c3, compute(c3))
+        assert cache.invalidations == 2 and len(calls) == 4
+        assert refreshed == CubeReportGenerator(repo, c3).generate_detailed_report()
+
+        repo.clear()
+        assert repo.version == version + 2
+
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 4 and stats["evictions"] == 1
+
+        # 基于旧版本快照的请求不清除新版本条目, 结果也不缓存
+        old_snapshot = repo.snapshot()
+        repo.add_records(create_sample_data(5))
+        current = cache.get_or_compute(repo, c1, compute(c1))
+        cache.get_or_compute(old_snapshot, c1, compute(c1))
+        assert cache.stats()["version"] == repo.version and len(cache) == 1
+        assert cache.get_or_compute(repo, c1, compute(c1)) is current
+
+        # 按估算大小淘汰: 总大小不超过上限, 超过上限的单个结果不缓存
+        size = approximate_size(current)
+        sized = ReportCache(max_entries=10, max_bytes=size * 2 + size // 2)
+        for criteria in (c1, c2, c3):
+            sized.get_or_compute(repo, criteria, lambda: dict(current))
+        assert len(sized) == 2 and sized.evictions == 1
+        assert sized.stats()["bytes"] <= sized.max_bytes
+        tiny = ReportCache(max_bytes=100)
+        tiny.get_or_compute(repo, c1, compute(c1))
+        assert len(tiny) == 0
+
+        print("✅ 报表缓存测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 报表缓存测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_compact_record():
+    """测试紧凑记录表示"""
+    print("\n" + "=" * 60)
+    print("测试15: 紧凑记录")
+    print("=" * 60)
+
+    try:
+        data = {
+            "primary_category": "".join(["电", "商"]),
+            "secondary_category": "首页",
+            "expected_value": 3,
+            "actual_value": 4,
+            "status": "pass",
+            "use_case": "用户登录",
+            "scenario": "移动端",
+            "vertical": "零售",
+            "factor": "网络状态",
+            "factor_value": "良好",
+            "timestamp": None,
+            "test_id": "T1",
+            "notes": None
+        }
+        record = ClassificationRecord.from_dict(data)
+        other = ClassificationRecord.from_dict(dict(data, primary_category="".join(["电", "商"])))
+
+        assert not hasattr(record, "__dict__"), "记录不应有实例__dict__"
+        assert record.primary_category is other.primary_category, "维度字符串应驻留共享"
+        assert record.status == ResultStatus.FAIL, "状态应根据预期/实际值修正"
+        assert record == other
+        assert record.to_dict() == dict(data, status="fail")
+        assert ClassificationRecord.from_dict(record.to_dict()) == record
+
+        try:
+            ClassificationRecord.from_dict(dict(data, actual_value=16))
+            assert False, "超出范围应抛出ValueError"
+        except ValueError:
+            pass
+
+        print("✅ 紧凑记录测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 紧凑记录测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_bulk_ingest():
+    """测试批量校验导入"""
+    print("\n" + "=" * 60)
+    print("测试16: 批量校验导入")
+    print("=" * 60)
+
+    try:
+        from example_usage import create_sample_data
+
+        records = create_sample_data(200)
+        rows = [r.to_dict() for r in records]
+
+        # 批量导入与逐条构造结果一致 (status按预期/实际值推导)
+        rows[0]["status"] = "pass" if rows[0]["expected_value"] != rows[0]["actual_value"] else "fail"
+        repo = DataRepository()
+        result = repo.ingest_dicts(rows)
+        assert result == {"accepted": 200, "rejected": 0, "errors": []}
+        assert [r.to_dict() for r in repo.get_all_records()] == \
+            [ClassificationRecord.from_dict(row).to_dict() for row in rows]
+        assert CubeReportGenerator(repo).generate_detailed_report() == \
+            ConfusionMatrixGenerator(records).generate_detailed_report()
+
+        # 一次报告全部无效行, 且不导入任何数据
+        bad = [dict(row) for row in rows[:10]]
+        bad[1]["expected_value"] = 16
+        bad[3]["actual_value"] = -1
+        bad[3]["status"] = "unknown"
+        bad[5]["actual_value"] = "7"
+        bad[7]["scenario"] = None
+        bad[8]["expected_value"] = 2.5
+        version = repo.version
+        try:
+            repo.ingest_dicts(bad)
+            assert False, "应抛出BulkValidationError"
+        except BulkValidationError as e:
+            assert sorted(set(err["row"] for err in e.errors)) == [1, 3, 5, 7, 8]
+            assert len(e.errors) == 6
+        assert len(repo) == 200 and repo.version == version, "校验失败时不应导入"
+
+        # 跳过无效行
+        result = repo.ingest_dicts(bad, skip_invalid=True)
+        assert result["accepted"] == 5 and result["rejected"] == 5
+        assert len(repo) == 205
+
+        # 列式导入
+        repo.clear()
+        repo.ingest_columns({
+            "expected_value": [1, 2, 3],
+            "actual_value": [1, 5, 3],
+            "primary_category": ["A", "A", "B"],
+            "secondary_category": ["s"] * 3,
+            "use_case": ["u"] * 3,
+            "scenario": ["x"] * 3,
+            "vertical": ["v"] * 3,
+            "factor": ["f"] * 3,
+            "factor_value": ["fv"] * 3,
+        })
+        statuses = [r.status for r in repo.get_all_records()]
+        assert statuses == [ResultStatus.PASS, ResultStatus.FAIL, ResultStatus.PASS]
+
+        # 非字符串的维度/状态/扩展字段按无效行报告 (不可哈希的值不会导致异常)
+        typed = [dict(row) for row in rows[:6]]
+        typed[0]["status"] = ["pass"]
+        typed[1]["use_case"] = 5
+        typed[2]["vertical"] = ["垂类"]
+        typed[3]["test_id"] = 123
+        typed[4]["notes"] = {"text": "备注"}
+        try:
+            repo.ingest_dicts(typed)
+            assert False, "应抛出BulkValidationError"
+        except BulkValidationError as e:
+            assert [(err["row"], err["field"]) for err in e.errors] == [
+                (0, "status"), (1, "use_case"), (2, "vertical"), (3, "test_id"), (4, "notes")
+            ]
+        result = repo.ingest_dicts(typed, skip_invalid=True)
+        assert result["accepted"] == 1 and result["rejected"] == 5
+
+        # Web接口: 返回400并列出无效行, 之后筛选选项仍可正常获取
+        import web_app
+        client = web_app.app.test_client()
+        response = client.post('/api/data/upload', json={"records": typed})
+        assert response.status_code == 400 and response.get_json()["invalid_rows"] == 5
+        assert client.get('/api/filters/options').status_code == 200
+
+        print("✅ 批量校验导入测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 批量校验导入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_stream_ingest():
+    """测试流式导入"""
+    print("\n" + "=" * 60)
+    print("测试17: 流式导入")
+    print("=" * 60)
+
+    try:
+        import io
+        import json
+        import stream_ingest
+        from stream_ingest import iter_ndjson, iter_json_array, ingest_stream, StreamFormatError
+        from example_usage import create_sample_data
+
+        rows = [r.to_dict() for r in create_sample_data(500)]
+        expected_repo = DataRepository()
+        expected_repo.ingest_dicts(rows)
+
+        # 使用很小的读取块, 覆盖跨块的记录和多字节字符
+        chunk_size = stream_ingest.READ_CHUNK_SIZE
+        stream_ingest.READ_CHUNK_SIZE = 7
+        try:
+            ndjson = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n\n"
+            array = json.dumps(rows, ensure_ascii=False, indent=1)
+            wrapped = json.dumps({"records": rows}, ensure_ascii=False)
+            for parse, text in [(iter_ndjson, ndjson), (iter_json_array, array),
+                                (iter_json_array, wrapped)]:
+                parsed = list(parse(io.BytesIO(text.encode("utf-8"))))
+                assert parsed == rows, f"{parse.__name__} 解析结果不一致"
+
+            # 数值在块边界被截断时不提前解析 (如 12345 不能解析为 12)
+            numbers = '[12345, -6.25e2, {"expected_value": 987654}, 31415926]'
+            for size in range(1, 12):
+                stream_ingest.READ_CHUNK_SIZE = size
+                parsed = list(iter_json_array(io.BytesIO(numbers.encode("utf-8"))))
+                assert parsed == [12345, -625.0, {"expected_value": 987654}, 31415926], size
+        finally:
+            stream_ingest.READ_CHUNK_SIZE = chunk_size
+
+        # 按批写入, 结果与一次性导入一致
+        batches = []
+        repo = DataRepository()
+        stream = io.BytesIO("\n".join(json.dumps(row) for row in rows).encode("utf-8"))
+        result = ingest_stream(repo, iter_ndjson(stream), batch_size=64,
+                               on_batch=lambda p: batches.append(p["rows_received"]))
+        assert result["rows_accepted"] == 500 and result["rows_rejected"] == 0
+        assert result["batches"] == 8 and batches[0] == 64 and batches[-1] == 500
+        assert CubeReportGenerator(repo).generate_detailed_report() == \
+            CubeReportGenerator(expected_repo).generate_detailed_report()
+
+        # 无效行跳过, 错误行号为全局行号
+        bad = [dict(row) for row in rows[:100]]
+        bad[70]["expected_value"] = 99
+        repo = DataRepository()
+        result = ingest_stream(repo, iter(bad), batch_size=32)
+        assert result["rows_accepted"] == 99 and result["rows_rejected"] == 1
+        assert result["errors"][0]["row"] == 70
+
+        # 格式错误
+        for parse, text in [(iter_json_array, '[{"a": 1} {"b": 2}]'),
+                            (iter_json_array, '[{"a": 1},'),
+                            (iter_ndjson, '{"a": 1}\n{oops}\n')]:
+            try:
+                list(parse(io.BytesIO(text.encode("utf-8"))))
+                assert False, "应抛出StreamFormatError"
+            except StreamFormatError:
+                pass
+
+        print("✅ 流式导入测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 流式导入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_replace_and_append():
+    """测试整体替换与追加"""
+    print("\n" + "=" * 60)
+    print("测试18: 整体替换与追加")
+    print("=" * 60)
+
+    try:
+        from example_usage import create_sample_data
+
+        old_records = create_sample_data(100)
+        new_records = create_sample_data(150)
+
+        repo = DataRepository()
+        repo.add_records(old_records)
+        old_report = CubeReportGenerator(repo).generate_detailed_report()
+        selection = repo.select()
+        version = repo.version
+
+        # 离线构建新数据, 构建期间原仓库不受影响
+        staging = DataRepository()
+        staging.add_records(new_records)
+        assert len(repo) == 100
+        assert CubeReportGenerator(repo).generate_detailed_report() == old_report
+
+        # 替换后版本号大于替换前和新仓库的版本号, 旧选择结果保持不变
+        repo.replace_with(staging)
+        assert len(repo) == 150
+        assert repo.version > max(version, staging.version)
+        assert len(selection) == 100
+        assert CubeReportGenerator(repo).generate_detailed_report() == \
+            ConfusionMatrixGenerator(new_records).generate_detailed_report()
+
+        # 追加: 作为一个批次写入, 字典编码按当前仓库重新编码
+        extra = DataRepository()
+        extra.add_records(old_records)
+        version = repo.version
+        assert repo.append_from(extra) == 100
+        assert len(repo) == 250 and repo.version == version + 1
+        assert CubeReportGenerator(repo).generate_detailed_report() == \
+            ConfusionMatrixGenerator(new_records + old_records).generate_detailed_report()
+        assert [r.to_dict() for r in repo.get_all_records()[150:]] == \
+            [r.to_dict() for r in old_records]
+        assert repo.append_from(DataRepository()) == 0
+
+        print("✅ 整体替换与追加测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 整体替换与追加测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_concurrent_repository():
+    """测试并发读写 (快照隔离)"""
+    print("\n" + "=" * 60)
+    print("测试19: 并发读写")
+    print("=" * 60)
+
+    try:
+        import threading
+        import time
+        from example_usage import create_sample_data
+
+        batch = create_sample_data(50)
+        category = batch[0].primary_category
+        per_batch = sum(1 for r in batch if r.primary_category == category)
+        criteria = FilterCriteria(primary_category=category)
+
+        # 快照之后的写入不影响快照; 立方体已被改动时回退到列数据计算
+        repo = DataRepository()
+        repo.add_records(batch)
+        snapshot = repo.snapshot()
+        expected = ConfusionMatrixGenerator(snapshot.select()).generate_detailed_report()
+        repo.add_records(create_sample_data(30))
+        assert not snapshot.is_current() and len(snapshot) == 50 and len(repo) == 80
+        generator = CubeReportGenerator(snapshot)
+        assert generator.generate_detailed_report() == expected
+        assert not generator.use_aggregates
+        assert CubeReportGenerator(snapshot, criteria).total_records == per_batch
+        assert CubeReportGenerator(repo.snapshot()).generate_detailed_report()["summary"]["total_records"] == 80
+
+        # 写入失败: 回滚本次追加的行与字典取值, 重新发布的快照仍使用立方体
+        expected = CubeReportGenerator(repo.snapshot()).generate_detailed_report()
+        invalid = ClassificationRecord.from_dict(dict(batch[0].to_dict(), use_case=["不可哈希"]))
+        try:
+            repo.add_record(invalid)
+            assert False, "不可哈希的维度值应抛出异常"
+        except TypeError:
+            pass
+
+        def failing_update(*args, **kwargs):
+            raise MemoryError("模拟索引更新失败")
+        repo.cube.update = failing_update
+        try:
+            repo.add_records([ClassificationRecord.from_dict(dict(r.to_dict(), scenario="新场景")) for r in batch])
+            assert False, "立方体更新失败应抛出异常"
+        except MemoryError:
+            pass
+        for current in (repo, repo.snapshot()):
+            assert len(current) == 80 and repo.store.size == 80 and repo.version == 2
+        assert repo.snapshot().is_current() and "新场景" not in repo.get_unique_values("scenario")
+        generator = CubeReportGenerator(repo.snapshot())
+        assert generator.generate_detailed_report() == expected and generator.use_aggregates
+        repo.add_records(batch)
+        assert len(repo) == 130 and len(repo.store.extras("test_id")) == 130
+        assert CubeReportGenerator(repo.snapshot()).generate_detailed_report() == \
+            ConfusionMatrixGenerator(repo.select()).generate_detailed_report()
+
+        # 压力测试: 一个写线程不断追加/替换/清空 (每次写入都是整批), 多个读线程校验快照一致性
+        repo = DataRepository()
+        stop = threading.Event()
+        failures = []
+        stats = {"writes": 0, "reads": 0, "fallbacks": 0}
+
+        def writer():
+            try:
+                i = 0
+                while not stop.is_set():
+                    i += 1
+                    if i % 50 == 0:
+                        repo.clear()
+                    elif i % 20 == 0:
+                        staging = DataRepository()
+                        staging.add_records(batch * 3)
+                        repo.replace_with(staging)
+                    elif i % 7 == 0:
+                        staging = DataRepository()
+                        staging.add_records(batch)
+                        repo.append_from(staging)
+                    else:
+                        repo.add_records(batch)
+                    stats["writes"] += 1
+            except Exception as e:
+                failures.append(f"写入失败: {e!r}")
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    snapshot = repo.snapshot()
+                    total = len(snapshot)
+                    assert total % len(batch) == 0, f"看到写入一半的批次: {total}"
+                    generator = CubeReportGenerator(snapshot)
+                    report = generator.generate_detailed_report()
+                    assert report["summary"]["total_records"] == total
+                    assert report == ConfusionMatrixGenerator(snapshot.select()).generate_detailed_report()
+                    filtered = CubeReportGenerator(snapshot, criteria)
+                    assert filtered.total_records == total // len(batch) * per_batch
+                    assert len(snapshot.match_rows(criteria)) == filtered.total_records
+                    assert len(snapshot.get_all_records()) == total
+                    stats["reads"] += 1
+                    stats["fallbacks"] += not (generator.use_aggregates and filtered.use_aggregates)
+            except Exception as e:
+                failures.append(f"读取失败: {e!r}")
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            time.sleep(1.5)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        assert not failures, failures[:3]
+        assert stats["writes"] > 0 and stats["reads"] > 0
+        print(f"写入 {stats['writes']} 次, 读取 {stats['reads']} 次, 回退列数据计算 {stats['fallbacks']} 次")
+
+        print("✅ 并发读写测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 并发读写测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_shared_dataset():
+    """测试共享内存数据集 (多进程挂载)"""
+    print("\n" + "=" * 60)
+    print("测试20: 共享内存数据集")
+    print("=" * 60)
+
+    import json
+    import os
+    import shutil
+    import subprocess
+    import tempfile
+    directory = tempfile.mkdtemp()
+
+    try:
+        from example_usage import create_sample_data
+        from shared_dataset import SharedDatasetPublisher, SharedDatasetReader
+
+        repo = DataRepository()
+        repo.add_records(create_sample_data(500))
+        criteria = FilterCriteria(scenario="移动端", status=ResultStatus.FAIL)
+        expected = CubeReportGenerator(repo, criteria).generate_detailed_report()
+
+        publisher = SharedDatasetPublisher("test", directory)
+        reader = SharedDatasetReader("test", directory)
+        assert reader.refresh() is None, "尚未发布时不应挂载"
+        assert publisher.publish(repo) == 1
+
+        # 挂载: 列数据与索引是映射上的只读视图, 结果与原仓库一致
+        attached = reader.refresh()
+        assert attached is not None and reader.generation == 1 and reader.refresh() is None
+        store = attached.store
+        assert not store.expected.flags.writeable and not store.codes("scenario").flags.owndata
+        assert CubeReportGenerator(attached, criteria).generate_detailed_report() == expected
+        assert (attached.match_rows(criteria) == repo.match_rows(criteria)).all()
+        assert [r.to_dict() for r in attached.get_all_records()] == \
+            [r.to_dict() for r in repo.get_all_records()]
+
+        # 另一进程挂载同一代
+        script = (
+            "import json, sys; sys.path.insert(0, %r)\n"
+            "from shared_dataset import SharedDatasetReader\n"
+            "from confusion_matrix import CubeReportGenerator\n"
+            "repo = SharedDatasetReader('test', %r).repository()\n"
+            "print(json.dumps(CubeReportGenerator(repo).generate_detailed_report()['summary']))"
+        ) % (os.path.dirname(os.path.abspath(__file__)), directory)
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        assert json.loads(output.stdout) == json.loads(json.dumps(
+            CubeReportGenerator(repo).generate_detailed_report()["summary"]
+        ))
+
+        # 挂载后的仓库可以继续写入 (写时复制, 不修改共享数据)
+        mapped = attached.snapshot()
+        attached.add_records(create_sample_data(20))
+        assert len(attached) == 520
+        assert CubeReportGenerator(attached).generate_detailed_report() == \
+            ConfusionMatrixGenerator(attached.select()).generate_detailed_report()
+
+        # 发布新一代: 挂载方切换, 旧代文件删除后已挂载的旧仓库仍可使用
+        publisher.publish(attached)
+        publisher.publish(attached)
+        assert not os.path.exists(os.path.join(directory, "test.1.dataset"))
+        newer = reader.refresh()
+        assert reader.generation == 3 and len(newer) == 520
+        assert CubeReportGenerator(mapped, criteria).generate_detailed_report() == expected
+        assert len(SharedDatasetReader("test", directory).repository()) == 520
+
+        publisher.unlink()
+        assert not os.listdir(directory)
+
+        print("✅ 共享内存数据集测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 共享内存数据集测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_dataset_file():
+    """测试二进制数据集文件 (保存/内存映射打开)"""
+    print("\n" + "=" * 60)
+    print("测试21: 数据集文件")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    import numpy as np
+    directory = tempfile.mkdtemp()
+
+    try:
+        from example_usage import create_sample_data
+        from dataset_format import DatasetFormatError
+
+        repo = DataRepository()
+        repo.add_records(create_sample_data(300))
+        path = os.path.join(directory, "data.dataset")
+        size = repo.save(path)
+        assert size == os.path.getsize(path) and os.listdir(directory) == ["data.dataset"]
+
+        # 并发保存到同一路径: 各自写独立的临时文件, 均成功且不留临时文件
+        import threading
+        errors = []
+
+        def save_concurrently():
+            try:
+                for _ in range(5):
+                    repo.save(path)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=save_concurrently) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors and os.listdir(directory) == ["data.dataset"]
+
+        # 打开: 结果与原仓库一致, 编码列按字典大小收窄, 映射上的数组只读
+        opened = DataRepository.open(path)
+        criteria = FilterCriteria(scenario="移动端", status=ResultStatus.FAIL)
+        assert len(opened) == 300
+        assert CubeReportGenerator(opened, criteria).generate_detailed_report() == \
+            CubeReportGenerator(repo, criteria).generate_detailed_report()
+        assert (opened.match_rows(criteria) == repo.match_rows(criteria)).all()
+        assert [r.to_dict() for r in opened.get_all_records()] == \
+            [r.to_dict() for r in repo.get_all_records()]
+        store = opened.store
+        assert store.codes("scenario").dtype == np.int8
+        assert not store.expected.flags.writeable
+
+        # 打开后继续追加, 再次保存并打开
+        more = create_sample_data(50)
+        opened.add_records(more)
+        repo.add_records(more)
+        opened.save(path)
+        reopened = DataRepository.open(path)
+        assert len(reopened) == 350
+        assert CubeReportGenerator(reopened).generate_detailed_report() == \
+            CubeReportGenerator(repo).generate_detailed_report()
+        assert opened.get_unique_values("scenario") == repo.get_unique_values("scenario")
+
+        # 空仓库
+        empty_path = os.path.join(directory, "empty.dataset")
+        DataRepository().save(empty_path)
+        empty = DataRepository.open(empty_path)
+        assert len(empty) == 0
+        assert CubeReportGenerator(empty).generate_detailed_report()["summary"]["total_records"] == 0
+
+        # 格式错误
+        bad_path = os.path.join(directory, "bad.dataset")
+        with open(bad_path, "wb") as f:
+            f.write(b"NOTADATASET" + bytes(64))
+        try:
+            DataRepository.open(bad_path)
+            assert False, "格式错误的文件应抛出DatasetFormatError"
+        except DatasetFormatError:
+            pass
+
+        print("✅ 数据集文件测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 数据集文件测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_arrow_io():
+    """测试Parquet/Arrow IPC导入导出"""
+    print("\n" + "=" * 60)
+    print("测试22: Parquet/Arrow导入导出")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp()
+
+    try:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from example_usage import create_sample_data
+
+        records = create_sample_data(600)
+        records[0].notes = "备注"
+        repo = DataRepository()
+        repo.add_records(records)
+
+        # Parquet: 维度列为字典列, 按行组写入; 流式导入后与原仓库一致
+        path = os.path.join(directory, "data.parquet")
+        assert repo.export_parquet(path, row_group_size=200) == 600
+        parquet_file = pq.ParquetFile(path)
+        assert parquet_file.metadata.num_row_groups == 3
+        assert pa.types.is_dictionary(parquet_file.schema_arrow.field("scenario").type)
+        imported = DataRepository()
+        result = imported.import_parquet(path, batch_size=128)
+        assert result["rows_accepted"] == 600 and result["batches"] >= 5
+        assert [r.to_dict() for r in imported.get_all_records()] == [r.to_dict() for r in records]
+        assert CubeReportGenerator(imported).generate_detailed_report() == \
+            CubeReportGenerator(repo).generate_detailed_report()
+
+        # 列投影: 导出只写入指定列; 导入时可不读取扩展字段
+        projected = os.path.join(directory, "projected.parquet")
+        repo.export_parquet(projected, columns=["scenario", "expected_value"])
+        assert pq.read_schema(projected).names == ["scenario", "expected_value"]
+        without_extras = DataRepository()
+        without_extras.import_parquet(path, columns=[])
+        assert without_extras.get_all_records()[0].notes is None
+        try:
+            DataRepository().import_parquet(projected)
+            assert False, "缺少必需列时应抛出ValueError"
+        except ValueError:
+            pass
+
+        # Arrow IPC + 筛选条件
+        criteria = FilterCriteria(scenario="移动端", status=ResultStatus.FAIL)
+        arrow_path = os.path.join(directory, "data.arrow")
+        assert repo.export_arrow(arrow_path, criteria, batch_size=50) == len(repo.match_rows(criteria))
+        filtered = DataRepository()
+        filtered.import_arrow(arrow_path)
+        assert [r.to_dict() for r in filtered.get_all_records()] == \
+            [r.to_dict() for r in repo.filter_records(criteria)]
+
+        # pandas写出的普通字符串列, 含无效行与未知列
+        frame = pd.DataFrame([r.to_dict() for r in records[:10]])
+        frame.loc[3, "expected_value"] = 99
+        frame.loc[5, "scenario"] = None
+        frame["unused"] = 1
+        plain = os.path.join(directory, "plain.parquet")
+        frame.to_parquet(plain)
+        loose = DataRepository()
+        result = loose.import_parquet(plain)
+        assert result["rows_accepted"] == 8
+        assert [(e["row"], e["field"]) for e in result["errors"]] == [(3, "expected_value"), (5, "scenario")]
+        try:
+            DataRepository().import_parquet(plain, skip_invalid=False)
+            assert False, "skip_invalid=False时应抛出BulkValidationError"
+        except BulkValidationError:
+            pass
+
+        # 非字符串的维度列/扩展字段不隐式转换为字符串, 与逐行校验一致按无效行处理
+        numeric = frame.drop(columns=["unused"]).drop(index=[3, 5])
+        numeric["vertical"] = list(range(len(numeric)))
+        numeric["test_id"] = 7
+        numeric_path = os.path.join(directory, "numeric.parquet")
+        numeric.to_parquet(numeric_path)
+        result = DataRepository().import_parquet(numeric_path)
+        assert result["rows_accepted"] == 0 and result["rows_rejected"] == len(numeric)
+        assert {e["field"] for e in result["errors"]} == {"vertical", "test_id"}
+        try:
+            DataRepository().import_parquet(numeric_path, skip_invalid=False)
+            assert False, "skip_invalid=False时应抛出BulkValidationError"
+        except BulkValidationError as e:
+            assert "不是字符串" in str(e)
+
+        # ExcelExporter的Parquet导出
+        exported = ExcelExporter(repo).export_simple_parquet(os.path.join(directory, "simple.parquet"), criteria)
+        assert pq.read_metadata(exported).num_rows == len(repo.match_rows(criteria))
+
+        # 逐条添加的记录含非字符串取值: 导出为字符串, 空值保持为null
+        mixed = DataRepository()
+        mixed.add_records(records[:3])
+        mixed.add_record(ClassificationRecord(
+            primary_category=2024, secondary_category="子类", expected_value=1, actual_value=1,
+            status="pass", use_case="用例", scenario="场景", vertical="垂类",
+            factor="因子", factor_value="值", test_id=123, notes=None
+        ))
+        from arrow_io import to_arrow_table
+        table = to_arrow_table(mixed)
+        assert table.column("test_id").to_pylist()[-1] == "123"
+        assert table.column("primary_category").to_pylist()[-1] == "2024"
+        assert table.column("notes").to_pylist()[-1] is None
+
+        print("✅ Parquet/Arrow导入导出测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Parquet/Arrow导入导出测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_sql_repository():
+    """测试SQLite数据仓库 (数据库内聚合)"""
+    print("\n" + "=" * 60)
+    print("测试23: SQLite数据仓库")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp()
+
+    try:
+        from example_usage import create_sample_data
+        from sql_repository import SqlDataRepository
+
+        records = create_sample_data(400)
+        memory = DataRepository()
+        memory.add_records(records)
+        path = os.path.join(directory, "records.db")
+        repo = SqlDataRepository(path)
+        repo.add_records(records[:100])
+        staging = DataRepository()
+        staging.add_records(records[100:])
+        assert repo.append_from(staging) == 300
+        assert len(repo) == 400 and repo.version == 2
+
+        # 报表与内存仓库一致; 筛选条件走索引
+        for criteria in (
+            None,
+            FilterCriteria(scenario="移动端"),
+            FilterCriteria(scenario="移动端", factor=records[0].factor, status=ResultStatus.FAIL),
+            FilterCriteria(vertical="不存在"),
+        ):
+            generator = repo.report_generator(criteria)
+            assert generator.generate_detailed_report() == \
+                CubeReportGenerator(memory, criteria).generate_detailed_report()
+            assert generator.generate_matrix_by(["factor", "factor_value"]) == \
+                CubeReportGenerator(memory, criteria).generate_matrix_by(["factor", "factor_value"])
+            assert generator.total_records == (len(memory.match_rows(criteria)) if criteria else 400)
+        plan = " ".join(repo.explain(FilterCriteria(scenario="移动端"), ["primary_category"]))
+        assert "COVERING INDEX" in plan, plan
+        assert sorted(generate_report_from_repository(repo).split("\n")) == \
+            sorted(generate_report_from_repository(memory).split("\n"))
+
+        # 明细读取
+        criteria = FilterCriteria(vertical=records[0].vertical)
+        assert [r.to_dict() for r in repo.filter_records(criteria)] == \
+            [r.to_dict() for r in memory.filter_records(criteria)]
+        assert len(list(repo.iter_rows(batch_size=7))) == 400
+        assert repo.get_unique_values("scenario") == memory.get_unique_values("scenario")
+        assert len(repo.select(criteria)) == len(memory.match_rows(criteria))
+        for field in ("expected_value", "actual_value", "status", "test_id", "unknown"):
+            assert repo.get_unique_values(field) == memory.get_unique_values(field), field
+
+        # 版本快照: 按行号工作的接口 (明细导出/分页/CSV/数据集文件/Parquet) 与内存仓库一致
+        snapshot = repo.snapshot()
+        assert snapshot.version == repo.version and repo.snapshot() is snapshot and len(snapshot) == 400
+        assert (repo.match_rows(criteria) == memory.match_rows(criteria)).all()
+        assert [r.to_dict() for r in repo.materialize(repo.match_rows(criteria))] == \
+            [r.to_dict() for r in memory.filter_records(criteria)]
+        from csv_export import iter_export
+        from detail_pager import fetch_page
+        assert b"".join(iter_export(repo, criteria)) == b"".join(iter_export(memory, criteria))
+        page = fetch_page(repo, criteria, page_size=5, sort_by="scenario")
+        assert [r.to_dict() for r in page["records"]] == \
+            [r.to_dict() for r in fetch_page(memory, criteria, page_size=5, sort_by="scenario")["records"]]
+        ExcelExporter(repo).export_detail_excel(os.path.join(directory, "detail.xlsx"), criteria)
+        parquet_path = os.path.join(directory, "records.parquet")
+        assert repo.export_parquet(parquet_path, criteria) == len(memory.match_rows(criteria))
+        dataset_path = os.path.join(directory, "records.dataset")
+        repo.save(dataset_path)
+        copied = SqlDataRepository.open(dataset_path)
+        assert copied.import_parquet(parquet_path)["rows_accepted"] == len(memory.match_rows(criteria))
+        assert len(copied) == 400 + len(memory.match_rows(criteria))
+        copied.close()
+
+        # 批量导入校验与内存仓库一致
+        rows = [r.to_dict() for r in create_sample_data(5)]
+        rows[1]["expected_value"] = 99
+        result = repo.ingest_dicts(rows, skip_invalid=True)
+        assert result["accepted"] == 4 and result["errors"][0]["row"] == 1
+        try:
+            repo.ingest_dicts(rows)
+            assert False, "应抛出BulkValidationError"
+        except BulkValidationError:
+            pass
+        assert len(repo) == 404
+        # 写入后快照按新版本重新读取, 已返回的快照不变
+        assert repo.snapshot() is not snapshot and len(repo.snapshot()) == 404 and len(snapshot) == 400
+        assert repo.snapshot().version == repo.version
+
+        # 整体替换, 数据保存在文件中
+        repo.replace_with(memory)
+        repo.close()
+        reopened = SqlDataRepository(path)
+        assert len(reopened) == 400
+        assert reopened.report_generator().generate_detailed_report() == \
+            CubeReportGenerator(memory).generate_detailed_report()
+        reopened.clear()
+        assert len(reopened) == 0 and reopened.report_generator().total_records == 0
+        reopened.close()
+
+        print("✅ SQLite数据仓库测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ SQLite数据仓库测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_evaluate_loader():
+    """测试评估矩阵库导入 (连接池, 分批读取)"""
+    print("\n" + "=" * 60)
+    print("测试24: 评估矩阵库导入")
+    print("=" * 60)
+
+    import os
+    import re
+    import shutil
+    import sqlite3
+    import tempfile
+    import threading
+    directory = tempfile.mkdtemp()
+
+    try:
+        from connection_pool import ConnectionPool, PoolTimeoutError
+        from evaluate_loader import EvaluateMatrixLoader, create_sqlite_schema
+
+        # 建表并写入 schema.sql 中的测试数据
+        path = os.path.join(directory, "evaluate.db")
+        connection = sqlite3.connect(path)
+        create_sqlite_schema(connection)
+        schema_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "evaluate-matrix-system", "sql", "schema.sql"
+        )
+        with open(schema_path, "r", encoding="utf-8") as f:
+            schema = f.read()
+        pattern = r"INSERT INTO `task_evaluate_matrix_(?:detail|param)`.*?;\s*$"
+        for statement in re.findall(pattern, schema, flags=re.S | re.M):
+            connection.execute(re.sub(r"--[^\n]*", "", statement))
+        # 第二个任务: 4条明细, 1条无效
+        connection.execute(
+            "INSERT INTO task_evaluate_matrix_param (report_id, task_id, case_id, actural_value_field) "
+            "VALUES ('RPT001', 'TASK002', 'CASE009', 'level')"
+        )
+        connection.executemany(
+            "INSERT INTO task_evaluate_matrix_detail "
+            "(report_id, task_id, case_id, corpus_id, actural_value, predicted_value) VALUES (?, ?, ?, ?, ?, ?)",
+            [("RPT001", "TASK002", "CASE009", f"C{i}", a, p)
+             for i, (a, p) in enumerate([("1", "1"), (" 2", "3"), ("16", "1"), ("4", "4")])]
+        )
+        connection.commit()
+        connection.close()
+
+        pool = ConnectionPool.sqlite(path, max_size=2, timeout=0.2)
+        loader = EvaluateMatrixLoader(pool, batch_size=8)
+        params = loader.load_params("RPT001", "TASK001")
+        assert [p["case_id"] for p in params] == ["CASE001", "CASE002", "CASE003"]
+
+        # 映射与有效样本: 非数字/空值明细跳过 (CASE001 34条中4条无效)
+        repo = DataRepository()
+        result = loader.load(repo, "RPT001", "TASK001")
+        assert result["rows_received"] == 60 and result["rows_rejected"] == 4
+        assert result["batches"] >= 8
+        record = repo.get_all_records()[0]
+        assert (record.primary_category, record.scenario, record.vertical, record.test_id) == \
+            ("CASE001", "TASK001", "RPT001", "C001")
+        assert record.factor == "actual_level" and record.secondary_category == "极低"
+        report = CubeReportGenerator(repo).generate_detailed_report()
+        case001 = report["by_primary_category"]["CASE001"]
+        assert case001["total_records"] == 30 and sum(case001["matrix"][i][i] for i in range(16)) == 20
+
+        # 指定用例, 自定义映射
+        custom = EvaluateMatrixLoader(pool, field_mapping={"secondary_category": "param.matrix_strategy"})
+        repo = custom.load_repository("RPT001", "TASK001", case_ids=["CASE003"])
+        assert set(r.primary_category for r in repo.get_all_records()) == {"CASE003"}
+        assert repo.get_unique_values("secondary_category") == ["auto"]
+        try:
+            EvaluateMatrixLoader(pool, field_mapping={"scenario": "no_such_column"})
+            assert False, "未知的来源列应抛出ValueError"
+        except ValueError:
+            pass
+
+        # 并发: 两个任务同时读取, 各自持有连接池中的连接
+        started = threading.Barrier(2)
+        results = {}
+
+        def load_task(task_id):
+            def on_batch(progress):
+                if progress["batches"] == 1:
+                    started.wait(timeout=5)
+            task_repo = DataRepository()
+            results[task_id] = loader.load(task_repo, "RPT001", task_id, on_batch=on_batch)
+
+        threads = [threading.Thread(target=load_task, args=(t,)) for t in ("TASK001", "TASK002")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results["TASK001"]["rows_accepted"] == 56
+        assert results["TASK002"]["rows_accepted"] == 3 and results["TASK002"]["rows_rejected"] == 1
+        assert pool.stats()["created"] == 2 and pool.stats()["in_use"] == 0
+
+        # 连接全部占用时等待超时
+        with pool.connection(), pool.connection():
+            try:
+                with pool.connection():
+                    pass
+                assert False, "应等待超时"
+            except PoolTimeoutError:
+                pass
+        pool.close()
+
+        print("✅ 评估矩阵库导入测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 评估矩阵库导入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_streaming_excel_export():
+    """测试流式详细数据Excel导出"""
+    print("\n" + "=" * 60)
+    print("测试25: 流式详细数据Excel导出")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    from openpyxl import load_workbook
+    from excel_exporter import DETAIL_HEADERS, iter_detail_rows
+    directory = tempfile.mkdtemp()
+
+    try:
+        repo = DataRepository()
+        repo.add_records([
+            ClassificationRecord(
+                primary_category=f"分类{i % 3}",
+                secondary_category=f"子类{i % 4}",
+                expected_value=i % 16,
+                actual_value=i % 16 if i % 5 else (i + 1) % 16,
+                status="pass" if i % 5 else "fail",
+                use_case="用例", scenario=f"场景{i % 2}", vertical="垂类",
+                factor="因子", factor_value="值",
+                test_id=f"T{i}" if i % 7 else None,
+                notes="备注" if i % 2 else None
+            )
+            for i in range(250)
+        ])
+
+        # 行生成器: 与物化记录一致, 分块大小不影响结果
+        records = repo.get_all_records()
+        rows = list(iter_detail_rows(repo.select(), chunk_size=32))
+        assert len(rows) == 250
+        assert rows[1] == (
+            records[1].primary_category, records[1].secondary_category, 1, 1, "PASS",
+            "用例", "场景1", "垂类", "因子", "值", "T1", "", "备注"
+        )
+        assert rows[0][4] == "FAIL" and rows[0][10] == ""
+
+        # 流式导出 (按条件筛选)
+        criteria = FilterCriteria(scenario="场景0")
+        path = os.path.join(directory, "detail.xlsx")
+        exported = ExcelExporter(repo).export_detail_excel(path, criteria, chunk_size=16)
+        assert exported == len(repo.match_rows(criteria)) == 125
+
+        ws = load_workbook(path)["详细数据"]
+        values = list(ws.iter_rows(values_only=True))
+        assert values[0] == tuple(DETAIL_HEADERS)
+        # 空字符串单元格读回为None
+        assert values[1:] == [
+            tuple(None if value == "" else value for value in row)
+            for row in iter_detail_rows(repo.select(criteria))
+        ]
+        assert ws.freeze_panes == "A2"
+        assert ws["A1"].font.b and ws["A1"].fill.start_color.rgb.endswith("4472C4")
+        for row in ws.iter_rows(min_row=2, min_col=5, max_col=5):
+            expected_color = "90EE90" if row[0].value == "PASS" else "FFB6C1"
+            assert row[0].fill.start_color.rgb.endswith(expected_color)
+
+        # 命名样式只注册一次
+        workbook = load_workbook(path)
+        assert len([name for name in workbook.named_styles if name.startswith("crs_")]) == 7
+
+        # 完整报告中的详细数据sheet内容一致
+        full_path = os.path.join(directory, "full.xlsx")
+        ExcelExporter(repo).export_full_report(full_path, criteria)
+        full_sheet = load_workbook(full_path)["详细数据"]
+        assert list(full_sheet.iter_rows(values_only=True)) == values
+        assert full_sheet.freeze_panes == "A2" and full_sheet.column_dimensions["M"].width == 15
+        assert full_sheet["A1"].font.b and full_sheet["E2"].fill.start_color.rgb.endswith(
+            "90EE90" if full_sheet["E2"].value == "PASS" else "FFB6C1"
+        )
+
+        print("✅ 流式详细数据Excel导出测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 流式详细数据Excel导出测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_export_jobs():
+    """测试后台导出任务"""
+    print("\n" + "=" * 60)
+    print("测试26: 后台导出任务")
+    print("=" * 60)
+
+    import io
+    import os
+    import shutil
+    import tempfile
+    import threading
+    import time
+    from openpyxl import load_workbook
+    from export_jobs import ExportJobManager, QueueFullError
+    directory = tempfile.mkdtemp()
+
+    def wait_for(manager, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while manager.status(job_id)["state"] in ("queued", "running"):
+            assert time.time() < deadline, "导出任务超时"
+            time.sleep(0.01)
+        return manager.status(job_id)
+
+    try:
+        # 完整报告导出的进度回调
+        repo = DataRepository()
+        repo.add_records([
+            ClassificationRecord(
+                primary_category=f"分类{i % 3}", secondary_category="子类",
+                expected_value=i % 16, actual_value=(i * 3) % 16,
+                status="pass" if i % 16 == (i * 3) % 16 else "fail",
+                use_case="用例", scenario="场景", vertical="垂类", factor="因子", factor_value="值"
+            )
+            for i in range(120)
+        ])
+        updates = []
+        ExcelExporter(repo).export_full_report(
+            os.path.join(directory, "full.xlsx"), on_progress=updates.append
+        )
+        assert [u["sheets_done"] for u in updates[:5]] == [1, 2, 3, 4, 5]
+        assert updates[-1] == {
+            "stage": "saving", "sheets_done": 6, "sheets_total": 6, "rows_written": 120, "rows_total": 120
+        }
+
+        # 并发数与排队上限: 1个执行线程, 最多排队1个
+        manager = ExportJobManager(directory, max_workers=1, max_queued=1, retention_seconds=60)
+        release = threading.Event()
+
+        def blocking_task(path, on_progress):
+            on_progress({"rows_written": 1})
+            release.wait(timeout=10)
+            with open(path, "w") as f:
+                f.write("ok")
+
+        first = manager.submit(blocking_task, suffix=".txt")
+        deadline = time.time() + 10
+        while "rows_written" not in manager.status(first):
+            assert time.time() < deadline
+            time.sleep(0.01)
+        second = manager.submit(blocking_task, suffix=".txt")
+        assert manager.status(second)["state"] == "queued"
+        try:
+            manager.submit(blocking_task)
+            assert False, "排队任务已满应抛出QueueFullError"
+        except QueueFullError:
+            pass
+        assert manager.status(first)["rows_written"] == 1
+        assert manager.result_path(first) is None
+        release.set()
+        assert wait_for(manager, first)["state"] == "done"
+        assert wait_for(manager, second)["state"] == "done"
+        path = manager.result_path(first)
+        assert open(path).read() == "ok"
+
+        # 失败任务: 记录错误, 不留下文件
+        def failing_task(path, on_progress):
+            with open(path, "w") as f:
+                f.write("partial")
+            raise ValueError("没有找到匹配的记录")
+
+        failed = manager.submit(failing_task)
+        status = wait_for(manager, failed)
+        assert status["state"] == "failed" and status["error"] == "没有找到匹配的记录"
+        assert manager.result_path(failed) is None
+        assert not os.path.exists(os.path.join(directory, f"{os.getpid()}-{failed}.xlsx"))
+        assert manager.stats()["done"] == 2 and manager.stats()["failed"] == 1
+        assert manager.open_result(failed)[0]["state"] == "failed" and manager.open_result(failed)[1] is None
+
+        # 过期清除; 清除前已打开的结果文件仍可读完
+        status, opened = manager.open_result(first)
+        assert status["state"] == "done"
+        assert manager.purge_expired(now=time.time() + 61) == 3
+        assert manager.status(first) is None and not os.path.exists(path)
+        with opened:
+            assert opened.read() == b"ok"
+        assert manager.open_result(first) == (None, None)
+        manager.shutdown()
+
+        def write_task(output_path, on_progress):
+            with open(output_path, "wb") as f:
+                f.write(b"data")
+
+        # 查询时清除过期任务 (无新的提交)
+        polled = ExportJobManager(directory, retention_seconds=0.2, purge_interval=None)
+        job_id = polled.submit(write_task)
+        assert wait_for(polled, job_id)["state"] == "done"
+        job_path = polled.result_path(job_id)
+        time.sleep(0.3)
+        assert polled.status(job_id) is None and not os.path.exists(job_path)
+        polled.shutdown()
+
+        # 无查询也无提交时由后台定期清除
+        swept = ExportJobManager(directory, retention_seconds=0.1, purge_interval=0.05)
+        job_id = swept.submit(write_task)
+        while swept.result_path(job_id) is None:
+            time.sleep(0.01)
+        job_path = os.path.join(directory, f"{os.getpid()}-{job_id}.xlsx")
+        deadline = time.time() + 5
+        while os.path.exists(job_path) and time.time() < deadline:
+            time.sleep(0.05)
+        assert not os.path.exists(job_path)
+        swept.shutdown()
+
+        # 启动时清除本进程此前及已退出进程遗留的文件, 其他文件保留
+        leftovers = [f"{os.getpid()}-old.xlsx", "999999999-old.xlsx", "full.xlsx"]
+        for name in leftovers:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write("x")
+        ExportJobManager(directory, purge_interval=None).shutdown()
+        assert sorted(os.listdir(directory)) == ["full.xlsx"]
+
+        # Web接口: 提交 -> 查询 -> 下载
+        import web_app
+        client = web_app.app.test_client()
+        client.post('/api/data/generate-sample', json={"count": 200})
+        response = client.post('/api/export/excel/jobs', json={"scenario": "移动端"})
+        assert response.status_code == 202
+        job_id = response.get_json()["job_id"]
+        status = wait_for(web_app.export_jobs, job_id)
+        assert status["state"] == "done", status
+        assert status["rows_written"] == status["rows_total"] == len(
+            web_app.repository.match_rows(FilterCriteria(scenario="移动端"))
+        )
+        assert status["sheets_done"] == status["sheets_total"]
+        download = client.get(f'/api/export/excel/jobs/{job_id}/download')
+        assert download.status_code == 200
+        workbook = load_workbook(io.BytesIO(download.data))
+        download.close()
+        assert workbook.sheetnames[:2] == ["汇总统计", "总体混淆矩阵"]
+        assert workbook["详细数据"].max_row == status["rows_total"] + 1
+
+        assert client.get('/api/export/excel/jobs/unknown').status_code == 404
+        assert client.get('/api/export/excel/jobs/unknown/download').status_code == 404
+        assert client.post('/api/export/excel/jobs', json={"scenario": "不存在"}).status_code == 400
+
+        print("✅ 后台导出任务测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 后台导出任务测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(os.path.join("temp", "exports"), ignore_errors=True)
+
+
+def test_category_sheets_report():
+    """测试多分类完整报告"""
+    print("\n" + "=" * 60)
+    print("测试27: 多分类完整报告")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    import excel_exporter
+    from openpyxl import load_workbook
+    directory = tempfile.mkdtemp()
+
+    try:
+        # 20个分类, 其中两个截断到20个字符后同名
+        categories = [f"分类{i:02d}" for i in range(18)] + ["很长的分类名称" * 3 + "A", "很长的分类名称" * 3 + "B"]
+        repo = DataRepository()
+        repo.add_records([
+            ClassificationRecord(
+                primary_category=categories[i % 20], secondary_category="子类",
+                expected_value=i % 16, actual_value=(i * 5) % 16 if i % 3 else i % 16,
+                status="pass" if i % 3 == 0 or i % 16 == (i * 5) % 16 else "fail",
+                use_case="用例", scenario="场景", vertical="垂类", factor="因子", factor_value="值"
+            )
+            for i in range(800)
+        ])
+        exporter = ExcelExporter(repo)
+        native = os.path.join(directory, "native.xlsx")
+        updates = []
+        exporter.export_full_report(native, on_progress=updates.append)
+
+        workbook = load_workbook(native)
+        assert len(workbook.sheetnames) == 23 and workbook.sheetnames[-1] == "详细数据"
+        sheet = workbook.worksheets[2]
+        assert sheet.title == "分类-分类00" and sheet["A1"].value == "分类-分类00"
+        assert sheet["A1"].font.sz == 14 and [r.coord for r in sheet.merged_cells.ranges] == ["A1:S1"]
+        assert sheet["B4"].fill.start_color.rgb.endswith("90EE90")
+        assert workbook.worksheets[21].title != workbook.worksheets[20].title
+
+        assert updates[-1] == {
+            "stage": "saving", "sheets_done": 23, "sheets_total": 23, "rows_written": 800, "rows_total": 800
+        }
+        assert max(u["sheets_done"] for u in updates if u["stage"] == "writing") == 22
+
+        # openpyxl版本未经验证时不替换其内部写出逻辑, 经openpyxl逐单元格生成, 内容相同
+        supported = excel_exporter.PRERENDER_SUPPORTED
+        excel_exporter.PRERENDER_SUPPORTED = False
+        try:
+            fallback = os.path.join(directory, "fallback.xlsx")
+            exporter.export_full_report(fallback)
+        finally:
+            excel_exporter.PRERENDER_SUPPORTED = supported
+        fallback_workbook = load_workbook(fallback)
+        assert fallback_workbook.sheetnames == workbook.sheetnames
+        for a, b in zip(workbook.worksheets, fallback_workbook.worksheets):
+            assert list(a.iter_rows(values_only=True)) == list(b.iter_rows(values_only=True)), a.title
+
+        # 常驻进程池并行生成分类sheet, 内容与进度同串行导出
+        from sheet_pool import SheetRenderError, SheetRenderPool
+        pool = SheetRenderPool(2)
+        try:
+            pooled = os.path.join(directory, "pooled.xlsx")
+            pooled_updates = []
+            exporter.export_full_report(pooled, on_progress=pooled_updates.append, pool=pool)
+            assert pooled_updates == updates
+            pooled_workbook = load_workbook(pooled)
+            assert pooled_workbook.sheetnames == workbook.sheetnames
+            for a, b in zip(workbook.worksheets, pooled_workbook.worksheets):
+                assert list(a.iter_rows(values_only=True)) == list(b.iter_rows(values_only=True)), a.title
+                assert ([c.fill.start_color.rgb for row in a.iter_rows() for c in row]
+                        == [c.fill.start_color.rgb for row in b.iter_rows() for c in row]), a.title
+
+            # 工作进程中的错误转为SheetRenderError, 进程继续可用
+            try:
+                pool.submit([("坏数据", {})]).result()
+                assert False, "缺少矩阵数据应当失败"
+            except SheetRenderError as e:
+                assert "KeyError" in str(e)
+
+            # 工作进程异常退出时当前任务失败, 进程被替换后导出正常
+            pool._idle.queue[0].process.kill()
+            pool._idle.queue[0].process.wait()
+            try:
+                pool.submit([("分类-分类00", None)]).result()
+                assert False, "工作进程已退出应当失败"
+            except SheetRenderError:
+                pass
+            exporter.export_full_report(pooled, pool=pool)
+            assert load_workbook(pooled).sheetnames == workbook.sheetnames
+        finally:
+            pool.close()
+        assert all(not worker.alive() for worker in pool._idle.queue)
+
+        print("✅ 多分类完整报告测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 多分类完整报告测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_export_cache():
+    """测试导出文件缓存"""
+    print("\n" + "=" * 60)
+    print("测试28: 导出文件缓存")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    from export_cache import ExportFileCache
+    directory = tempfile.mkdtemp()
+
+    try:
+        # 遗留文件: 本进程号及已退出进程的文件启动时删除, 其他文件保留
+        leftovers = [f"{os.getpid()}-old.xlsx", "999999999-old.xlsx", "notes.txt"]
+        for name in leftovers:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write("x")
+        cache = ExportFileCache(directory, max_bytes=250)
+        assert sorted(os.listdir(directory)) == ["notes.txt"]
+        os.remove(os.path.join(directory, "notes.txt"))
+
+        def make_record(i):
+            return ClassificationRecord(
+                primary_category=f"分类{i % 2}", secondary_category="子类",
+                expected_value=i % 16, actual_value=i % 16, status="pass",
+                use_case="用例", scenario=f"场景{i % 2}", vertical=f"垂类{i % 3}",
+                factor="因子", factor_value="值"
+            )
+
+        repo = DataRepository()
+        repo.add_records([make_record(i) for i in range(20)])
+        created = []
+
+        def writer(size):
+            def create(path):
+                created.append(path)
+                with open(path, "wb") as f:
+                    f.write(b"x" * size)
+            return create
+
+        def fetch(repository, criteria, create, **options):
+            """取得文件后立即释放 (对应下载完成)"""
+            with cache.lease(repository, criteria, create, **options) as path:
+                return path
+
+        # 命中: 条件规范化 (空条件/字段顺序无关), 导出选项参与缓存键
+        a = fetch(repo, FilterCriteria(scenario="场景1"), writer(100), kind="full")
+        b = fetch(repo, FilterCriteria(scenario="场景1", vertical=None), writer(100), kind="full")
+        assert a == b and len(created) == 1 and os.path.exists(a)
+        detail = fetch(repo, FilterCriteria(scenario="场景1"), writer(100), kind="detail")
+        assert detail != a and len(created) == 2
+        assert cache.stats()["hits"] == 1 and cache.stats()["bytes"] == 200
+
+        # 超出总大小时淘汰最久未使用的文件; 仍被持有的文件在释放后才删除
+        held = cache.acquire(repo, FilterCriteria(scenario="场景1"), writer(100), kind="detail")
+        assert held == detail
+        fetch(repo, FilterCriteria(scenario="场景1"), writer(100), kind="full")
+        other = fetch(repo, None, writer(100), kind="full")
+        assert os.path.exists(detail) and os.path.exists(a) and os.path.exists(other)
+        assert cache.stats()["evictions"] == 1 and len(cache) == 2
+        cache.release(held)
+        assert not os.path.exists(detail) and cache.stats()["leased_files"] == 0
+
+        # 单个文件超过上限时仍保留为唯一条目
+        large = fetch(repo, FilterCriteria(vertical="垂类1"), writer(400), kind="full")
+        assert os.path.exists(large) and len(cache) == 1 and not os.path.exists(a)
+
+        # 生成失败不留下文件
+        def failing(path):
+            with open(path, "w") as f:
+                f.write("partial")
+            raise ValueError("没有找到匹配的记录")
+        try:
+            fetch(repo, FilterCriteria(use_case="无"), failing)
+            assert False, "生成失败应抛出异常"
+        except ValueError:
+            pass
+        assert sorted(os.listdir(directory)) == [os.path.basename(large)]
+
+        # 数据版本前进: 旧文件删除; 基于旧快照的请求不回退版本, 其文件不入缓存, 释放后删除
+        old_snapshot = repo.snapshot()
+        repo.add_record(make_record(20))
+        current = fetch(repo, FilterCriteria(vertical="垂类1"), writer(10), kind="full")
+        assert not os.path.exists(large) and os.listdir(directory) == [os.path.basename(current)]
+        assert cache.stats()["invalidations"] == 1
+        with cache.lease(old_snapshot, FilterCriteria(vertical="垂类1"), writer(10), kind="full") as stale:
+            assert stale != current and os.path.exists(stale)
+        assert not os.path.exists(stale) and os.path.exists(current)
+        assert cache.stats()["version"] == repo.version and len(cache) == 1
+
+        # 生成期间数据版本前进: 文件照常返回, 释放后删除
+        def racing(path):
+            writer(10)(path)
+            repo.add_record(make_record(21))
+        with cache.lease(repo, FilterCriteria(scenario="场景0"), racing, kind="full") as raced:
+            assert os.path.exists(raced)
+        assert not os.path.exists(raced) and cache.stats()["leased_files"] == 0
+
+        # Web接口: 相同条件的重复导出直接返回缓存文件
+        import web_app
+        client = web_app.app.test_client()
+        client.post('/api/data/generate-sample', json={"count": 100})
+        web_app.export_cache.clear()
+        before = web_app.export_cache.stats()
+        first = client.post('/api/export/excel', json={"scenario": "移动端"})
+        second = client.post('/api/export/excel', json={"scenario": "移动端", "vertical": ""})
+        assert first.status_code == second.status_code == 200 and first.data == second.data
+        first.close()
+        second.close()
+        detail_response = client.post('/api/export/excel/detail', json={})
+        assert detail_response.status_code == 200
+        detail_response.close()
+        stats = web_app.export_cache.stats()
+        assert stats["hits"] - before["hits"] == 1 and stats["misses"] - before["misses"] == 2
+        assert stats["entries"] == 2 and stats["leased_files"] == 0
+        assert client.get('/api/cache/stats').get_json()["export_cache"]["entries"] == 2
+        web_app.export_cache.clear()
+
+        print("✅ 导出文件缓存测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 导出文件缓存测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_native_matrix_sheets():
+    """测试直接生成XML的矩阵/汇总sheet"""
+    print("\n" + "=" * 60)
+    print("测试29: 原生xlsx矩阵sheet")
+    print("=" * 60)
+
+    import os
+    import shutil
+    import tempfile
+    import zipfile
+    from xml.etree import ElementTree
+    from openpyxl import load_workbook
+    from xlsx_writer import cell_xml
+    directory = tempfile.mkdtemp()
+
+    try:
+        # 单元格XML: 转义, 首尾空白, 非法控制字符, 数值格式, 样式
+        assert cell_xml("A1", "a<b>&c") == '<c r="A1" t="inlineStr"><is><t>a&lt;b&gt;&amp;c</t></is></c>'
+        assert cell_xml("A1", " x") == '<c r="A1" t="inlineStr"><is><t xml:space="preserve"> x</t></is></c>'
+        assert cell_xml("A1", "a\x01b") == '<c r="A1" t="inlineStr"><is><t>ab</t></is></c>'
+        assert cell_xml("A1", "a\ud800b\uffffc") == '<c r="A1" t="inlineStr"><is><t>abc</t></is></c>'
+        assert cell_xml("B2", 33.33, 7) == '<c r="B2" s="7" t="n"><v>33.33</v></c>'
+        assert cell_xml("B2", 25.0) == '<c r="B2" t="n"><v>25</v></c>'
+        assert cell_xml("B2", None) == ""
+
+        categories = ["电商", "A&B <测试>", " 前后空白 ", "x" * 30]
+        repo = DataRepository()
+        repo.add_records([
+            ClassificationRecord(
+                primary_category=categories[i % 4], secondary_category=f"子类{i % 3}",
+                expected_value=i % 16, actual_value=(i * 7) % 16 if i % 3 else i % 16,
+                status="pass" if i % 3 == 0 or i % 16 == (i * 7) % 16 else "fail",
+                use_case="用例", scenario="场景", vertical="垂类", factor="因子", factor_value="值"
+            )
+            for i in range(400)
+        ])
+        exporter = ExcelExporter(repo)
+        native = os.path.join(directory, "native.xlsx")
+        cells = os.path.join(directory, "cells.xlsx")
+        exporter.export_full_report(native, FilterCriteria(secondary_category="子类1"))
+        exporter.export_full_report(cells, FilterCriteria(secondary_category="子类1"), native_sheets=False)
+
+        # 与openpyxl逐单元格生成的文件内容一致: 逐sheet比较解析后的单元格 (类型, 样式号, 值)、合并区域和列宽
+        # (不比较字节, XML的序列化细节随openpyxl是否使用lxml而不同)
+        def worksheet_contents(archive, name, shared_strings):
+            root = ElementTree.fromstring(archive.read(name))
+            cells = {}
+            for cell in root.iter(f"{{{main}}}c"):
+                cell_type = cell.get("t", "n")
+                if cell_type == "s":
+                    cell_type, value = "inlineStr", shared_strings[int(cell.find(f"{{{main}}}v").text)]
+                elif cell_type == "inlineStr":
+                    value = "".join(t.text or "" for t in cell.iter(f"{{{main}}}t"))
+                else:
+                    element = cell.find(f"{{{main}}}v")
+                    value = None if element is None else element.text
+                    if cell_type == "n" and value is not None:
+                        value = float(value)
+                cells[cell.get("r")] = (cell_type, int(cell.get("s", 0)), value)
+            merges = sorted(m.get("ref") for m in root.iter(f"{{{main}}}mergeCell"))
+            widths = {}
+            for col in root.iter(f"{{{main}}}col"):
+                for index in range(int(col.get("min")), int(col.get("max")) + 1):
+                    widths[index] = float(col.get("width"))
+            return cells, merges, widths
+
+        def workbook_contents(path):
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+                shared_strings = []
+                if "xl/sharedStrings.xml" in names:
+                    shared_strings = [
+                        "".join(t.text or "" for t in si.iter(f"{{{main}}}t"))
+                        for si in ElementTree.fromstring(archive.read("xl/sharedStrings.xml")).iter(f"{{{main}}}si")
+                    ]
+                styles = ElementTree.fromstring(archive.read("xl/styles.xml"))
+                cell_xfs = [dict(xf.attrib) for xf in styles.find(f"{{{main}}}cellXfs")]
+                sheets = {
+                    name: worksheet_contents(archive, name, shared_strings)
+                    for name in names if name.startswith("xl/worksheets/")
+                }
+            return cell_xfs, sheets
+
+        main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+        native_xfs, native_sheets = workbook_contents(native)
+        cells_xfs, cells_sheets = workbook_contents(cells)
+        assert native_xfs == cells_xfs
+        assert sorted(native_sheets) == sorted(cells_sheets)
+        for name, contents in native_sheets.items():
+            assert contents == cells_sheets[name], name
+
+        workbook = load_workbook(native)
+        summary = workbook["汇总统计"]
+        assert summary["A1"].value == "汇总统计报告" and summary["A1"].font.sz == 16
+        assert summary["B4"].value == len(repo.match_rows(FilterCriteria(secondary_category="子类1")))
+        sheet = workbook["分类-A&B <测试>"]
+        assert sheet["A1"].value == "分类-A&B <测试>"
+        assert sheet["A3"].value == "实际\\预测" and sheet["A3"].font.color.rgb.endswith("FFFFFF")
+        diagonal = [sheet.cell(row=i + 4, column=i + 2) for i in range(16)]
+        assert all(c.fill.start_color.rgb.endswith("90EE90") for c in diagonal if c.value)
+        assert sheet["C4"].fill.fill_type is None
+        assert sheet.column_dimensions["A"].width == 12 and sheet.column_dimensions["S"].width == 8
+        assert workbook["分类-" + "x" * 20]["R20"].value == sum(
+            workbook["分类-" + "x" * 20].cell(row=20, column=c).value for c in range(2, 18)
+        )
+
+        print("✅ 原生xlsx矩阵sheet测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 原生xlsx矩阵sheet测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_streaming_csv_export():
+    """测试CSV/TSV流式导出"""
+    print("\n" + "=" * 60)
+    print("测试30: CSV/TSV流式导出")
+    print("=" * 60)
+
+    import csv
+    import gzip
+    import io
+    import os
+    import shutil
+    import tempfile
+    from csv_export import DETAIL_FIELDS, iter_csv, iter_export, write_csv
+    from excel_exporter import DETAIL_HEADERS, iter_detail_rows
+    directory = tempfile.mkdtemp()
+
+    def text_rows(rows):
+        return [["" if value is None else str(value) for value in row] for row in rows]
+
+    try:
+        repo = DataRepository()
+        repo.add_records([
+            ClassificationRecord(
+                primary_category=f"分类{i % 3}", secondary_category="子类",
+                expected_value=i % 16, actual_value=i % 16 if i % 5 else (i + 1) % 16,
+                status="pass" if i % 5 else "fail",
+                use_case="用例", scenario=f"场景{i % 2}", vertical="垂类",
+                factor="因子", factor_value="值",
+                notes='含,逗号\t制表符"引号\n换行' if i == 3 else None
+            )
+            for i in range(100)
+        ])
+        expected = text_rows(iter_detail_rows(repo.select()))
+
+        # 按块生成: 首块含表头, 特殊字符正确转义
+        chunks = list(iter_csv(repo.select(), chunk_size=30))
+        assert len(chunks) == 4
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        assert rows[0] == DETAIL_HEADERS and rows[1:] == expected
+        assert rows[4][12] == '含,逗号\t制表符"引号\n换行'
+
+        # TSV + 字段名表头 + 筛选
+        criteria = FilterCriteria(scenario="场景1")
+        data = b"".join(iter_export(repo, criteria, data_format="tsv", header="fields"))
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8")), delimiter="\t"))
+        assert rows[0] == DETAIL_FIELDS
+        assert rows[1:] == text_rows(iter_detail_rows(repo.select(criteria)))
+
+        # gzip压缩 + BOM, 无表头
+        data = b"".join(iter_export(repo, compress=True, bom=True, header="none", chunk_size=10))
+        text = gzip.decompress(data).decode("utf-8")
+        assert text.startswith("\ufeff")
+        assert list(csv.reader(io.StringIO(text[1:]))) == expected
+
+        # 不支持的参数立即报错 (开始输出前)
+        for options in ({"data_format": "xml"}, {"header": "raw"}):
+            try:
+                iter_export(repo, **options)
+                assert False, "不支持的参数应抛出异常"
+            except ValueError:
+                pass
+
+        # 写入文件
+        path = write_csv(repo, os.path.join(directory, "detail.csv.gz"), criteria, compress=True)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            assert len(list(csv.reader(f))) == 51
+
+        # Web接口: 分块响应
+        import web_app
+        client = web_app.app.test_client()
+        client.post('/api/data/generate-sample', json={"count": 100})
+        response = client.post('/api/export/csv', json={"scenario": "移动端"})
+        assert response.status_code == 200 and response.is_streamed
+        assert response.mimetype == "text/csv"
+        assert "attachment" in response.headers["Content-Disposition"]
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        matched = web_app.repository.select(FilterCriteria(scenario="移动端"))
+        assert rows[1:] == text_rows(iter_detail_rows(matched))
+        response.close()
+
+        response = client.post('/api/export/csv', json={"format": "tsv", "gzip": True})
+        assert response.status_code == 200 and response.mimetype == "application/gzip"
+        assert response.headers["Content-Disposition"].endswith(".tsv.gz")
+        lines = gzip.decompress(response.get_data()).decode("utf-8").splitlines()
+        assert len(lines) == 101 and lines[0].split("\t") == DETAIL_HEADERS
+        response.close()
+
+        assert client.post('/api/export/csv', json={"format": "xml"}).status_code == 400
+        assert client.post('/api/export/csv', json={"header": "raw"}).status_code == 400
+
+        print("✅ CSV/TSV流式导出测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ CSV/TSV流式导出测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_cursor_pagination():
+    """测试详细数据游标分页"""
+    print("\n" + "=" * 60)
+    print("测试31: 详细数据游标分页")
+    print("=" * 60)
+
+    from detail_pager import InvalidCursorError, build_order, fetch_page
+    from report_cache import ReportCache
+
+    def make_record(i):
+        return ClassificationRecord(
+            primary_category=["电商", "金融", "教育"][i % 3], secondary_category="子类",
+            expected_value=i % 16, actual_value=i % 16 if i % 4 else (i + 3) % 16,
+            status="pass" if i % 4 else "fail",
+            use_case="用例", scenario=f"场景{i % 2}", vertical="垂类",
+            factor="因子", factor_value="值",
+            test_id=f"T{i % 7}" if i % 5 else None
+        )
+
+    def collect(repo, criteria=None, **options):
+        records, cursor = [], None
+        while True:
+            page = fetch_page(repo, criteria, page_size=7, cursor=cursor, **options)
+            records.extend(page["records"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return records, page["total"]
+
+    try:
+        repo = DataRepository()
+        repo.add_records([make_record(i) for i in range(60)])
+        criteria = FilterCriteria(scenario="场景0")
+        expected = repo.filter_records(criteria)
+
+        # 默认按导入顺序, 逐页拼接结果与完整筛选一致
+        records, total = collect(repo, criteria)
+        assert total == 30 and [r.to_dict() for r in records] == [r.to_dict() for r in expected]
+
+        # 按任意字段排序 (同值按行号), 升序/降序
+        all_records = repo.get_all_records()
+        for field, descending in [("primary_category", False), ("primary_category", True),
+                                  ("actual_value", True), ("status", False), ("test_id", True)]:
+            records, _ = collect(repo, sort_by=field, descending=descending)
+            values = [record.to_dict()[field] for record in all_records]
+            rows = sorted(
+                range(len(values)), key=lambda i: "" if values[i] is None else values[i], reverse=descending
+            )
+            assert [r.to_dict() for r in records] == [all_records[i].to_dict() for i in rows], field
+
+        # 偏移分页与游标分页一致
+        page = fetch_page(repo, criteria, page_size=7, offset=14, sort_by="actual_value")
+        first = fetch_page(repo, criteria, page_size=14, sort_by="actual_value")
+        following = fetch_page(repo, criteria, page_size=7, cursor=first["next_cursor"], sort_by="actual_value")
+        assert page["offset"] == following["offset"] == 14
+        assert [r.to_dict() for r in page["records"]] == [r.to_dict() for r in following["records"]]
+
+        # 数据追加后继续翻页: 已返回的记录不重复, 排序值更大的新记录出现在后续页中
+        first = fetch_page(repo, page_size=10, sort_by="primary_category")
+        repo.add_records([make_record(i) for i in range(60, 66)])
+        rest, total = [], None
+        cursor = first["next_cursor"]
+        while cursor:
+            page = fetch_page(repo, page_size=10, cursor=cursor, sort_by="primary_category")
+            rest.extend(page["records"])
+            cursor, total = page["next_cursor"], page["total"]
+        assert total == 66 and len(first["records"]) + len(rest) == 66
+
+        # 令牌与条件/排序不一致或被篡改时拒绝
+        token = fetch_page(repo, criteria, page_size=5)["next_cursor"]
+        for bad_options in ({"sort_by": "actual_value"}, {"cursor": "!!!"}):
+            try:
+                fetch_page(repo, criteria, page_size=5, **dict({"cursor": token}, **bad_options))
+                assert False, "无效令牌应抛出异常"
+            except InvalidCursorError:
+                pass
+        try:
+            build_order(repo, sort_by="unknown")
+            assert False, "不支持的排序字段应抛出异常"
+        except ValueError:
+            pass
+
+        # 行顺序按 (版本, 条件, 排序) 缓存, 翻页不重复计算
+        cache = ReportCache()
+        for offset in (0, 5, 10):
+            fetch_page(repo, criteria, page_size=5, offset=offset, sort_by="test_id", cache=cache)
+        assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 2
+        # 缓存按行顺序的实际大小计量, 超过字节上限的结果不缓存
+        order = build_order(repo, criteria, sort_by="test_id")
+        assert order.nbytes >= 2 * len(order) * order.rows.itemsize
+        assert cache.stats()["bytes"] >= order.nbytes
+        small = ReportCache(max_bytes=order.nbytes - 1)
+        fetch_page(repo, criteria, page_size=5, sort_by="test_id", cache=small)
+        assert len(small) == 0
+        try:
+            fetch_page(repo, criteria, offset=-1)
+            assert False, "负的offset应抛出异常"
+        except ValueError:
+            pass
+
+        # Web接口
+        import web_app
+        client = web_app.app.test_client()
+        client.post('/api/data/generate-sample', json={"count": 120})
+        result = client.post('/api/data/detail', json={"page_size": 50, "sort_by": "expected_value",
+                                                       "sort_order": "desc"}).get_json()
+        assert result["total"] == 120 and result["has_more"] and result["page"] == 1
+        values = [r["expected_value"] for r in result["data"]]
+        assert values == sorted(values, reverse=True)
+        seen = [r["test_id"] for r in result["data"]]
+        while result["has_more"]:
+            result = client.post('/api/data/detail', json={
+                "page_size": 50, "sort_by": "expected_value", "sort_order": "desc",
+                "cursor": result["next_cursor"]
+            }).get_json()
+            seen.extend(r["test_id"] for r in result["data"])
+        assert len(seen) == 120 and result["page"] == 3 and result["total_pages"] == 3
+
+        legacy = client.post('/api/data/detail', json={"page": 2, "page_size": 50}).get_json()
+        all_rows = web_app.repository.get_all_records()
+        assert [r["test_id"] for r in legacy["data"]] == [r.test_id for r in all_rows[50:100]]
+
+        assert client.post('/api/data/detail', json={"sort_by": "unknown"}).status_code == 400
+        assert client.post('/api/data/detail', json={"sort_order": "up"}).status_code == 400
+        assert client.post('/api/data/detail', json={"cursor": "abc"}).status_code == 400
+        assert client.post('/api/data/detail', json={"page": 0}).status_code == 400
+        assert client.post('/api/data/detail', json={"page": -3}).status_code == 400
+        # 行顺序使用独立的缓存, 不占用报表结果缓存
+        stats = client.get('/api/cache/stats').get_json()
+        assert stats["detail_order_cache"]["entries"] >= 2
+
+        print("✅ 详细数据游标分页测试通过!")
+        return True
+
+    except Exception as e:
+        print(f"❌ 详细数据游标分页测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def run_all_tests():
     """运行所有测试"""
     print("\n" + "🧪 开始运行系统测试...\n")
@@ -330,7 +2587,32 @@ def run_all_tests():
         test_confusion_matrix,
         test_report_generation,
         test_excel_export,
-        test_filter_criteria
+        test_filter_criteria,
+        test_columnar_repository,
+        test_inverted_index_filter,
+        test_vectorized_matrix_kernel,
+        test_single_pass_report,
+        test_group_by_dimensions,
+        test_aggregate_cube,
+        test_incremental_state,
+        test_report_cache,
+        test_compact_record,
+        test_bulk_ingest,
+        test_stream_ingest,
+        test_replace_and_append,
+        test_concurrent_repository,
+        test_shared_dataset,
+        test_dataset_file,
+        test_arrow_io,
+        test_sql_repository,
+        test_evaluate_loader,
+        test_streaming_excel_export,
+        test_export_jobs,
+        test_category_sheets_report,
+        test_export_cache,
+        test_native_matrix_sheets,
+        test_streaming_csv_export,
+        test_cursor_pagination
     ]
 
     results = []
@@ -2,12 +2,29 @@
 Flask Web应用 - 分类统计报表展示
 支持筛选、混淆矩阵展示、Excel导出
 """
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from flask_cors import CORS
-from data_model import DataRepository, FilterCriteria, ClassificationRecord, ResultStatus
-from confusion_matrix import ConfusionMatrixGenerator
+from data_model import (
+    DataRepository, RepositorySnapshot, FilterCriteria, ClassificationRecord, ResultStatus,
+    BulkValidationError
+)
+from confusion_matrix import CubeReportGenerator
 from excel_exporter import ExcelExporter
+from report_cache import ReportCache
+from stream_ingest import iter_ndjson, iter_json_array, ingest_stream
+from shared_dataset import SharedDatasetPublisher, SharedDatasetReader
+from dataset_format import save_dataset as save_dataset_file
+from connection_pool import ConnectionPool
+from evaluate_loader import EvaluateMatrixLoader
+from export_jobs import ExportJobManager, QueueFullError
+from export_cache import ExportFileCache
+from sheet_pool import SheetRenderPool
+from csv_export import DELIMITERS, iter_export as iter_csv_export
+from detail_pager import fetch_page
+from typing import BinaryIO
+import atexit
 import json
+import threading
 from datetime import datetime
 import os
 
@@ -17,6 +34,113 @@ CORS(app)
 # 全局数据仓库
 repository = DataRepository()
 
+# 上传校验失败时最多返回的错误条数
+MAX_REPORTED_ERRORS = 100
+
+# 报表结果缓存 (按仓库版本 + 筛选条件), 条目数与估算总大小 (REPORT_CACHE_MAX_MB, 默认256) 均有上限
+REPORT_CACHE_MAX_MB = int(os.environ.get("REPORT_CACHE_MAX_MB", 256))
+report_cache = ReportCache(max_entries=64, max_bytes=REPORT_CACHE_MAX_MB * 1024 * 1024)
+
+# 详细数据分页的行顺序缓存 (每条约8-16字节/匹配行), 与报表结果分开, 按 DETAIL_ORDER_CACHE_MAX_MB (默认64) 限制
+DETAIL_ORDER_CACHE_MAX_MB = int(os.environ.get("DETAIL_ORDER_CACHE_MAX_MB", 64))
+detail_order_cache = ReportCache(max_entries=16, max_bytes=DETAIL_ORDER_CACHE_MAX_MB * 1024 * 1024)
+
+# 流式上传进度 (最近一次流式上传)
+upload_progress = {"state": "idle"}
+upload_progress_lock = threading.Lock()
+
+# 上传模式: replace 离线构建新数据后整体替换; append 追加到当前数据
+UPLOAD_MODES = ("replace", "append")
+
+# 多进程部署 (如gunicorn多worker): 设置共享数据集目录 (如 /dev/shm) 后,
+# 上传的数据发布为共享内存中的一代数据集, 各worker以只读内存映射挂载同一份数据
+SHARED_DATASET_DIR = os.environ.get("SHARED_DATASET_DIR")
+SHARED_DATASET_NAME = os.environ.get("SHARED_DATASET_NAME", "classification_report")
+shared_publisher = None
+shared_reader = None
+if SHARED_DATASET_DIR:
+    shared_publisher = SharedDatasetPublisher(SHARED_DATASET_NAME, SHARED_DATASET_DIR)
+    shared_reader = SharedDatasetReader(SHARED_DATASET_NAME, SHARED_DATASET_DIR)
+
+
+# 持久化数据集文件: 启动时若存在则以内存映射方式加载, /api/data/save 将当前数据保存到该文件
+DATASET_PATH = os.environ.get("DATASET_PATH")
+if DATASET_PATH and os.path.exists(DATASET_PATH):
+    repository.replace_with(DataRepository.open(DATASET_PATH))
+
+
+# 评估矩阵库 (SQLite文件): 按 report_id/task_id 导入明细或直接生成报表, 并发请求使用连接池中的不同连接
+EVALUATE_DB_PATH = os.environ.get("EVALUATE_DB_PATH")
+evaluate_loader = None
+if EVALUATE_DB_PATH:
+    evaluate_loader = EvaluateMatrixLoader(
+        ConnectionPool.sqlite(EVALUATE_DB_PATH, int(os.environ.get("EVALUATE_DB_POOL_SIZE", 4)))
+    )
+
+
+# 导出文件缓存: 相同数据版本 + 筛选条件 + 导出类型直接返回已生成的文件, 总大小超出上限时LRU淘汰
+export_cache = ExportFileCache(
+    os.path.join("temp", "export_cache"),
+    max_bytes=int(os.environ.get("EXPORT_CACHE_MAX_MB", 512)) * 1024 * 1024
+)
+
+# 完整报告中各一级分类sheet的XML生成进程池: 启动时创建一次, 各导出请求/任务共用 (未设置或<=1时不启用)
+EXPORT_SHEET_PROCESSES = int(os.environ.get("EXPORT_SHEET_PROCESSES", 0))
+sheet_pool = None
+if EXPORT_SHEET_PROCESSES > 1:
+    sheet_pool = SheetRenderPool(EXPORT_SHEET_PROCESSES)
+    atexit.register(sheet_pool.close)
+
+# 后台Excel导出任务: 固定数量的导出线程, 排队任务数有上限, 文件保留一段时间后清除
+export_jobs = ExportJobManager(
+    os.path.join("temp", "exports"),
+    max_workers=int(os.environ.get("EXPORT_MAX_WORKERS", 2)),
+    max_queued=int(os.environ.get("EXPORT_MAX_QUEUED", 8)),
+    retention_seconds=float(os.environ.get("EXPORT_RETENTION_SECONDS", 3600))
+)
+
+
+@app.before_request
+def sync_shared_dataset():
+    """共享模式下, 其他worker发布了新一代数据集时切换到新一代"""
+    if shared_reader is not None:
+        attached = shared_reader.refresh()
+        if attached is not None:
+            repository.replace_with(attached)
+
+
+def commit_dataset(staging: DataRepository, mode: str = "replace"):
+    """
+    将离线构建完成的数据提交到全局仓库
+    导入期间全局仓库保持不变, 并发的报表请求不会看到空仓库或导入一半的数据
+    共享模式下在发布锁内基于最新一代提交并发布, 再挂载刚发布的一代 (释放本进程的私有副本)
+    """
+    if shared_publisher is None:
+        if mode == "append":
+            repository.append_from(staging)
+        else:
+            repository.replace_with(staging)
+        return
+
+    with shared_publisher.locked():
+        sync_shared_dataset()
+        if mode == "append":
+            repository.append_from(staging)
+        else:
+            repository.replace_with(staging)
+        shared_publisher.publish(repository)
+    sync_shared_dataset()
+
+
+def get_cached_report(criteria: FilterCriteria, snapshot: RepositorySnapshot = None) -> dict:
+    """获取详细报告, 相同数据版本和筛选条件直接复用缓存"""
+    if snapshot is None:
+        snapshot = repository.snapshot()
+    generator = CubeReportGenerator(snapshot, criteria)
+    return report_cache.get_or_compute(
+        snapshot, criteria, generator.generate_detailed_report
+    )
+
 
 @app.route('/')
 def index():
@@ -26,26 +150,198 @@ def index():
 
 @app.route('/api/data/upload', methods=['POST'])
 def upload_data():
-    """上传测试数据"""
+    """
+    上传测试数据
+    可选参数 mode: replace (默认, 替换现有数据) / append (追加到现有数据)
+    """
     try:
         data = request.get_json()
 
         if not data or 'records' not in data:
             return jsonify({"error": "Invalid data format"}), 400
 
-        # 清空现有数据
-        repository.clear()
+        mode = data.get('mode', 'replace')
+        if mode not in UPLOAD_MODES:
+            return jsonify({"error": f"不支持的上传模式: {mode}"}), 400
+
+        # 在新仓库中批量校验并导入, 完成后再提交
+        staging = DataRepository()
+        result = staging.ingest_dicts(data['records'])
+        commit_dataset(staging, mode)
+
+        return jsonify({
+            "success": True,
+            "message": f"成功上传 {result['accepted']} 条记录",
+            "mode": mode,
+            "total_records": len(repository)
+        })
+
+    except BulkValidationError as e:
+        return jsonify({
+            "error": str(e),
+            "invalid_rows": len(set(error["row"] for error in e.errors)),
+            "errors": e.errors[:MAX_REPORTED_ERRORS]
+        }), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/data/upload/stream', methods=['POST'])
+def upload_data_stream():
+    """
+    流式上传测试数据
+    请求体为NDJSON (Content-Type: application/x-ndjson 或 ?format=ndjson)
+    或JSON数组 / {"records": [...]}, 逐块解析并按批写入, 不将完整请求体载入内存
+    可选参数: batch_size (默认10000), skip_invalid (默认true), mode (replace/append, 默认replace)
+    数据全部导入成功后才提交到全局仓库, 中途失败时现有数据不变
+    """
+    content_type = request.mimetype or ""
+    data_format = request.args.get('format') or (
+        'ndjson' if content_type in ('application/x-ndjson', 'application/jsonl') else 'json'
+    )
+    if data_format not in ('ndjson', 'json'):
+        return jsonify({"error": f"不支持的格式: {data_format}"}), 400
+
+    try:
+        batch_size = int(request.args.get('batch_size', 10000))
+    except ValueError:
+        return jsonify({"error": "batch_size必须为整数"}), 400
+    skip_invalid = request.args.get('skip_invalid', 'true').lower() != 'false'
+    mode = request.args.get('mode', 'replace')
+    if mode not in UPLOAD_MODES:
+        return jsonify({"error": f"不支持的上传模式: {mode}"}), 400
+
+    def on_batch(progress):
+        with upload_progress_lock:
+            upload_progress.update(progress, state="running")
+
+    with upload_progress_lock:
+        upload_progress.clear()
+        upload_progress.update(state="running", rows_received=0, rows_accepted=0,
+                               rows_rejected=0, batches=0)
+
+    rows = iter_ndjson(request.stream) if data_format == 'ndjson' else iter_json_array(request.stream)
+    staging = DataRepository()
+    try:
+        result = ingest_stream(
+            staging, rows,
+            batch_size=batch_size,
+            skip_invalid=skip_invalid,
+            max_errors=MAX_REPORTED_ERRORS,
+            on_batch=on_batch
+        )
+    except BulkValidationError as e:
+        with upload_progress_lock:
+            upload_progress.update(state="failed", error=str(e))
+        return jsonify({
+            "error": str(e),
+            "invalid_rows": len(set(error["row"] for error in e.errors)),
+            "errors": e.errors[:MAX_REPORTED_ERRORS]
+        }), 400
+    except ValueError as e:
+        with upload_progress_lock:
+            upload_progress.update(state="failed", error=str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        with upload_progress_lock:
+            upload_progress.update(state="failed", error=str(e))
+        return jsonify({"error": str(e)}), 500
+
+    commit_dataset(staging, mode)
+    with upload_progress_lock:
+        upload_progress.update(result, state="done", errors=None)
+
+    return jsonify({
+        "success": True,
+        "message": f"成功上传 {result['rows_accepted']} 条记录",
+        "mode": mode,
+        "total_records": len(repository),
+        **result
+    })
+
+
+@app.route('/api/data/upload/progress', methods=['GET'])
+def get_upload_progress():
+    """查询最近一次流式上传的进度"""
+    with upload_progress_lock:
+        progress = {k: v for k, v in upload_progress.items() if v is not None}
+    return jsonify(progress)
+
 
-        # 添加新数据
-        for record_data in data['records']:
-            record = ClassificationRecord.from_dict(record_data)
-            repository.add_record(record)
+@app.route('/api/data/save', methods=['POST'])
+def save_dataset():
+    """将当前数据保存为二进制数据集文件 (DATASET_PATH), 重启后自动加载"""
+    if not DATASET_PATH:
+        return jsonify({"error": "未配置DATASET_PATH, 无法保存数据集"}), 400
+    try:
+        snapshot = repository.snapshot()
+        size = save_dataset_file(snapshot, DATASET_PATH)
+        return jsonify({
+            "success": True,
+            "message": f"已保存 {len(snapshot)} 条记录",
+            "path": DATASET_PATH,
+            "bytes": size
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/evaluate/load', methods=['POST'])
+def load_evaluate_data():
+    """
+    从评估矩阵库导入明细
+    参数: report_id, task_id, case_ids (可选), mode (replace/append, 默认replace)
+    """
+    if evaluate_loader is None:
+        return jsonify({"error": "未配置EVALUATE_DB_PATH"}), 400
+    data = request.get_json() or {}
+    if not data.get('report_id') or not data.get('task_id'):
+        return jsonify({"error": "缺少report_id或task_id"}), 400
+    mode = data.get('mode', 'replace')
+    if mode not in UPLOAD_MODES:
+        return jsonify({"error": f"不支持的上传模式: {mode}"}), 400
 
+    try:
+        staging = DataRepository()
+        result = evaluate_loader.load(
+            staging, data['report_id'], data['task_id'],
+            case_ids=data.get('case_ids'), max_errors=MAX_REPORTED_ERRORS
+        )
+        commit_dataset(staging, mode)
         return jsonify({
             "success": True,
-            "message": f"成功上传 {len(data['records'])} 条记录"
+            "message": f"成功导入 {result['rows_accepted']} 条记录",
+            "mode": mode,
+            "total_records": len(repository),
+            **result
         })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+
+@app.route('/api/evaluate/report', methods=['GET'])
+def get_evaluate_report():
+    """
+    直接为评估矩阵库中的某个报告+任务生成详细报告 (不改变当前数据)
+    参数: report_id, task_id
+    """
+    if evaluate_loader is None:
+        return jsonify({"error": "未配置EVALUATE_DB_PATH"}), 400
+    report_id = request.args.get('report_id')
+    task_id = request.args.get('task_id')
+    if not report_id or not task_id:
+        return jsonify({"error": "缺少report_id或task_id"}), 400
+
+    try:
+        task_repository = DataRepository()
+        result = evaluate_loader.load(task_repository, report_id, task_id, max_errors=MAX_REPORTED_ERRORS)
+        report = CubeReportGenerator(task_repository).generate_detailed_report()
+        return jsonify({
+            "success": True,
+            "data": report,
+            "rows_rejected": result["rows_rejected"],
+            "errors": result["errors"]
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -55,7 +351,7 @@ def generate_sample_data():
     """生成示例数据"""
     import random
 
-    repository.clear()
+    staging = DataRepository()
 
     categories = ["电商", "社交", "新闻", "游戏"]
     sub_categories = ["首页", "列表页", "详情页", "个人中心"]
@@ -89,7 +385,9 @@ def generate_sample_data():
             timestamp=datetime.now().isoformat(),
             test_id=f"TEST_{i:05d}"
         )
-        repository.add_record(record)
+        staging.add_record(record)
+
+    commit_dataset(staging)
 
     return jsonify({
         "success": True,
@@ -128,29 +426,64 @@ def generate_report():
             secondary_category=filter_params.get('secondary_category')
         )
 
-        # 筛选记录
-        records = repository.filter_records(criteria)
+        # 基于预聚合立方体统计, 不扫描原始记录; 结果按条件缓存
+        # 同一请求内的统计都基于同一快照, 不受并发上传影响
+        snapshot = repository.snapshot()
+        report_data = get_cached_report(criteria, snapshot)
 
-        if not records:
+        if report_data["summary"]["total_records"] == 0:
             return jsonify({"error": "没有找到匹配的记录"}), 404
 
-        # 生成报表
-        generator = ConfusionMatrixGenerator(records)
-        report_data = generator.generate_detailed_report()
+        data = {
+            "overall": report_data["overall"],
+            "by_primary_category": report_data["by_primary_category"],
+            "summary": report_data["summary"]
+        }
+
+        # 可选: 按任意维度分组, 如 "group_by": ["factor", "factor_value"]
+        group_by = filter_params.get('group_by')
+        if group_by:
+            if isinstance(group_by, str):
+                group_by = [group_by]
+            generator = CubeReportGenerator(snapshot, criteria)
+            data["group_by"] = group_by
+            data["by_group"] = report_cache.get_or_compute(
+                snapshot, criteria,
+                lambda: generator.generate_matrix_by(group_by),
+                kind=("group_by", tuple(group_by))
+            )
 
         return jsonify({
             "success": True,
-            "data": {
-                "overall": report_data["overall"],
-                "by_primary_category": report_data["by_primary_category"],
-                "summary": report_data["summary"]
-            }
+            "data": data
         })
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def send_open_file(file: BinaryIO, download_name: str):
+    """
+    发送已打开的导出文件 (导出缓存文件或导出任务结果), 响应结束时关闭;
+    打开后文件被淘汰/清除不影响下载 (导出缓存的文件关闭时才释放)
+    """
+    try:
+        size = os.fstat(file.fileno()).st_size
+        response = send_file(
+            file,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    except BaseException:
+        file.close()
+        raise
+    response.content_length = size
+    return response
+
+
 @app.route('/api/export/excel', methods=['POST'])
 def export_excel():
     """导出Excel报表"""
@@ -168,34 +501,200 @@ def export_excel():
             secondary_category=filter_params.get('secondary_category')
         )
 
-        # 生成Excel
-        exporter = ExcelExporter(repository)
+        # 生成Excel (明细与统计基于同一快照), 相同数据与条件复用缓存文件
+        snapshot = repository.snapshot()
+        exporter = ExcelExporter(snapshot)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"temp/classification_report_{timestamp}.xlsx"
 
-        # 确保temp目录存在
-        os.makedirs("temp", exist_ok=True)
+        output_file = export_cache.open(
+            snapshot, criteria,
+            lambda path: exporter.export_full_report(
+                path, criteria, get_cached_report(criteria, snapshot), pool=sheet_pool
+            ),
+            kind="full_report"
+        )
 
-        exporter.export_full_report(output_path, criteria)
+        return send_open_file(output_file, f"classification_report_{timestamp}.xlsx")
 
-        return send_file(
-            output_path,
-            as_attachment=True,
-            download_name=f"classification_report_{timestamp}.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/export/excel/detail', methods=['POST'])
+def export_excel_detail():
+    """流式导出详细数据Excel (只写工作簿, 适用于大数据量)"""
+    try:
+        filter_params = request.get_json() or {}
+        criteria = FilterCriteria(
+            use_case=filter_params.get('use_case'),
+            scenario=filter_params.get('scenario'),
+            vertical=filter_params.get('vertical'),
+            factor=filter_params.get('factor'),
+            factor_value=filter_params.get('factor_value'),
+            primary_category=filter_params.get('primary_category'),
+            secondary_category=filter_params.get('secondary_category')
+        )
+
+        snapshot = repository.snapshot()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = export_cache.open(
+            snapshot, criteria,
+            lambda path: ExcelExporter(snapshot).export_detail_excel(path, criteria),
+            kind="detail"
         )
 
+        return send_open_file(output_file, f"classification_detail_{timestamp}.xlsx")
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/export/excel/jobs', methods=['POST'])
+def submit_export_job():
+    """
+    提交后台Excel导出任务 (完整报告), 立即返回任务ID
+    参数同 /api/export/excel; 排队任务已满时返回429
+    """
+    try:
+        filter_params = request.get_json() or {}
+        criteria = FilterCriteria(
+            use_case=filter_params.get('use_case'),
+            scenario=filter_params.get('scenario'),
+            vertical=filter_params.get('vertical'),
+            factor=filter_params.get('factor'),
+            factor_value=filter_params.get('factor_value'),
+            primary_category=filter_params.get('primary_category'),
+            secondary_category=filter_params.get('secondary_category')
+        )
+
+        # 导出基于提交时的快照
+        snapshot = repository.snapshot()
+        if len(snapshot.match_rows(criteria)) == 0:
+            return jsonify({"error": "没有找到匹配的记录"}), 400
+
+        def task(output_path, on_progress):
+            report_data = get_cached_report(criteria, snapshot)
+            ExcelExporter(snapshot).export_full_report(
+                output_path, criteria, report_data, on_progress=on_progress, pool=sheet_pool
+            )
+
+        job_id = export_jobs.submit(task)
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status_url": f"/api/export/excel/jobs/{job_id}",
+            "download_url": f"/api/export/excel/jobs/{job_id}/download"
+        }), 202
+
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/export/excel/jobs/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    """导出任务状态: state (queued/running/done/failed) 及进度 (sheets_done/sheets_total, rows_written/rows_total)"""
+    status = export_jobs.status(job_id)
+    if status is None:
+        return jsonify({"error": "导出任务不存在或已过期"}), 404
+    return jsonify(status)
+
+
+@app.route('/api/export/excel/jobs/<job_id>/download', methods=['GET'])
+def download_export_job(job_id):
+    """下载已完成的导出文件, 任务未完成时返回409"""
+    # 状态与文件一次取得: 之后任务过期清除不影响本次下载
+    status, output_file = export_jobs.open_result(job_id)
+    if status is None:
+        return jsonify({"error": "导出任务不存在或已过期"}), 404
+    if output_file is None:
+        return jsonify({"error": f"导出任务尚未完成: {status['state']}", "state": status["state"]}), 409
+    return send_open_file(
+        output_file,
+        f"classification_report_{datetime.fromtimestamp(status['created_at']):%Y%m%d_%H%M%S}.xlsx"
+    )
+
+
+@app.route('/api/export/csv', methods=['POST'])
+def export_csv():
+    """
+    流式导出详细数据CSV/TSV (分块响应, 边生成边下载, 不生成完整文件)
+    参数: 筛选条件同 /api/export/excel, 另有
+    format: csv / tsv (默认csv); header: display / fields / none (默认display);
+    gzip: 是否gzip压缩 (下载 .gz 文件); bom: 是否写入UTF-8 BOM (便于Excel打开)
+    """
+    try:
+        filter_params = request.get_json() or {}
+        criteria = FilterCriteria(
+            use_case=filter_params.get('use_case'),
+            scenario=filter_params.get('scenario'),
+            vertical=filter_params.get('vertical'),
+            factor=filter_params.get('factor'),
+            factor_value=filter_params.get('factor_value'),
+            primary_category=filter_params.get('primary_category'),
+            secondary_category=filter_params.get('secondary_category')
+        )
+        data_format = filter_params.get('format', 'csv')
+        header = filter_params.get('header', 'display')
+        compress = bool(filter_params.get('gzip', False))
+
+        # 参数在开始响应前校验; 导出基于请求时的快照
+        if data_format not in DELIMITERS:
+            return jsonify({"error": f"不支持的导出格式: {data_format}"}), 400
+        if header not in ('display', 'fields', 'none'):
+            return jsonify({"error": f"不支持的表头: {header}"}), 400
+        chunks = iter_csv_export(
+            repository.snapshot(), criteria,
+            data_format=data_format, header=header,
+            compress=compress, bom=bool(filter_params.get('bom', False))
+        )
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"classification_detail_{timestamp}.{data_format}"
+        if compress:
+            filename += ".gz"
+            mimetype = "application/gzip"
+        else:
+            mimetype = "text/csv" if data_format == "csv" else "text/tab-separated-values"
+        return Response(
+            chunks,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """报表缓存/导出文件缓存监控指标"""
+    return jsonify({
+        "success": True,
+        "report_cache": report_cache.stats(),
+        "detail_order_cache": detail_order_cache.stats(),
+        "export_cache": export_cache.stats()
+    })
+
+
 @app.route('/api/data/detail', methods=['POST'])
 def get_detail_data():
-    """获取详细数据列表"""
+    """
+    获取详细数据列表 (只物化当前页)
+    参数: 筛选条件, page_size, cursor (上一页返回的next_cursor) 或 page (页码),
+    sort_by (任意记录字段, 默认按导入顺序), sort_order (asc/desc)
+    """
     try:
         filter_params = request.get_json() or {}
-        page = filter_params.get('page', 1)
-        page_size = filter_params.get('page_size', 50)
+        page_size = int(filter_params.get('page_size', 50))
+        cursor = filter_params.get('cursor')
+        page = int(filter_params.get('page', 1))
+        if page < 1:
+            return jsonify({"error": "page必须为正整数"}), 400
+        sort_order = filter_params.get('sort_order', 'asc')
+        if sort_order not in ('asc', 'desc'):
+            return jsonify({"error": f"不支持的排序方向: {sort_order}"}), 400
 
         # 构建筛选条件
         criteria = FilterCriteria(
@@ -208,24 +707,32 @@ def get_detail_data():
             secondary_category=filter_params.get('secondary_category')
         )
 
-        # 筛选记录
-        records = repository.filter_records(criteria)
-
-        # 分页
-        total = len(records)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        page_records = records[start_idx:end_idx]
+        # 行顺序与总数按 (数据版本, 条件, 排序) 缓存, 翻页只解码本页记录
+        result = fetch_page(
+            repository.snapshot(), criteria,
+            page_size=page_size,
+            cursor=cursor,
+            offset=(page - 1) * page_size,
+            sort_by=filter_params.get('sort_by'),
+            descending=sort_order == 'desc',
+            cache=detail_order_cache
+        )
+        total = result["total"]
 
         return jsonify({
             "success": True,
-            "data": [record.to_dict() for record in page_records],
+            "data": [record.to_dict() for record in result["records"]],
             "total": total,
-            "page": page,
+            "page": result["offset"] // page_size + 1,
             "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size
+            "total_pages": (total + page_size - 1) // page_size,
+            "next_cursor": result["next_cursor"],
+            "has_more": result["next_cursor"] is not None
         })
 
+    except ValueError as e:
+        # 参数或续页令牌 (InvalidCursorError) 无效
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,117 @@
+"""
+原生xlsx worksheet XML生成
+直接拼接sheet XML (与openpyxl写出的格式一致: 内联字符串, 数值t="n"), 不创建单元格对象,
+用于形状固定的小表格 (混淆矩阵/汇总统计sheet); 样式以工作簿中已分配的单元格样式编号引用
+"""
+from typing import Iterable, Iterator, Sequence, Tuple
+from xml.sax.saxutils import escape
+import math
+import re
+
+from openpyxl.utils import get_column_letter
+
+
+# 列字母 (下标从1开始)
+COLUMN_LETTERS = ("",) + tuple(get_column_letter(i) for i in range(1, 65))
+
+SHEET_NAMESPACE = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+_SHEET_HEAD = (
+    f'<worksheet xmlns="{SHEET_NAMESPACE}"><sheetPr><outlinePr summaryBelow="1" summaryRight="1"/>'
+    '<pageSetUpPr/></sheetPr>'
+)
+_SHEET_VIEWS = (
+    '<sheetViews><sheetView workbookViewId="0"><selection activeCell="A1" sqref="A1"/></sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>'
+)
+# 冻结前若干行 (格式同openpyxl的 freeze_panes = "A<n+1>")
+_FROZEN_SHEET_VIEWS = (
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="{rows}" topLeftCell="A{top}" activePane="bottomLeft" state="frozen"/>'
+    '<selection pane="bottomLeft" activeCell="A1" sqref="A1"/></sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>'
+)
+_SHEET_TAIL = '<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/></worksheet>'
+
+# XML不允许的字符 (写入时去除): 控制字符, 单独的代理项 (无法编码为UTF-8), U+FFFE/U+FFFF
+_ILLEGAL_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def number_text(value) -> str:
+    """数值的文本形式 (与openpyxl一致, 最多16位有效数字)"""
+    if math.isnan(value) or math.isinf(value):
+        return ""
+    return "%.16g" % value
+
+
+def cell_xml(ref: str, value, style_id: int = 0) -> str:
+    """
+    单个单元格; value为None时只写样式 (无样式时返回空串)
+    字符串以内联字符串写入, 首尾有空白时保留空白; 空字符串写为无值的单元格 (与openpyxl一致)
+    """
+    style = f' s="{style_id}"' if style_id else ""
+    if value is None:
+        return f'<c r="{ref}"{style}/>' if style_id else ""
+    return f'<c r="{ref}"{style}{value_xml(value)}</c>'
+
+
+def value_xml(value) -> str:
+    """单元格的类型属性与值 (cell_xml 中样式之后、</c> 之前的部分), 与位置无关, 可按取值复用"""
+    if isinstance(value, str):
+        if not value:
+            return ' t="inlineStr">'
+        text = _ILLEGAL_CHARACTERS.sub("", value)
+        space = ' xml:space="preserve"' if text.strip() != text else ""
+        return f' t="inlineStr"><is><t{space}>{escape(text)}</t></is>'
+    if isinstance(value, bool):
+        return f' t="b"><v>{int(value)}</v>'
+    return f' t="n"><v>{number_text(value)}</v>'
+
+
+def row_xml(row: int, cells: Iterable[str]) -> str:
+    """一行单元格"""
+    return f'<row r="{row}">{"".join(cells)}</row>'
+
+
+def worksheet_xml(
+    dimension: str,
+    column_widths: Sequence[Tuple[int, float]],
+    rows: Iterable[str],
+    merged_cells: Sequence[str] = (),
+    frozen_rows: int = 0
+) -> Iterator[bytes]:
+    """
+    逐段生成worksheet XML (UTF-8编码)
+    dimension: 使用区域, 如 "A1:S21"
+    column_widths: [(列号, 列宽)]
+    rows: row_xml 生成的行 (也可以是多行拼接的文本)
+    merged_cells: 合并区域, 如 ["A1:S1"]
+    frozen_rows: 冻结的行数 (如1: 冻结表头行)
+    """
+    views = _FROZEN_SHEET_VIEWS.format(rows=frozen_rows, top=frozen_rows + 1) if frozen_rows else _SHEET_VIEWS
+    head = [_SHEET_HEAD, f'<dimension ref="{dimension}"/>', views]
+    if column_widths:
+        head.append("<cols>")
+        head.extend(
+            f'<col width="{number_text(width)}" customWidth="1" min="{column}" max="{column}"/>'
+            for column, width in column_widths
+        )
+        head.append("</cols>")
+    head.append("<sheetData>")
+    yield _encode("".join(head))
+
+    for row in rows:
+        yield _encode(row)
+
+    tail = ["</sheetData>"]
+    if merged_cells:
+        tail.append(f'<mergeCells count="{len(merged_cells)}">')
+        tail.extend(f'<mergeCell ref="{ref}"/>' for ref in merged_cells)
+        tail.append("</mergeCells>")
+    tail.append(_SHEET_TAIL)
+    yield _encode("".join(tail))
+
+
+def _encode(text: str) -> bytes:
+    # 无XML声明, 按默认的UTF-8编码
+    return text.encode("utf-8")